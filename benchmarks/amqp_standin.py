@@ -0,0 +1,313 @@
+import asyncio
+import threading
+import itertools
+from collections import deque
+
+from pamqp import commands, frame, header, heartbeat
+from pamqp.body import ContentBody
+from pamqp.exceptions import UnmarshalingException
+
+# 벤치마크용 로컬 AMQP 0-9-1 broker (RabbitMQ 대신, pika / aio-pika가 실제 소켓으로 접속)
+# consumer가 쓰는 명령(queue declare, qos, consume, publish, ack/nack, publisher confirm)과 heartbeat만 구현
+# RabbitMQ처럼 협상한 heartbeat 간격의 2배 동안 client에서 아무 frame도 오지 않으면 연결을 끊고,
+# ack 안 된 메시지는 redelivered로 큐에 되돌림 -> 짧은 heartbeat로 "긴 job 중 연결 끊김 -> 중복 실행"을 재현
+#   broker = AmqpStandIn(heartbeat=2).start()
+#   broker.publish('gpu_tasks_bench', body)
+#   ... broker.port로 접속, broker.stats 확인 ...
+#   broker.stop()
+FRAME_MAX = 131072
+PROTOCOL_HEADER = b'AMQP\x00\x00\x09\x01'
+
+
+class _Channel:
+    def __init__(self, channel_id):
+        self.id = channel_id
+        self.prefetch = 0
+        self.confirm = False
+        self.publish_seq = 0
+        self.consumers = {}
+        self.unacked = {}
+        self.delivery_tags = itertools.count(1)
+        # 받는 중인 publish (method, header, body 조각)
+        self.incoming = None
+
+    def has_capacity(self):
+        return not self.prefetch or len(self.unacked) < self.prefetch
+
+
+class _Client(asyncio.Protocol):
+    def __init__(self, broker):
+        self.broker = broker
+        self.transport = None
+        self.buffer = b''
+        self.channels = {}
+        self.heartbeat = broker.heartbeat
+        self.last_received = None
+        self.closed = False
+        self._timer = None
+
+    def connection_made(self, transport):
+        self.transport = transport
+        self.last_received = self.broker.loop.time()
+        self.broker.clients.add(self)
+
+    def connection_lost(self, exc):
+        self._teardown()
+
+    def send(self, value, channel_id=0):
+        if not self.closed:
+            self.transport.write(frame.marshal(value, channel_id))
+
+    def data_received(self, data):
+        self.last_received = self.broker.loop.time()
+        self.buffer += data
+        while self.buffer and not self.closed:
+            if self.buffer.startswith(b'AMQP'):
+                if len(self.buffer) < len(PROTOCOL_HEADER):
+                    return
+                self.buffer = self.buffer[len(PROTOCOL_HEADER):]
+                self.send(commands.Connection.Start(server_properties={'product': 'amqp-standin', 'capabilities': {
+                    'publisher_confirms': True, 'basic.nack': True, 'consumer_cancel_notify': True,
+                    'connection.blocked': True, 'per_consumer_qos': True}}))
+                continue
+            try:
+                consumed, channel_id, value = frame.unmarshal(self.buffer)
+            except UnmarshalingException:
+                # frame이 아직 다 오지 않음
+                return
+            self.buffer = self.buffer[consumed:]
+            self.on_frame(channel_id, value)
+
+    def on_frame(self, channel_id, value):
+        broker = self.broker
+        if isinstance(value, heartbeat.Heartbeat):
+            broker.stats['heartbeats'] += 1
+            return
+        if isinstance(value, header.ContentHeader):
+            channel = self.channels[channel_id]
+            channel.incoming[1] = value
+            if value.body_size == 0:
+                self._finish_publish(channel)
+            return
+        if isinstance(value, ContentBody):
+            channel = self.channels[channel_id]
+            channel.incoming[2].append(value.value)
+            if sum(len(part) for part in channel.incoming[2]) >= channel.incoming[1].body_size:
+                self._finish_publish(channel)
+            return
+
+        name = value.name
+        if name == 'Connection.StartOk':
+            self.send(commands.Connection.Tune(channel_max=2047, frame_max=FRAME_MAX, heartbeat=broker.heartbeat))
+        elif name == 'Connection.TuneOk':
+            # client가 정한 값 사용 (RabbitMQ와 같음)
+            self.heartbeat = value.heartbeat
+            if self.heartbeat:
+                self._timer = broker.loop.call_later(self.heartbeat / 2, self._heartbeat_tick)
+        elif name == 'Connection.Open':
+            self.send(commands.Connection.OpenOk())
+        elif name == 'Connection.Close':
+            self.send(commands.Connection.CloseOk())
+            self.transport.close()
+        elif name == 'Channel.Open':
+            self.channels[channel_id] = _Channel(channel_id)
+            self.send(commands.Channel.OpenOk(), channel_id)
+        elif name == 'Channel.Close':
+            self._close_channel(channel_id)
+            self.send(commands.Channel.CloseOk(), channel_id)
+        elif name == 'Channel.CloseOk':
+            self._close_channel(channel_id)
+        elif name == 'Confirm.Select':
+            self.channels[channel_id].confirm = True
+            if not value.nowait:
+                self.send(commands.Confirm.SelectOk(), channel_id)
+        elif name == 'Exchange.Declare':
+            if not value.nowait:
+                self.send(commands.Exchange.DeclareOk(), channel_id)
+        elif name == 'Queue.Declare':
+            queue = broker.declare(value.queue)
+            if not value.nowait:
+                consumers = sum(1 for _, q in broker.consumers if q == value.queue)
+                self.send(commands.Queue.DeclareOk(value.queue, len(queue), consumers), channel_id)
+        elif name == 'Basic.Qos':
+            self.channels[channel_id].prefetch = value.prefetch_count
+            self.send(commands.Basic.QosOk(), channel_id)
+        elif name == 'Basic.Consume':
+            tag = value.consumer_tag or f"ctag-{next(broker.consumer_tags)}"
+            broker.declare(value.queue)
+            self.channels[channel_id].consumers[tag] = value.queue
+            broker.consumers.append(((self, channel_id, tag), value.queue))
+            if not value.nowait:
+                self.send(commands.Basic.ConsumeOk(tag), channel_id)
+        elif name == 'Basic.Cancel':
+            channel = self.channels[channel_id]
+            channel.consumers.pop(value.consumer_tag, None)
+            broker.consumers = [c for c in broker.consumers if c[0] != (self, channel_id, value.consumer_tag)]
+            if not value.nowait:
+                self.send(commands.Basic.CancelOk(value.consumer_tag), channel_id)
+        elif name == 'Basic.Publish':
+            self.channels[channel_id].incoming = [value, None, []]
+        elif name == 'Basic.Get':
+            broker.declare(value.queue)
+            queue = broker.queues[value.queue]
+            if not queue:
+                self.send(commands.Basic.GetEmpty(), channel_id)
+            else:
+                body, properties, redelivered = queue.popleft()
+                channel = self.channels[channel_id]
+                tag = next(channel.delivery_tags)
+                if not value.no_ack:
+                    channel.unacked[tag] = (value.queue, body, properties)
+                broker.stats['delivered'] += 1
+                self.send(commands.Basic.GetOk(tag, redelivered, '', value.queue, len(queue)), channel_id)
+                self._send_content(channel_id, body, properties)
+        elif name == 'Basic.Ack':
+            self._settle(channel_id, value.delivery_tag, value.multiple, ack=True)
+        elif name in ('Basic.Nack', 'Basic.Reject'):
+            self._settle(channel_id, value.delivery_tag, getattr(value, 'multiple', False), ack=False, requeue=value.requeue)
+        broker.dispatch()
+
+    def _finish_publish(self, channel):
+        method, content, parts = channel.incoming
+        channel.incoming = None
+        self.broker.publish(method.routing_key, b''.join(parts), content.properties)
+        if channel.confirm:
+            channel.publish_seq += 1
+            self.send(commands.Basic.Ack(channel.publish_seq), channel.id)
+
+    def _settle(self, channel_id, delivery_tag, multiple, ack, requeue=True):
+        channel = self.channels.get(channel_id)
+        if channel is None:
+            return
+        tags = [t for t in channel.unacked if t <= delivery_tag] if multiple else [delivery_tag]
+        for tag in tags:
+            item = channel.unacked.pop(tag, None)
+            if item is None:
+                continue
+            if ack:
+                self.broker.stats['acked'] += 1
+            elif requeue:
+                self.broker.requeue(*item)
+
+    def _send_content(self, channel_id, body, properties):
+        self.send(header.ContentHeader(0, len(body), properties), channel_id)
+        step = FRAME_MAX - 8
+        for start in range(0, len(body), step):
+            self.send(ContentBody(body[start:start + step]), channel_id)
+
+    def deliver(self, channel_id, consumer_tag, queue, body, properties, redelivered):
+        channel = self.channels[channel_id]
+        tag = next(channel.delivery_tags)
+        channel.unacked[tag] = (queue, body, properties)
+        self.send(commands.Basic.Deliver(consumer_tag, tag, redelivered, '', queue), channel_id)
+        self._send_content(channel_id, body, properties)
+
+    def _heartbeat_tick(self):
+        if self.closed:
+            return
+        silent = self.broker.loop.time() - self.last_received
+        if silent > self.heartbeat * 2:
+            # RabbitMQ: "missed heartbeats from client, timeout"
+            self.broker.stats['dropped'] += 1
+            self.transport.abort()
+            self._teardown()
+            return
+        self.send(heartbeat.Heartbeat())
+        self._timer = self.broker.loop.call_later(self.heartbeat / 2, self._heartbeat_tick)
+
+    def _close_channel(self, channel_id):
+        channel = self.channels.pop(channel_id, None)
+        if channel is None:
+            return
+        self.broker.consumers = [c for c in self.broker.consumers if c[0][:2] != (self, channel_id)]
+        for queue, body, properties in channel.unacked.values():
+            self.broker.requeue(queue, body, properties)
+        channel.unacked.clear()
+
+    def _teardown(self):
+        if self.closed:
+            return
+        self.closed = True
+        if self._timer is not None:
+            self._timer.cancel()
+        for channel_id in list(self.channels):
+            self._close_channel(channel_id)
+        self.broker.clients.discard(self)
+        self.broker.dispatch()
+
+
+class AmqpStandIn:
+    def __init__(self, heartbeat=2, host='127.0.0.1'):
+        self.heartbeat = heartbeat
+        self.host = host
+        self.port = None
+        self.loop = None
+        self.queues = {}
+        self.consumers = []
+        self.clients = set()
+        self.consumer_tags = itertools.count(1)
+        self.stats = {'published': 0, 'delivered': 0, 'redelivered': 0, 'acked': 0, 'dropped': 0, 'heartbeats': 0}
+        self._server = None
+        self._thread = None
+
+    # 별도 스레드의 event loop에서 실행 (동기 pika consumer와 같은 프로세스에서 사용할 수 있도록)
+    def start(self):
+        ready = threading.Event()
+
+        def run():
+            self.loop = asyncio.new_event_loop()
+            self._server = self.loop.run_until_complete(self.loop.create_server(lambda: _Client(self), self.host, 0))
+            self.port = self._server.sockets[0].getsockname()[1]
+            ready.set()
+            self.loop.run_forever()
+
+        self._thread = threading.Thread(target=run, name='amqp-standin', daemon=True)
+        self._thread.start()
+        ready.wait()
+        return self
+
+    def stop(self):
+        def shutdown():
+            self._server.close()
+            for client in list(self.clients):
+                client.transport.abort()
+            self.loop.stop()
+        self.loop.call_soon_threadsafe(shutdown)
+        self._thread.join(timeout=5)
+
+    def declare(self, queue):
+        return self.queues.setdefault(queue, deque())
+
+    def publish(self, queue, body, properties=None):
+        if self.loop is not None and threading.current_thread() is not self._thread:
+            self.loop.call_soon_threadsafe(self.publish, queue, body, properties)
+            return
+        self.declare(queue).append((body, properties or commands.Basic.Properties(), False))
+        self.stats['published'] += 1
+        self.dispatch()
+
+    def requeue(self, queue, body, properties):
+        self.declare(queue).appendleft((body, properties, True))
+
+    def depth(self, queue):
+        return len(self.queues.get(queue, ()))
+
+    # 대기 중인 메시지를 prefetch 여유가 있는 consumer에게 순서대로 전달
+    def dispatch(self):
+        for queue_name, queue in self.queues.items():
+            while queue:
+                target = None
+                for index, ((client, channel_id, tag), name) in enumerate(self.consumers):
+                    channel = client.channels.get(channel_id)
+                    if name == queue_name and not client.closed and channel is not None and channel.has_capacity():
+                        target = index
+                        break
+                if target is None:
+                    break
+                (client, channel_id, tag), _ = consumer = self.consumers.pop(target)
+                # round robin
+                self.consumers.append(consumer)
+                body, properties, redelivered = queue.popleft()
+                self.stats['delivered'] += 1
+                self.stats['redelivered'] += int(redelivered)
+                client.deliver(channel_id, tag, queue_name, body, properties, redelivered)
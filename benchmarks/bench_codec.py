@@ -0,0 +1,111 @@
+import os
+import sys
+import json
+import time
+import zlib
+import argparse
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src'))
+
+import job_codec
+from job_schema import build_job, build_det_job, with_augmentation, job_properties, decode_job
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+CONFIG_PATH = os.path.join(ROOT, 'temp_config_jm_eff4.yaml')
+
+
+# 실제 producer가 만드는 job dict들 (분류 / det / augmentation / sweep처럼 script_args가 긴 job)
+def make_jobs():
+    jobs = {
+        'classification': build_job('train.py', CONFIG_PATH, '/data/imagenet_sketch', model_name='eff4',
+                                    script_args=['--epochs', '30', '--batch_size', '64'], gpu_memory_mb=12000),
+        'det': build_det_job('tools/train.py', CONFIG_PATH, './work_dirs/faster_rcnn', script_args=['--amp']),
+    }
+    jobs['augmentation'] = with_augmentation(jobs['classification'], 'augmentation.py', '/data/augmented', 4)
+    sweep = dict(jobs['classification'])
+    sweep['script_args'] = sweep['script_args'] + [f"--override.layer{i}.lr={0.001 * i:.4f}" for i in range(200)]
+    jobs['sweep (200 args)'] = sweep
+    return jobs
+
+
+def legacy_encode(job):
+    return zlib.compress(json.dumps(job).encode())
+
+
+def legacy_decode(body):
+    try:
+        body = zlib.decompress(body)
+    except zlib.error:
+        pass
+    return json.loads(body.decode())
+
+
+def timed(fn, repeat):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        result = fn()
+    return (time.perf_counter() - start) / repeat * 1e6, result
+
+
+def bench_variant(name, job, encode, decode, repeat):
+    encode_us, encoded = timed(lambda: encode(job), repeat)
+    decode_us, decoded = timed(lambda: decode(encoded), repeat)
+    assert decoded == job, f"{name}: round trip changed the job"
+    body = encoded[0] if isinstance(encoded, tuple) else encoded
+    print(f"  {name:22s} {len(body):7d} bytes  encode {encode_us:8.1f}us  decode {decode_us:8.1f}us")
+    return len(body)
+
+
+def codec_variant(codec, compress_min_bytes, r=None, max_inline_bytes=0):
+    def encode(job):
+        body, content_type, content_encoding, headers = job_codec.encode(job, r, codec=codec, compress_min_bytes=compress_min_bytes,
+                                                                         max_inline_bytes=max_inline_bytes)
+        return body, job_properties(job, content_type, content_encoding, headers)
+
+    def decode(encoded):
+        return decode_job(encoded[0], encoded[1], r)
+    return encode, decode
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Job message codec benchmark (bytes on the wire, encode/decode time)')
+    parser.add_argument('--repeat', type=int, default=2000)
+    args = parser.parse_args()
+
+    threshold = job_codec.MESSAGE_CONFIG['COMPRESS_MIN_BYTES']
+    variants = [
+        ('legacy zlib(json)', legacy_encode, legacy_decode),
+        ('json', *codec_variant('json', sys.maxsize)),
+        (f'json, zlib>={threshold}B', *codec_variant('json', threshold)),
+    ]
+    if job_codec.msgpack is not None:
+        variants += [
+            ('msgpack', *codec_variant('msgpack', sys.maxsize)),
+            (f'msgpack, zlib>={threshold}B', *codec_variant('msgpack', threshold)),
+        ]
+    else:
+        print("msgpack is not installed, skipping binary codec (pip install msgpack)")
+
+    for job_name, job in make_jobs().items():
+        print(f"{job_name}:")
+        for name, encode, decode in variants:
+            bench_variant(name, job, encode, decode, args.repeat)
+
+    # MAX_INLINE_BYTES를 넘는 job은 Redis에 저장하고 키만 보냄
+    try:
+        import fakeredis
+    except ImportError:
+        print("fakeredis is not installed, skipping by-reference payloads")
+        return
+    r = fakeredis.FakeRedis()
+    big = make_jobs()['sweep (200 args)']
+    big['script_args'] = big['script_args'] * 50
+    print(f"large job ({len(json.dumps(big))} bytes of JSON):")
+    bench_variant('legacy zlib(json)', big, legacy_encode, legacy_decode, args.repeat // 10)
+    inline = bench_variant(f'json, zlib>={threshold}B', big, *codec_variant('json', threshold), args.repeat // 10)
+    by_ref = bench_variant('by reference (redis)', big, *codec_variant('json', threshold, r, max_inline_bytes=1024), args.repeat // 10)
+    assert by_ref < inline
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,323 @@
+import os
+import sys
+import json
+import time
+import shutil
+import logging
+import argparse
+import platform
+import tempfile
+import threading
+import subprocess
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+ROOT = os.path.join(BENCH_DIR, '..')
+sys.path.insert(0, os.path.join(ROOT, 'src'))
+sys.path.insert(0, BENCH_DIR)
+
+from fakes import FakeBroker, FakeConnection, FakeChannel, RoundTripCounter, LocalRedisServer
+
+# consumer engine(engine.py) 전체 경로(메시지 수신 -> 디코딩 -> 결과 캐시 확인 -> GPU 대여 -> 학습 스크립트 실행 -> 메트릭 파싱 -> 반납 -> ack)를
+# RabbitMQ / Redis 없이 실행해서 dispatch 성능을 측정. 결과는 JSON으로 저장해서 이전 실행과 비교할 수 있음
+#   broker: 메모리 broker (fakes.FakeBroker)
+#   redis:  fakeredis, 또는 PATH에 redis-server가 있으면 --redis local로 임시 서버 사용
+#   학습:    dummy_train.py (학습 로그 형식의 줄을 line_rate로 출력)
+#
+#   python benchmarks/bench_e2e.py --jobs 40 --gpus 2 --output results/base.json
+#   python benchmarks/bench_e2e.py --jobs 40 --gpus 2 --compare results/base.json
+#   python benchmarks/bench_e2e.py --jobs 40 --gpus 2 --warm_runner --compare results/base.json  (warm runner로 학습 프로세스 시작)
+DUMMY_SCRIPT = os.path.join(BENCH_DIR, 'dummy_train.py')
+
+CONFIG_TEMPLATE = """model:
+  name: dummy
+training:
+  learning_rate: 0.001
+  epochs: {epochs}
+data:
+  data_dir: ./data
+"""
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description='End-to-end consumer dispatch benchmark (offline)')
+    parser.add_argument('--jobs', type=int, default=40)
+    parser.add_argument('--gpus', type=int, default=2, help='Fake GPUs (static inventory)')
+    parser.add_argument('--jobs_per_gpu', type=int, default=1)
+    parser.add_argument('--workers', type=int, default=0, help='Consumer workers (0 = gpus * jobs_per_gpu, more = lease contention)')
+    parser.add_argument('--rate', type=float, default=0, help='Submit rate in jobs/sec (0 = all at once = saturation)')
+    parser.add_argument('--epochs', type=int, default=3)
+    parser.add_argument('--lines_per_epoch', type=int, default=200)
+    parser.add_argument('--line_rate', type=float, default=0, help='Lines/sec printed by each dummy job (0 = as fast as possible)')
+    parser.add_argument('--parser_lines', type=int, default=100000, help='Lines for the in-process parser throughput run')
+    parser.add_argument('--redis', choices=['auto', 'fake', 'local'], default='auto')
+    parser.add_argument('--output', type=str, help='Write results JSON here')
+    parser.add_argument('--compare', type=str, help='Previous results JSON to compare against')
+    parser.add_argument('--det_every', type=int, default=0, help='Make every Nth job an mmdetection job (mixed job types sharing the GPU pool)')
+    parser.add_argument('--warm_runner', action='store_true', help='Start dummy jobs from the warm runner (fork) instead of a new interpreter')
+    return parser.parse_args()
+
+
+def percentiles(values):
+    if not values:
+        return None
+    ordered = sorted(values)
+    pick = lambda q: ordered[min(int(len(ordered) * q), len(ordered) - 1)]
+    return {'mean': sum(ordered) / len(ordered), 'p50': pick(0.5), 'p90': pick(0.9), 'p99': pick(0.99), 'max': ordered[-1]}
+
+
+def git_commit():
+    try:
+        return subprocess.check_output(['git', 'rev-parse', '--short', 'HEAD'], cwd=ROOT, stderr=subprocess.DEVNULL, text=True).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+# 가짜 프로젝트 경로 (config + run_job이 확인하는 train.json / test.json)
+def prepare_workdir(workdir, epochs):
+    os.makedirs(os.path.join(workdir, 'data'), exist_ok=True)
+    for name in ('train.json', 'test.json'):
+        with open(os.path.join(workdir, 'data', name), 'w') as f:
+            f.write('[]')
+    with open(os.path.join(workdir, 'config.yaml'), 'w') as f:
+        f.write(CONFIG_TEMPLATE.format(epochs=epochs))
+    out_dir = os.path.join(workdir, 'starts')
+    os.makedirs(out_dir, exist_ok=True)
+    return out_dir
+
+
+# consumer를 import하기 전에 환경변수로 설정 (config.py가 import 시점에 읽음)
+def configure_env(args, workdir, redis_port):
+    os.environ.update({
+        'GPU_INVENTORY': 'static:' + ','.join(['81920'] * args.gpus),
+        'CONSUMER_JOBS_PER_GPU': str(args.jobs_per_gpu),
+        'MAIN_PROJECT_ROOT': workdir,
+        'DATASET_CACHE_MAX_GB': '0',
+        'CONFIG_CACHE_DIR': os.path.join(workdir, 'config_cache'),
+        'NODE_ID': 'bench',
+        'USER_NAME': 'bench',
+        'LOG_LEVEL': 'WARNING',
+    })
+    if redis_port:
+        os.environ.update({'REDIS_HOST': '127.0.0.1', 'REDIS_PORT': str(redis_port), 'REDIS_PASSWORD': ''})
+
+
+def import_consumer(backend):
+    if backend == 'fake':
+        # 모든 redis.Redis(...) 연결이 같은 fakeredis 서버를 보도록 교체 (host/port가 같으면 상태 공유)
+        import redis
+        import fakeredis
+        redis.Redis = fakeredis.FakeRedis
+    import engine
+    engine.logger.setLevel(logging.WARNING)
+    return engine
+
+
+# GPU 대여 대기 시간 / 시도 횟수 기록
+class LeaseProbe:
+    def __init__(self, consumer):
+        self.waits = []
+        self.attempts = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        pool = consumer.gpu_pool
+        try_acquire = pool.try_acquire
+        get_available_gpu = consumer.get_available_gpu
+
+        def probed_try_acquire(*a, **kw):
+            gpu_id = try_acquire(*a, **kw)
+            with self._lock:
+                self.attempts += 1
+                self.misses += gpu_id is None
+            return gpu_id
+
+        def probed_get_available_gpu(*a, **kw):
+            start = time.perf_counter()
+            gpu_id = get_available_gpu(*a, **kw)
+            with self._lock:
+                self.waits.append(time.perf_counter() - start)
+            return gpu_id
+
+        pool.try_acquire = probed_try_acquire
+        consumer.get_available_gpu = probed_get_available_gpu
+
+    def summary(self):
+        return {
+            'wait_ms': percentiles([w * 1000 for w in self.waits]),
+            'attempts': self.attempts,
+            'misses': self.misses,
+            'miss_ratio': self.misses / self.attempts if self.attempts else 0.0,
+        }
+
+
+def run_dispatch(consumer, args, workdir, out_dir, counter):
+    from config import RABBITMQ_CONFIG, CONSUMER_CONFIG
+    from job_schema import build_job, build_det_job, encode_message
+    from worker_pool import JobWorkerPool
+
+    broker = FakeBroker()
+    connection = FakeConnection()
+    channel = FakeChannel(broker, connection)
+    queue = RABBITMQ_CONFIG['QUEUE']
+    broker.queue_declare(queue)
+
+    consumer.initialize_gpu_list(consumer.r)
+    probe = LeaseProbe(consumer)
+    workers = args.workers or consumer.gpu_pool.size * CONSUMER_CONFIG['JOBS_PER_GPU']
+    pool = JobWorkerPool(consumer.process_message, workers)
+
+    config_path = os.path.join(workdir, 'config.yaml')
+    jobs = []
+    for i in range(args.jobs):
+        tag = f"job{i:05d}"
+        script_args = ['--bench_out', out_dir, '--bench_tag', tag, '--epochs', str(args.epochs),
+                       '--lines_per_epoch', str(args.lines_per_epoch), '--line_rate', str(args.line_rate)]
+        if args.det_every and i % args.det_every == args.det_every - 1:
+            jobs.append(build_det_job(DUMMY_SCRIPT, config_path, os.path.join(workdir, 'work_dirs', tag), script_args=script_args))
+        else:
+            jobs.append(build_job(DUMMY_SCRIPT, config_path, 'data', script_args=script_args))
+
+    # 제출은 별도 스레드에서 (broker 조작은 connection 스레드로 넘김)
+    def submit():
+        start = time.monotonic()
+        for i, job in enumerate(jobs):
+            if args.rate > 0:
+                delay = start + i / args.rate - time.monotonic()
+                if delay > 0:
+                    time.sleep(delay)
+            job['submitted_at'] = time.time()
+            body, properties = encode_message(job, consumer.r)
+            connection.add_callback_threadsafe(lambda body=body, properties=properties: broker.publish(queue, body, properties=properties))
+
+    round_trips_before = counter.count
+    started = time.perf_counter()
+    submitter = threading.Thread(target=submit, daemon=True)
+    submitter.start()
+    # connection 스레드: prefetch(=workers)만큼 전달하고 ack 콜백 처리
+    while broker.acked < len(jobs):
+        while len(broker.unacked) < workers:
+            method, properties, body = broker.get(queue)
+            if method is None:
+                break
+            pool.on_message(channel, method, properties, body)
+        connection.process_data_events(time_limit=0.01)
+    makespan = time.perf_counter() - started
+    round_trips = counter.count - round_trips_before
+    pool.shutdown()
+    consumer.leave_cluster()
+
+    latencies = []
+    for i, job in enumerate(jobs):
+        path = os.path.join(out_dir, f"job{i:05d}.start")
+        if os.path.exists(path):
+            with open(path) as f:
+                latencies.append((float(f.read()) - job['submitted_at']) * 1000)
+
+    # job_trace로 기록된 구간별 시간 (queue, gpu wait, config, interpreter/import ...)
+    from job_trace import load_trace, phases
+    phase_ms = {}
+    for job in jobs:
+        for name, start, end, seconds in phases(load_trace(consumer.r, job['job_id'])):
+            phase_ms.setdefault(name, []).append(seconds * 1000)
+
+    # 마지막 Val Metric까지 파싱돼서 redis에 들어간 job = 정상 완료
+    completed = sum(1 for job in jobs if consumer.get_latest(consumer.r, job['job_id'], 'val_metric'))
+    lines_per_job = args.epochs * (args.lines_per_epoch + 3)
+    return {
+        'jobs': len(jobs),
+        'workers': workers,
+        'started_jobs': len(latencies),
+        'completed_jobs': completed,
+        'makespan_s': makespan,
+        'jobs_per_sec': len(jobs) / makespan,
+        'consumer_lines_per_sec': lines_per_job * len(latencies) / makespan,
+        'submit_to_start_ms': percentiles(latencies),
+        'gpu_lease': probe.summary(),
+        'phases_ms': {name: percentiles(values) for name, values in phase_ms.items()},
+        'redis_round_trips_per_job': round_trips / len(jobs),
+    }
+
+
+# consumer와 같은 redis 연결로 MetricParser 처리량 측정 (subprocess 없이 파서만)
+def run_parser(consumer, lines, counter):
+    from bench_parser import make_lines
+    from metric_parser import MetricParser
+    from metric_store import MetricStore
+
+    epochs = 50
+    sample = make_lines(epochs, max(lines // epochs - 4, 1))
+    before = counter.count
+    start = time.perf_counter()
+    parser = MetricParser(MetricStore(consumer.r, 'bench-parser'))
+    for line in sample:
+        parser.feed(line)
+    parser.close()
+    elapsed = time.perf_counter() - start
+    return {'lines': len(sample), 'lines_per_sec': len(sample) / elapsed, 'redis_round_trips_per_line': (counter.count - before) / len(sample)}
+
+
+def flatten(d, prefix=''):
+    items = {}
+    for key, value in d.items():
+        name = f"{prefix}{key}"
+        if isinstance(value, dict):
+            items.update(flatten(value, name + '.'))
+        elif isinstance(value, (int, float)) and not isinstance(value, bool):
+            items[name] = value
+    return items
+
+
+def compare(baseline, results):
+    old, new = flatten(baseline.get('results', {})), flatten(results['results'])
+    print(f"\ncompared with {baseline.get('git_commit')} ({baseline.get('timestamp')}):")
+    for name in sorted(set(old) & set(new)):
+        change = (new[name] - old[name]) / old[name] * 100 if old[name] else 0.0
+        print(f"  {name:40s} {old[name]:14.3f} -> {new[name]:14.3f}  ({change:+.1f}%)")
+
+
+def main():
+    args = parse_args()
+    backend = args.redis
+    if backend == 'auto':
+        backend = 'local' if LocalRedisServer.available() else 'fake'
+
+    server = LocalRedisServer().start() if backend == 'local' else None
+    workdir = tempfile.mkdtemp(prefix='bench_e2e_')
+    try:
+        out_dir = prepare_workdir(workdir, args.epochs)
+        configure_env(args, workdir, server.port if server else None)
+        counter = RoundTripCounter().install()
+        consumer = import_consumer(backend)
+        if args.warm_runner:
+            consumer.start_warm_runner(['argparse', 'random'])
+
+        results = {
+            'dispatch': run_dispatch(consumer, args, workdir, out_dir, counter),
+            'parser': run_parser(consumer, args.parser_lines, counter),
+        }
+        report = {
+            'benchmark': 'e2e',
+            'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+            'git_commit': git_commit(),
+            'python': platform.python_version(),
+            'redis': backend,
+            'params': vars(args),
+            'results': results,
+        }
+        print(json.dumps(report, indent=2))
+        if args.output:
+            os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+            with open(args.output, 'w') as f:
+                json.dump(report, f, indent=2)
+        if args.compare:
+            with open(args.compare) as f:
+                compare(json.load(f), report)
+    finally:
+        if args.warm_runner:
+            consumer.stop_warm_runner()
+        if server is not None:
+            server.stop()
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,72 @@
+import os
+import sys
+import heapq
+import argparse
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src'))
+
+from gpu_inventory import StaticGpuInventory
+from gpu_pool import pick_device
+
+# GPU bin-packing을 가짜 inventory로 재현 (CPU 전용 머신에서도 실행 가능, 항상 같은 결과)
+# 같은 job 목록을 "GPU 하나에 job 하나"와 "메모리 지정 job끼리 공유" 두 방식으로 돌려 전체 완료 시간을 비교
+#   small: 메모리 12GB, 60분 (EfficientNet 급)
+#   large: GPU 전체, 240분
+
+
+def make_jobs(small, large):
+    jobs = []
+    for i in range(max(small, large)):
+        if i < large:
+            jobs.append(('large', None, 240.0))
+        if i < small:
+            jobs.append(('small', 12 * 1024, 60.0))
+    return jobs
+
+
+# 앞에서부터 순서대로 배치 (앞 job이 못 들어가면 뒤 job도 기다림 = 큐 순서 유지)
+def simulate(devices, jobs, packing):
+    capacity = {d.id: d.memory_mb for d in devices}
+    leases = {}
+    running = []
+    pending = list(jobs)
+    now = 0.0
+    peak_jobs = 0
+    seq = 0
+    while pending or running:
+        while pending:
+            kind, memory_mb, duration = pending[0]
+            picked = pick_device(capacity, list(leases.values()), memory_mb if packing else None)
+            if picked is None:
+                break
+            gpu_id, lease_memory, lease_share = picked
+            pending.pop(0)
+            seq += 1
+            leases[seq] = {'gpu': gpu_id, 'memory_mb': lease_memory, 'share': lease_share}
+            heapq.heappush(running, (now + duration, seq))
+        peak_jobs = max(peak_jobs, len(running))
+        now, finished = heapq.heappop(running)
+        del leases[finished]
+    return now, peak_jobs
+
+
+def main():
+    parser = argparse.ArgumentParser(description='GPU bin-packing simulation on a fake inventory')
+    parser.add_argument('--gpus', type=str, default='81920,81920,81920,81920', help='GPU memory list in MB')
+    parser.add_argument('--small', type=int, default=48)
+    parser.add_argument('--large', type=int, default=4)
+    args = parser.parse_args()
+
+    devices = StaticGpuInventory(args.gpus.split(',')).devices()
+    jobs = make_jobs(args.small, args.large)
+
+    exclusive, exclusive_peak = simulate(devices, jobs, packing=False)
+    packed, packed_peak = simulate(devices, jobs, packing=True)
+    print(f"{len(jobs)} jobs on {len(devices)} GPUs {[d.memory_mb for d in devices]}")
+    print(f"  one job per GPU : makespan {exclusive:7.0f} min, max concurrent {exclusive_peak}")
+    print(f"  bin-packed      : makespan {packed:7.0f} min, max concurrent {packed_peak}")
+    print(f"  speedup         : {exclusive / packed:.2f}x")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,186 @@
+import os
+import sys
+import json
+import time
+import shutil
+import asyncio
+import logging
+import argparse
+import tempfile
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(BENCH_DIR, '..', 'src'))
+sys.path.insert(0, BENCH_DIR)
+
+from amqp_standin import AmqpStandIn
+from bench_e2e import DUMMY_SCRIPT, prepare_workdir
+
+# 긴 job 중에도 broker 연결이 유지되는지 확인: heartbeat를 짧게(기본 1초) 협상한 로컬 broker(amqp_standin)에
+# heartbeat 간격보다 훨씬 긴 dummy job 하나를 보내고, consumer core별로
+#   학습 실행 횟수(broker 전달 수), ack 수, broker가 끊은 연결 수, job 실행 중 받은 heartbeat, 실행 중 Redis에 보인 에폭 수
+# 를 비교. pika core는 콜백 안에서 학습이 도는 동안 heartbeat를 못 보내서 연결이 끊기고 같은 job이 다시 실행됨
+#   python benchmarks/bench_heartbeat.py --heartbeat 1 --job_seconds 6
+#   python benchmarks/bench_heartbeat.py --core async --output results/heartbeat.json
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description='Broker heartbeat survival during long jobs: pika core vs asyncio core')
+    parser.add_argument('--core', choices=['pika', 'async', 'both'], default='both')
+    parser.add_argument('--heartbeat', type=int, default=1, help='Heartbeat seconds negotiated with the stand-in broker')
+    parser.add_argument('--job_seconds', type=float, default=6, help='Dummy job runtime (should be several heartbeats long)')
+    parser.add_argument('--epochs', type=int, default=3)
+    parser.add_argument('--output', type=str, help='Write results JSON here')
+    return parser.parse_args()
+
+
+# consumer를 import하기 전에 환경변수로 설정 (config.py가 import 시점에 읽음)
+def configure_env(args, workdir, port):
+    os.environ.update({
+        'RABBITMQ_HOST': '127.0.0.1',
+        'RABBITMQ_PORT': str(port),
+        'RABBITMQ_HEARTBEAT': str(args.heartbeat),
+        'GPU_INVENTORY': 'static:81920',
+        'CONSUMER_WORKERS': '1',
+        'MAIN_PROJECT_ROOT': workdir,
+        'DATASET_CACHE_MAX_GB': '0',
+        'CONFIG_CACHE_DIR': os.path.join(workdir, 'config_cache'),
+        'NODE_ID': 'bench',
+        'USER_NAME': 'bench',
+        'METRICS_PORT': '0',
+        'METRICS_PROBE_INTERVAL': '0',
+        'LOG_LEVEL': 'WARNING',
+    })
+
+
+def import_engines():
+    # 모든 redis 연결(동기 / asyncio)이 같은 fakeredis 서버를 보도록 교체
+    import redis
+    import redis.asyncio
+    import fakeredis
+    redis.Redis = fakeredis.FakeRedis
+    redis.asyncio.Redis = fakeredis.FakeAsyncRedis
+    import engine
+    import async_engine
+    engine.logger.setLevel(logging.WARNING)
+    return engine, async_engine
+
+
+def make_job(args, workdir, out_dir, tag):
+    from job_schema import build_job
+    lines_per_epoch = 20
+    line_rate = args.epochs * (lines_per_epoch + 3) / args.job_seconds
+    script_args = ['--bench_out', out_dir, '--bench_tag', tag, '--epochs', str(args.epochs),
+                   '--lines_per_epoch', str(lines_per_epoch), '--line_rate', f"{line_rate:.3f}"]
+    job = build_job(DUMMY_SCRIPT, os.path.join(workdir, 'config.yaml'), 'data', script_args=script_args)
+    job['submitted_at'] = time.time()
+    # 다시 전달됐을 때 결과 캐시로 건너뛰지 않고 실제로 다시 학습하도록 (중복 실행 확인용)
+    job['force'] = True
+    return job
+
+
+# producer와 같이 pika로 발행 (stand-in broker를 실제 소켓으로 거침)
+def publish(engine, queue, job):
+    from job_schema import encode_message
+    body, properties = encode_message(job, engine.r)
+    connection, channel = engine.connect_to_rabbitmq()
+    channel.queue_declare(queue=queue)
+    channel.basic_publish(exchange='', routing_key=queue, body=body, properties=properties)
+    connection.close()
+
+
+# engine.py 기본 경로(CONSUMER_WORKERS=1: pika 콜백 안에서 학습)와 같은 방식으로, main()처럼 끊기면 다시 연결하며 deadline까지 처리
+def run_pika(engine, args):
+    deadline = time.monotonic() + args.job_seconds * 2 + 2
+    while time.monotonic() < deadline:
+        connection = None
+        try:
+            connection, channel = engine.connect_to_rabbitmq()
+            channel.basic_qos(prefetch_count=1)
+            channel.basic_consume(queue=engine.RABBITMQ_CONFIG['QUEUE'], on_message_callback=engine.callback)
+            connection.call_later(max(deadline - time.monotonic(), 0.01), channel.stop_consuming)
+            channel.start_consuming()
+        except Exception as e:
+            print(f"  pika: {type(e).__name__} {e}")
+            time.sleep(0.5)
+        finally:
+            if connection is not None and connection.is_open:
+                connection.close()
+
+
+# async_engine.serve를 job이 ack될 때까지 실행. 그동안 Redis의 진행 상황(현재 에폭)을 주기적으로 확인
+def run_async(async_engine, broker, args, job_id):
+    from metric_store import get_summary
+    seen_epochs = set()
+
+    async def run():
+        stop = asyncio.Event()
+        server = asyncio.create_task(async_engine.serve(stop))
+        acked = broker.stats['acked']
+        deadline = time.monotonic() + args.job_seconds * 3 + 5
+        while broker.stats['acked'] == acked and time.monotonic() < deadline and not server.done():
+            summary = await asyncio.to_thread(get_summary, async_engine.r, job_id)
+            if 'current_epoch' in summary:
+                seen_epochs.add(summary['current_epoch'])
+            await asyncio.sleep(0.2)
+        stop.set()
+        await server
+
+    asyncio.run(run())
+    async_engine.leave_cluster()
+    return len(seen_epochs)
+
+
+def run_core(core, engines, broker, args, workdir, out_dir):
+    engine, async_engine = engines
+    from config import RABBITMQ_CONFIG
+    # core마다 다른 큐를 써서 앞 core에서 남은 메시지가 섞이지 않게 함
+    RABBITMQ_CONFIG['QUEUE'] = f"gpu_tasks_bench_{core}"
+    job = make_job(args, workdir, out_dir, core)
+    publish(engine, RABBITMQ_CONFIG['QUEUE'], job)
+    before = dict(broker.stats)
+    started = time.perf_counter()
+    epochs_seen = None
+    if core == 'pika':
+        engine.initialize_gpu_list(engine.r)
+        run_pika(engine, args)
+        engine.leave_cluster()
+    else:
+        epochs_seen = run_async(async_engine, broker, args, job['job_id'])
+    elapsed = time.perf_counter() - started
+    stats = {name: broker.stats[name] - before[name] for name in broker.stats}
+    result = {
+        'training_runs': stats['delivered'],
+        'redelivered': stats['redelivered'],
+        'acked': stats['acked'],
+        'connections_dropped': stats['dropped'],
+        'heartbeats_received': stats['heartbeats'],
+        'epochs_seen_while_running': epochs_seen,
+        'elapsed_s': elapsed,
+    }
+    print(f"  {core:6s} training runs {result['training_runs']}  acked {result['acked']}  dropped connections {result['connections_dropped']}  "
+          f"heartbeats {result['heartbeats_received']}" + (f"  epochs seen while running {epochs_seen}/{args.epochs}" if epochs_seen is not None else ''))
+    return result
+
+
+def main():
+    args = parse_args()
+    broker = AmqpStandIn(heartbeat=args.heartbeat).start()
+    workdir = tempfile.mkdtemp(prefix='bench_heartbeat_')
+    try:
+        out_dir = prepare_workdir(workdir, args.epochs)
+        configure_env(args, workdir, broker.port)
+        engines = import_engines()
+        print(f"heartbeat {args.heartbeat}s, job {args.job_seconds}s (broker drops a silent client after {args.heartbeat * 2}s)")
+        cores = ['pika', 'async'] if args.core == 'both' else [args.core]
+        results = {core: run_core(core, engines, broker, args, workdir, out_dir) for core in cores}
+        if args.output:
+            os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+            with open(args.output, 'w') as f:
+                json.dump({'benchmark': 'heartbeat', 'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'), 'params': vars(args), 'results': results}, f, indent=2)
+    finally:
+        broker.stop()
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    main()
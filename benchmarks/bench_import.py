@@ -0,0 +1,140 @@
+import os
+import sys
+import json
+import time
+import argparse
+import platform
+import subprocess
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+ROOT = os.path.join(BENCH_DIR, '..')
+SRC_DIR = os.path.join(ROOT, 'src')
+
+# consumer 재시작이 얼마나 빨리 job을 받을 수 있는지: 모듈 import 시간 + GPU 조회 시간
+# 매번 새 python 프로세스에서 python -X importtime으로 재서, 무거운 import가 다시 들어오면 바로 보이게 함
+#   python benchmarks/bench_import.py --runs 10 --output results/import.json
+#   python benchmarks/bench_import.py --inventory auto --compare results/import.json   (GPU 서버에서 실제 조회 포함)
+MODULES = ('engine', 'producer', 'job_client')
+
+# 자식 프로세스에서 실행: import -> GPU 조회까지 시간을 JSON 한 줄로 출력
+PROBE = '''import time, json
+start = time.perf_counter()
+import {module}
+imported = time.perf_counter()
+devices = None
+if {discover} and hasattr({module}, 'gpu_inventory'):
+    devices = len({module}.gpu_inventory.devices())
+print(json.dumps({{"import_ms": (imported - start) * 1000, "ready_ms": (time.perf_counter() - start) * 1000, "gpus": devices}}))
+'''
+
+
+def percentiles(values):
+    ordered = sorted(values)
+    pick = lambda q: ordered[min(int(len(ordered) * q), len(ordered) - 1)]
+    return {'mean': sum(ordered) / len(ordered), 'p50': pick(0.5), 'p90': pick(0.9), 'max': ordered[-1]}
+
+
+# python -X importtime 출력 -> {모듈: 누적 us} (최상위 import만)
+def parse_importtime(stderr, depth=1):
+    modules = {}
+    for line in stderr.splitlines():
+        if not line.startswith('import time:') or 'imported package' in line:
+            continue
+        _, cumulative, name = line[len('import time:'):].split('|')
+        indent = len(name) - len(name.lstrip(' '))
+        # 대상 모듈 자체는 공백 1칸, 그 모듈이 직접 import한 모듈은 3칸
+        if indent == 1 + 2 * depth:
+            modules[name.strip()] = int(cumulative)
+    return modules
+
+
+def run_probe(module, discover, env):
+    result = subprocess.run([sys.executable, '-X', 'importtime', '-c', PROBE.format(module=module, discover=discover)],
+                            cwd=SRC_DIR, env=env, capture_output=True, text=True)
+    if result.returncode != 0:
+        raise RuntimeError(f"import {module} failed:\n{result.stderr[-2000:]}")
+    timing = json.loads(result.stdout.strip().splitlines()[-1])
+    return timing, parse_importtime(result.stderr)
+
+
+def bench_module(module, runs, discover, env, top):
+    imports, ready, heaviest = [], [], {}
+    # 첫 실행은 .pyc 생성이 섞이므로 버림
+    run_probe(module, discover, env)
+    for _ in range(runs):
+        timing, modules = run_probe(module, discover, env)
+        imports.append(timing['import_ms'])
+        ready.append(timing['ready_ms'])
+        for name, us in modules.items():
+            heaviest.setdefault(name, []).append(us / 1000)
+    top_imports = sorted(((name, percentiles(values)['p50']) for name, values in heaviest.items()), key=lambda x: -x[1])[:top]
+    result = {'import_ms': percentiles(imports), 'ready_ms': percentiles(ready),
+              'top_imports_ms': {name: ms for name, ms in top_imports}}
+    print(f"  {module:14s} import p50 {result['import_ms']['p50']:8.1f}ms  max {result['import_ms']['max']:8.1f}ms"
+          + (f"   import + GPU discovery p50 {result['ready_ms']['p50']:8.1f}ms" if discover else ''))
+    for name, ms in top_imports:
+        print(f"      {name:30s} {ms:8.1f}ms")
+    return result
+
+
+def flatten(d, prefix=''):
+    items = {}
+    for key, value in d.items():
+        name = f"{prefix}{key}"
+        if isinstance(value, dict):
+            items.update(flatten(value, name + '.'))
+        elif isinstance(value, (int, float)) and not isinstance(value, bool):
+            items[name] = value
+    return items
+
+
+def git_commit():
+    try:
+        return subprocess.check_output(['git', 'rev-parse', '--short', 'HEAD'], cwd=ROOT, stderr=subprocess.DEVNULL, text=True).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Import time / startup-to-ready benchmark for consumer and producer modules')
+    parser.add_argument('--modules', default=','.join(MODULES))
+    parser.add_argument('--runs', type=int, default=10)
+    parser.add_argument('--inventory', default='fake:2', help='GPU_INVENTORY for the discovery step (auto / nvml / nvidia-smi / torch on a GPU server)')
+    parser.add_argument('--top', type=int, default=5, help='Show this many heaviest direct imports per module')
+    parser.add_argument('--output', type=str, help='Write results JSON here')
+    parser.add_argument('--compare', type=str, help='Previous results JSON to compare against')
+    args = parser.parse_args()
+
+    # GPU 조회 캐시를 끄고 매번 실제로 조회
+    env = dict(os.environ, GPU_INVENTORY=args.inventory, GPU_INVENTORY_CACHE_TTL='0')
+    print(f"{args.runs} fresh interpreters per module, GPU_INVENTORY={args.inventory}")
+    results = {}
+    for module in [m.strip() for m in args.modules.split(',') if m.strip()]:
+        results[module] = bench_module(module, args.runs, module == 'engine', env, args.top)
+
+    report = {
+        'benchmark': 'import',
+        'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'git_commit': git_commit(),
+        'python': platform.python_version(),
+        'params': vars(args),
+        'results': results,
+    }
+    if args.output:
+        os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        old, new = flatten(baseline.get('results', {})), flatten(results)
+        print(f"\ncompared with {baseline.get('git_commit')} ({baseline.get('timestamp')}):")
+        for name in sorted(set(old) & set(new)):
+            if '.top_imports_ms.' in name:
+                continue
+            change = (new[name] - old[name]) / old[name] * 100 if old[name] else 0.0
+            print(f"  {name:40s} {old[name]:10.1f} -> {new[name]:10.1f}  ({change:+.1f}%)")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,155 @@
+import os
+import sys
+import json
+import time
+import logging
+import argparse
+import subprocess
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(BENCH_DIR, '..', 'src'))
+sys.path.insert(0, BENCH_DIR)
+
+from fakes import LocalRedisServer
+
+# 학습 로그 전송(job_logs.JobLogSink) 성능
+#   reader: 학습 프로세스가 최대 속도로 찍는 줄을 consumer와 같은 경로(stream_process -> process_output)로 읽을 때 lines/sec
+#           console(예전 방식: 줄마다 logger.info) / stream(Redis stream으로 전송) / none 비교
+#   flood:  Redis가 느릴 때(--redis_delay_ms) write()가 기다리지 않는지 (줄당 write 지연 p50/p99/max, 버린 줄 수)
+#   python benchmarks/bench_logs.py --lines 500000
+#   python benchmarks/bench_logs.py --redis fake --redis_delay_ms 50 --output results/logs.json
+
+PRINTER = '''import sys
+write = sys.stdout.write
+for i in range({lines}):
+    write(f"{{i // 1000:03d}} [{{i % 1000}}/1000] lr: 1.0000e-04, eta: 0:12:34, time: 0.512, loss_cls: 0.{{i % 9973:04d}}\\n")
+'''
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description='Job log shipping benchmark (ring buffer -> capped Redis stream)')
+    parser.add_argument('--lines', type=int, default=500000, help='Lines printed by the fake training process')
+    parser.add_argument('--flood_lines', type=int, default=200000, help='Lines written directly to the sink in the flood run')
+    parser.add_argument('--redis_delay_ms', type=float, default=50, help='Extra delay per Redis pipeline in the flood run (slow Redis)')
+    parser.add_argument('--modes', default='none,stream,console')
+    parser.add_argument('--redis', choices=['auto', 'fake', 'local'], default='auto')
+    parser.add_argument('--output', type=str, help='Write results JSON here')
+    return parser.parse_args()
+
+
+def percentiles(values):
+    ordered = sorted(values)
+    pick = lambda q: ordered[min(int(len(ordered) * q), len(ordered) - 1)]
+    return {'p50': pick(0.5), 'p99': pick(0.99), 'p999': pick(0.999), 'max': ordered[-1]}
+
+
+# pipeline 실행마다 delay초 기다리는 Redis (느린 Redis / 네트워크 흉내)
+class SlowRedis:
+    def __init__(self, r, delay):
+        self.r = r
+        self.delay = delay
+
+    def pipeline(self, transaction=True):
+        pipe = self.r.pipeline(transaction=transaction)
+        execute = pipe.execute
+
+        def slow_execute(*args, **kwargs):
+            time.sleep(self.delay)
+            return execute(*args, **kwargs)
+        pipe.execute = slow_execute
+        return pipe
+
+
+def run_reader(engine, r, mode, lines):
+    from metric_parser import MetricParser
+    from metric_store import MetricStore
+    from process_stream import stream_process
+
+    job_id = f"bench-logs-{mode}"
+    engine.JOB_LOG_CONFIG['CONSOLE'] = mode == 'console'
+    sink = engine.open_log_sink(job_id) if mode == 'stream' else None
+    parser = MetricParser(MetricStore(r, job_id))
+    start = time.perf_counter()
+    process = subprocess.Popen([sys.executable, '-c', PRINTER.format(lines=lines)], stdout=subprocess.PIPE, stderr=subprocess.PIPE,
+                               text=True, bufsize=1)
+    stream_process(process, lambda line, source: engine.process_output(line, parser, source, None, sink))
+    process.wait()
+    elapsed = time.perf_counter() - start
+    parser.close()
+    result = {'lines_per_sec': lines / elapsed, 'seconds': elapsed}
+    if sink is not None:
+        sink.close(process.returncode)
+        result.update(shipped=sink.shipped_total, dropped=sink.dropped_total, stream_length=r.xlen(sink.key))
+    print(f"  reader {mode:8s} {result['lines_per_sec']:12,.0f} lines/sec" +
+          (f"   shipped {result['shipped']}  dropped {result['dropped']}  stream length {result['stream_length']}" if sink else ''))
+    return result
+
+
+def run_flood(r, args):
+    from config import JOB_LOG_CONFIG
+    from job_logs import JobLogSink, tail
+
+    sink = JobLogSink(SlowRedis(r, args.redis_delay_ms / 1000), 'bench-logs-flood', JOB_LOG_CONFIG['MAXLEN'], JOB_LOG_CONFIG['BUFFER_LINES'],
+                      JOB_LOG_CONFIG['BATCH_LINES'], JOB_LOG_CONFIG['FLUSH_INTERVAL'], JOB_LOG_CONFIG['TTL'])
+    line = "001 [123/1000] lr: 1.0000e-04, eta: 0:12:34, time: 0.512, loss_cls: 0.1234"
+    latencies = []
+    clock = time.perf_counter_ns
+    start = time.perf_counter()
+    for _ in range(args.flood_lines):
+        t = clock()
+        sink.write(line)
+        latencies.append(clock() - t)
+    elapsed = time.perf_counter() - start
+    sink.close(0)
+    entries = list(tail(r, 'bench-logs-flood', '0'))
+    result = {
+        'lines_per_sec': args.flood_lines / elapsed,
+        'write_us': {k: v / 1000 for k, v in percentiles(latencies).items()},
+        'shipped': sink.shipped_total,
+        'dropped': sink.dropped_total,
+        'dropped_markers': sum(1 for e in entries if e.dropped),
+        'stream_length': len(entries),
+        'ended': bool(entries and entries[-1].end),
+    }
+    print(f"  flood  ({args.redis_delay_ms:.0f}ms per Redis pipeline) {result['lines_per_sec']:12,.0f} lines/sec  "
+          f"write p99 {result['write_us']['p99']:.1f}us max {result['write_us']['max']:.1f}us   "
+          f"shipped {result['shipped']}  dropped {result['dropped']} (in {result['dropped_markers']} markers)  stream length {result['stream_length']}")
+    return result
+
+
+def main():
+    args = parse_args()
+    backend = args.redis
+    if backend == 'auto':
+        backend = 'local' if LocalRedisServer.available() else 'fake'
+    server = LocalRedisServer().start() if backend == 'local' else None
+    try:
+        os.environ.update({'GPU_INVENTORY': 'fake:1', 'METRICS_PORT': '0', 'NODE_ID': 'bench', 'LOG_LEVEL': 'WARNING'})
+        if server is not None:
+            os.environ.update({'REDIS_HOST': '127.0.0.1', 'REDIS_PORT': str(server.port), 'REDIS_PASSWORD': ''})
+        else:
+            import redis
+            import fakeredis
+            redis.Redis = fakeredis.FakeRedis
+        import engine
+        # console 모드의 출력은 버림 (터미널 속도가 아니라 logging 비용만 비교)
+        devnull = open(os.devnull, 'w')
+        for handler in logging.getLogger().handlers + [engine.console_handler]:
+            handler.setStream(devnull)
+
+        r = engine.r
+        print(f"redis: {backend}, {args.lines} lines per reader run")
+        results = {'reader': {mode: run_reader(engine, r, mode, args.lines) for mode in args.modes.split(',') if mode}}
+        results['flood'] = run_flood(r, args)
+        if args.output:
+            os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+            with open(args.output, 'w') as f:
+                json.dump({'benchmark': 'logs', 'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'), 'redis': backend,
+                           'params': vars(args), 'results': results}, f, indent=2)
+    finally:
+        if server is not None:
+            server.stop()
+
+
+if __name__ == '__main__':
+    main()
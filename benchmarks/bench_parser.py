@@ -0,0 +1,110 @@
+import os
+import re
+import sys
+import time
+import random
+import argparse
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src'))
+
+from metric_parser import MetricParser
+from metric_store import MetricStore
+
+
+# pipeline 안의 명령은 세지 않고 execute 한 번을 왕복 1회로 셈
+class CountingPipeline:
+    def __init__(self, parent):
+        self.parent = parent
+
+    def __getattr__(self, name):
+        return lambda *args, **kwargs: self
+
+    def execute(self):
+        self.parent.calls += 1
+
+
+# redis 대신 왕복 횟수만 세는 객체 (파서 자체 속도만 측정)
+class CountingRedis:
+    def __init__(self):
+        self.calls = 0
+
+    def hset(self, *args, **kwargs):
+        self.calls += 1
+
+    def hget(self, *args, **kwargs):
+        self.calls += 1
+        return b'1'
+
+    def pipeline(self, transaction=True):
+        return CountingPipeline(self)
+
+
+# mmdetection / timm 학습 로그 비슷한 줄 생성 (대부분은 메트릭이 없는 줄)
+def make_lines(epochs, noise_per_epoch):
+    rng = random.Random(0)
+    lines = []
+    for epoch in range(1, epochs + 1):
+        lines.append(f"Epoch {epoch}/{epochs}\n")
+        for step in range(noise_per_epoch):
+            lines.append(f"{epoch:03d} [{step}/{noise_per_epoch}] lr: 1.0000e-04, eta: 0:12:{step % 60:02d}, time: 0.{rng.randint(100, 999)}, loss_cls: {rng.random():.4f}\n")
+        lines.append(f"Train Loss: {rng.random():.4f}, Train Metric: {rng.random():.4f}\n")
+        lines.append(f"Val Loss: {rng.random():.4f}, Val Metric: {rng.random():.4f}\n")
+        lines.append("Train Class Losses: " + ", ".join(f"{rng.random():.3f}" for _ in range(10)) + "\n")
+        lines.append("Val Class metric: " + ", ".join(f"{rng.random():.3f}" for _ in range(10)) + "\n")
+    return lines
+
+
+# 예전 process_output 방식: 줄마다 패턴 dict 생성 + re.search 7번 + 현재 에폭 hget + pipeline
+def legacy_parse(line, job_key, r):
+    patterns = {
+        'epoch_pattern': r"(Additional )?Epoch (\d+)/(\d+)",
+        'loss_pattern': r"Train Loss: ([\d.]+), Train Metric: ([\d.]+)",
+        'val_pattern': r"Val Loss: ([\d.]+), Val Metric: ([\d.]+)",
+        'class_loss_pattern': r"Train Class Losses: (.+)",
+        'class_metric_pattern': r"Train Class metric: (.+)",
+        'val_class_loss_pattern': r"Val Class Losses: (.+)",
+        'val_class_metric_pattern': r"Val Class metric: (.+)"
+    }
+    matches = {k: re.search(v, line) for k, v in patterns.items()}
+    pipe = r.pipeline()
+    if matches['epoch_pattern']:
+        pipe.hset(job_key, "current_epoch", matches['epoch_pattern'].group(2))
+    if matches['loss_pattern'] or matches['val_pattern']:
+        r.hget(job_key, "current_epoch")
+        pipe.hset(job_key, "x", "y")
+    pipe.execute()
+
+
+def bench(name, lines, run):
+    r = CountingRedis()
+    start = time.perf_counter()
+    run(lines, r)
+    elapsed = time.perf_counter() - start
+    print(f"{name:8s} {len(lines) / elapsed:12,.0f} lines/sec  redis calls: {r.calls:7d} ({r.calls / len(lines):.3f}/line)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Metric parser micro-benchmark')
+    parser.add_argument('--epochs', type=int, default=50)
+    parser.add_argument('--lines_per_epoch', type=int, default=2000)
+    args = parser.parse_args()
+
+    lines = make_lines(args.epochs, args.lines_per_epoch)
+    print(f"{len(lines)} lines, {args.epochs} epochs")
+
+    def run_legacy(lines, r):
+        for line in lines:
+            legacy_parse(line, 'job_result:bench', r)
+
+    def run_parser(lines, r):
+        parser = MetricParser(MetricStore(r, 'bench'))
+        for line in lines:
+            parser.feed(line)
+        parser.close()
+
+    bench('legacy', lines, run_legacy)
+    bench('parser', lines, run_parser)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,119 @@
+import os
+import sys
+import heapq
+import argparse
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src'))
+
+from fakes import FakeBroker, FakeChannel
+from scheduler import FairShareScheduler, WaitStats, AmqpQueueSource
+
+# 스케줄러 모드의 공정 분배를 메모리 broker와 가상 시간으로 재현 (항상 같은 결과)
+#   heavy: 가중치 2, 시작하자마자 job 200개
+#   light: 가중치 1, 시작하자마자 job 200개
+#   late:  가중치 1, t=500에 job 5개 (high priority 1개 포함) -> 바로 차례가 와야 함 (starvation 없음)
+# 이 repo에는 테스트 suite가 없으므로 이 스크립트가 DRR 공정 분배 테스트 역할을 함:
+# 아래 세 조건 중 하나라도 어기면 FAIL을 출력하고 exit code 1로 끝남 (python -O에서도 동일)
+#   python benchmarks/bench_scheduler.py && echo ok
+PREFIX = 'gpu_tasks_'
+
+
+def simulate(gpus, job_time):
+    broker = FakeBroker()
+    channel = FakeChannel(broker)
+    scheduler = FairShareScheduler({'heavy': 2.0, 'light': 1.0, 'late': 1.0})
+    stats = WaitStats()
+
+    arrivals = []
+    for i in range(200):
+        arrivals.append((0.0, 'heavy', f"heavy-{i}", 0))
+        arrivals.append((0.0, 'light', f"light-{i}", 0))
+    for i in range(5):
+        arrivals.append((500.0, 'late', f"late-{i}", 5 if i == 4 else 0))
+    arrivals.sort(key=lambda a: a[0])
+
+    for user in ('heavy', 'light', 'late'):
+        broker.queue_declare(PREFIX + user)
+        scheduler.add_source(user, AmqpQueueSource(channel, PREFIX + user))
+
+    submitted = {}
+    order = []
+    running = []
+    now = 0.0
+    next_arrival = 0
+    while next_arrival < len(arrivals) or running or any(broker.depth(PREFIX + u) for u in scheduler.sources):
+        while next_arrival < len(arrivals) and arrivals[next_arrival][0] <= now:
+            _, user, job_id, priority = arrivals[next_arrival]
+            broker.publish(PREFIX + user, job_id.encode(), priority=priority, message_id=job_id)
+            submitted[job_id] = now
+            next_arrival += 1
+
+        while len(running) < gpus:
+            item = scheduler.next()
+            if item is None:
+                break
+            user, (method, properties, body) = item
+            job_id = body.decode()
+            stats.record(user, now - submitted[job_id])
+            order.append((now, user, job_id))
+            heapq.heappush(running, (now + job_time, method.delivery_tag))
+
+        events = []
+        if running:
+            events.append(running[0][0])
+        if next_arrival < len(arrivals):
+            events.append(arrivals[next_arrival][0])
+        if not events:
+            break
+        now = min(events)
+        while running and running[0][0] <= now:
+            _, tag = heapq.heappop(running)
+            channel.basic_ack(tag)
+    return order, stats
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Deterministic fair-share scheduler simulation')
+    parser.add_argument('--gpus', type=int, default=4)
+    parser.add_argument('--job_time', type=float, default=10.0)
+    args = parser.parse_args()
+
+    order, stats = simulate(args.gpus, args.job_time)
+
+    # 둘 다 대기 중인 구간에서 heavy:light 비율 (가중치 2:1이면 약 2)
+    window = [user for t, user, _ in order if t < 500]
+    ratio = window.count('heavy') / max(window.count('light'), 1)
+    late = [(t, job_id) for t, user, job_id in order if user == 'late']
+
+    print(f"dispatched {len(order)} jobs on {args.gpus} GPUs")
+    print(f"heavy:light share while both backlogged = {ratio:.2f} (weights 2:1)")
+    if late:
+        print(f"late user first dispatch at t={late[0][0]:.0f} (submitted t=500), first job = {late[0][1]}")
+    for user, s in sorted(stats.summary().items()):
+        print(f"  {user:6s} jobs={s['jobs']:4d} mean={s['mean']:8.1f} p50={s['p50']:8.1f} p95={s['p95']:8.1f} max={s['max']:8.1f}")
+
+    failures = check_fairness(ratio, late, args.job_time)
+    for failure in failures:
+        print(f"FAIL {failure}")
+    if failures:
+        sys.exit(1)
+    print("PASS weighted share, no starvation, priority order")
+
+
+# 공정 분배 조건 검사. 어긴 조건의 설명 목록 (모두 지키면 빈 목록)
+def check_fairness(ratio, late, job_time):
+    failures = []
+    if abs(ratio - 2.0) >= 0.1:
+        failures.append(f"heavy:light share {ratio:.2f}, expected 2.00 +- 0.1 for weights 2:1")
+    if not late:
+        failures.append("late user was never dispatched (starvation)")
+        return failures
+    if late[0][0] > 500 + job_time:
+        failures.append(f"late user waited until t={late[0][0]:.0f}, expected a dispatch by t={500 + job_time:.0f}")
+    if late[0][1] != 'late-4':
+        failures.append(f"late user's first job was {late[0][1]}, expected the high priority job late-4")
+    return failures
+
+
+if __name__ == '__main__':
+    main()
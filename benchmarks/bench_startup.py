@@ -0,0 +1,152 @@
+import os
+import sys
+import json
+import time
+import shutil
+import argparse
+import tempfile
+import importlib.util
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src'))
+
+from warm_runner import WarmRunner
+from metric_channel import open_metric_pipe, METRICS_FD_ENV
+
+# 학습 프로세스 시작 지연 비교: 기존 방식(새 인터프리터 + import) vs warm runner(미리 import한 인터프리터에서 fork)
+#   --modules의 모듈 중 설치된 것(기본 torch, timm ...)을 import하는 스크립트를 job처럼 실행해서
+#   시작 요청 -> 첫 출력 줄(import 완료), 시작 요청 -> 종료까지 시간을 잼
+# 설치된 무거운 모듈이 없으면 --synthetic개 모듈로 된 가짜 패키지를 만들어 import 비용을 흉내냄
+#   python benchmarks/bench_startup.py --runs 10
+#   python benchmarks/bench_startup.py --modules torch,timm,mmdet --runs 5 --output results/startup.json
+
+JOB_SCRIPT = '''import time
+import os
+import sys
+{imports}
+print("ready", flush=True)
+fd = os.environ.get("{fd_env}")
+if fd:
+    with os.fdopen(int(fd), "w") as f:
+        f.write("{{}}\\n")
+sys.exit(int(sys.argv[1]))
+'''
+
+
+def make_synthetic_package(root, modules):
+    package = os.path.join(root, 'bench_heavy')
+    os.makedirs(package)
+    names = []
+    for i in range(modules):
+        name = f"mod_{i:05d}"
+        with open(os.path.join(package, f"{name}.py"), 'w') as f:
+            # 함수/클래스 정의가 많은 모듈 (컴파일 캐시가 있어도 unmarshal + 실행 비용이 있음)
+            for j in range(20):
+                f.write(f"def f{j}(x, y={j}):\n    return [x * y + k for k in range({j})]\n\n")
+                f.write(f"class C{j}:\n    value = {j}\n    def m(self):\n        return f{j}(self.value)\n\n")
+        names.append(name)
+    with open(os.path.join(package, '__init__.py'), 'w') as f:
+        f.write(''.join(f"from . import {name}\n" for name in names))
+    return 'bench_heavy'
+
+
+def start_cold(command, env, cwd, pass_fds):
+    import subprocess
+    return subprocess.Popen(command, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True, bufsize=1, env=env, cwd=cwd, pass_fds=pass_fds)
+
+
+# consumer.run_job과 같은 순서: metric 파이프 -> 프로세스 시작 -> 첫 줄 -> 종료 코드
+def run_once(start, script, workdir, expect_code):
+    metric_pipe, metric_fd = open_metric_pipe()
+    env = os.environ.copy()
+    env[METRICS_FD_ENV] = str(metric_fd)
+    begin = time.perf_counter()
+    try:
+        process = start([sys.executable, script, str(expect_code)], env, workdir, (metric_fd,))
+    finally:
+        os.close(metric_fd)
+    first_line = process.stdout.readline()
+    first_output = time.perf_counter() - begin
+    process.stdout.read()
+    process.stderr.read()
+    metric_line = metric_pipe.readline()
+    metric_pipe.close()
+    code = process.wait()
+    finished = time.perf_counter() - begin
+    assert first_line.strip() == 'ready', f"unexpected output: {first_line!r}"
+    assert metric_line.strip() == '{}', f"metric channel did not reach the parent: {metric_line!r}"
+    assert code == expect_code, f"exit code {code}, expected {expect_code}"
+    process.stdout.close()
+    process.stderr.close()
+    return first_output, finished
+
+
+def summarize(samples):
+    ordered = sorted(samples)
+    return {
+        'p50_ms': ordered[len(ordered) // 2] * 1000,
+        'max_ms': ordered[-1] * 1000,
+        'mean_ms': sum(ordered) / len(ordered) * 1000,
+    }
+
+
+def bench(name, start, script, workdir, runs):
+    first, total = [], []
+    for i in range(runs):
+        first_output, finished = run_once(start, script, workdir, i % 2)
+        first.append(first_output)
+        total.append(finished)
+    result = {'first_output': summarize(first), 'exit': summarize(total)}
+    print(f"  {name:8s} first output p50 {result['first_output']['p50_ms']:9.1f}ms  max {result['first_output']['max_ms']:9.1f}ms   "
+          f"exit p50 {result['exit']['p50_ms']:9.1f}ms")
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Training process startup latency: cold interpreter vs warm runner fork')
+    parser.add_argument('--modules', default='torch,torchvision,timm,mmcv,mmdet', help='Heavy modules the job imports (missing ones are skipped)')
+    parser.add_argument('--synthetic', type=int, default=1500, help='Synthetic modules to import when none of --modules is installed')
+    parser.add_argument('--runs', type=int, default=10)
+    parser.add_argument('--spares', type=int, default=2)
+    parser.add_argument('--output', type=str, help='Write results JSON here')
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix='bench_startup_')
+    runner = None
+    try:
+        modules = [m.strip() for m in args.modules.split(',') if m.strip() and importlib.util.find_spec(m.strip())]
+        if not modules:
+            modules = [make_synthetic_package(workdir, args.synthetic)]
+            os.environ['PYTHONPATH'] = f"{workdir}{os.pathsep}{os.environ.get('PYTHONPATH', '')}"
+            print(f"No heavy module installed, using {args.synthetic} synthetic modules")
+        script = os.path.join(workdir, 'job.py')
+        with open(script, 'w') as f:
+            f.write(JOB_SCRIPT.format(imports=''.join(f"import {m}\n" for m in modules), fd_env=METRICS_FD_ENV))
+        print(f"job imports: {', '.join(modules)}  ({args.runs} runs each)")
+
+        # 첫 실행은 .pyc 생성 등으로 느리므로 한 번 돌려서 버림
+        run_once(start_cold, script, workdir, 0)
+        cold = bench('cold', start_cold, script, workdir, args.runs)
+
+        preload_start = time.perf_counter()
+        runner = WarmRunner(modules, args.spares).start()
+        runner.wait_ready()
+        preload_seconds = time.perf_counter() - preload_start
+        print(f"  warm runner ready in {preload_seconds * 1000:.1f}ms (one-time, at consumer start)")
+        warm = bench('warm', runner.spawn, script, workdir, args.runs)
+
+        speedup = cold['first_output']['p50_ms'] / max(warm['first_output']['p50_ms'], 1e-6)
+        print(f"  first output p50 speedup: {speedup:.1f}x")
+        report = {'modules': modules, 'runs': args.runs, 'cold': cold, 'warm': warm,
+                  'warm_runner_ready_ms': preload_seconds * 1000, 'first_output_speedup': speedup}
+        if args.output:
+            os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+            with open(args.output, 'w') as f:
+                json.dump(report, f, indent=2)
+    finally:
+        if runner is not None:
+            runner.stop()
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,51 @@
+import time
+
+STARTED_AT = time.time()
+
+import os
+import sys
+import random
+import argparse
+
+# 벤치마크용 가짜 학습 스크립트 (consumer.run_job이 실제 학습 스크립트처럼 실행)
+# 시작 시각을 {bench_out}/{bench_tag}.start에 남기고, 학습 로그와 같은 형식의 줄을 line_rate(줄/초)로 출력
+#   python dummy_train.py --bench_out /tmp/out --bench_tag job1 --epochs 3 --lines_per_epoch 100 --line_rate 2000
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--bench_out', required=True)
+    parser.add_argument('--bench_tag', required=True)
+    parser.add_argument('--epochs', type=int, default=3)
+    parser.add_argument('--lines_per_epoch', type=int, default=100)
+    parser.add_argument('--line_rate', type=float, default=0, help='Lines per second (0 = as fast as possible)')
+    parser.add_argument('--fail', action='store_true')
+    args, _ = parser.parse_known_args()
+
+    with open(os.path.join(args.bench_out, f"{args.bench_tag}.start"), 'w') as f:
+        f.write(repr(STARTED_AT))
+
+    rng = random.Random(args.bench_tag)
+    interval = 1.0 / args.line_rate if args.line_rate > 0 else 0
+    next_line = time.monotonic()
+
+    def emit(line):
+        nonlocal next_line
+        if interval:
+            next_line += interval
+            delay = next_line - time.monotonic()
+            if delay > 0:
+                time.sleep(delay)
+        print(line, flush=bool(interval))
+
+    for epoch in range(1, args.epochs + 1):
+        emit(f"Epoch {epoch}/{args.epochs}")
+        for step in range(args.lines_per_epoch):
+            emit(f"{epoch:03d} [{step}/{args.lines_per_epoch}] lr: 1.0000e-04, time: 0.{rng.randint(100, 999)}, loss_cls: {rng.random():.4f}")
+        emit(f"Train Loss: {rng.random():.4f}, Train Metric: {rng.random():.4f}")
+        emit(f"Val Loss: {rng.random():.4f}, Val Metric: {rng.random():.4f}")
+    sys.exit(1 if args.fail else 0)
+
+
+if __name__ == '__main__':
+    main()
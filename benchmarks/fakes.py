@@ -0,0 +1,174 @@
+import os
+import heapq
+import socket
+import shutil
+import itertools
+import threading
+import subprocess
+import time
+
+
+# 벤치마크용 메모리 broker (RabbitMQ 대신 사용)
+# 큐마다 priority가 높은 메시지가 먼저, 같은 priority는 들어온 순서대로 나감 (x-max-priority 큐와 같은 동작)
+class FakeMethod:
+    def __init__(self, delivery_tag, routing_key):
+        self.delivery_tag = delivery_tag
+        self.routing_key = routing_key
+
+
+class FakeProperties:
+    def __init__(self, priority=0, message_id=None, content_type=None, content_encoding=None, headers=None):
+        self.priority = priority
+        self.message_id = message_id
+        self.content_type = content_type
+        self.content_encoding = content_encoding
+        self.headers = headers
+
+
+class FakeBroker:
+    def __init__(self):
+        self.queues = {}
+        self.unacked = {}
+        self.acked = 0
+        self._seq = itertools.count()
+        self._tags = itertools.count(1)
+
+    def queue_declare(self, queue, arguments=None):
+        self.queues.setdefault(queue, [])
+
+    def publish(self, queue, body, priority=0, message_id=None, properties=None):
+        self.queue_declare(queue)
+        if properties is None:
+            properties = FakeProperties(priority, message_id)
+        heapq.heappush(self.queues[queue], (-(properties.priority or 0), next(self._seq), body, properties))
+
+    def get(self, queue):
+        items = self.queues.get(queue)
+        if not items:
+            return None, None, None
+        _, _, body, properties = heapq.heappop(items)
+        method = FakeMethod(next(self._tags), queue)
+        self.unacked[method.delivery_tag] = (queue, body, properties)
+        return method, properties, body
+
+    def ack(self, delivery_tag):
+        if self.unacked.pop(delivery_tag, None) is not None:
+            self.acked += 1
+
+    def nack(self, delivery_tag, requeue=True):
+        queue, body, properties = self.unacked.pop(delivery_tag)
+        if requeue:
+            self.publish(queue, body, properties=properties)
+
+    def depth(self, queue):
+        return len(self.queues.get(queue, []))
+
+
+# pika BlockingConnection 중 worker 스레드 -> connection 스레드 콜백 전달 부분
+# process_callbacks()를 부르는 스레드가 connection 스레드 역할을 함
+class FakeConnection:
+    def __init__(self):
+        self.is_open = True
+        self._callbacks = []
+        self._cond = threading.Condition()
+
+    def add_callback_threadsafe(self, callback):
+        with self._cond:
+            self._callbacks.append(callback)
+            self._cond.notify()
+
+    def process_data_events(self, time_limit=0):
+        with self._cond:
+            if not self._callbacks and time_limit:
+                self._cond.wait(time_limit)
+            callbacks, self._callbacks = self._callbacks, []
+        for callback in callbacks:
+            callback()
+        return len(callbacks)
+
+
+# pika BlockingChannel 중 스케줄러 / JobWorkerPool / consumer가 쓰는 부분만 흉내냄
+class FakeChannel:
+    def __init__(self, broker, connection=None):
+        self.broker = broker
+        self.connection = connection or FakeConnection()
+        self.is_open = True
+
+    def queue_declare(self, queue, arguments=None, **kwargs):
+        self.broker.queue_declare(queue, arguments)
+
+    def basic_get(self, queue, auto_ack=False):
+        return self.broker.get(queue)
+
+    def basic_ack(self, delivery_tag):
+        self.broker.ack(delivery_tag)
+
+    def basic_nack(self, delivery_tag, requeue=True):
+        self.broker.nack(delivery_tag, requeue)
+
+    def basic_publish(self, exchange, routing_key, body, properties=None):
+        self.broker.publish(routing_key, body, properties=properties)
+
+
+# redis 명령 왕복 횟수 (pipeline / MULTI는 execute 한 번이 1회). 실제 서버와 fakeredis 모두 같은 방식으로 셈
+class RoundTripCounter:
+    def __init__(self):
+        self.count = 0
+        self._lock = threading.Lock()
+        self._original = None
+
+    def install(self):
+        import redis.connection
+        original = self._original = redis.connection.AbstractConnection.send_packed_command
+        counter = self
+
+        def send_packed_command(connection, command, check_health=True):
+            with counter._lock:
+                counter.count += 1
+            return original(connection, command, check_health)
+        redis.connection.AbstractConnection.send_packed_command = send_packed_command
+        return self
+
+    def uninstall(self):
+        import redis.connection
+        if self._original is not None:
+            redis.connection.AbstractConnection.send_packed_command = self._original
+            self._original = None
+
+
+def _free_port():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+# PATH에 redis-server가 있으면 임시 포트로 띄움 (없으면 None -> fakeredis 사용)
+class LocalRedisServer:
+    def __init__(self):
+        self.port = None
+        self.process = None
+
+    @staticmethod
+    def available():
+        return shutil.which('redis-server') is not None
+
+    def start(self, timeout=10):
+        import redis
+        self.port = _free_port()
+        self.process = subprocess.Popen(['redis-server', '--port', str(self.port), '--save', '', '--appendonly', 'no'],
+                                        stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            try:
+                redis.Redis(port=self.port).ping()
+                return self
+            except redis.ConnectionError:
+                time.sleep(0.05)
+        self.stop()
+        raise RuntimeError('redis-server did not start')
+
+    def stop(self):
+        if self.process is not None:
+            self.process.terminate()
+            self.process.wait()
+            self.process = None
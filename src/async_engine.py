@@ -0,0 +1,395 @@
+import os
+import sys
+import json
+import time
+import uuid
+import signal
+import asyncio
+import logging
+from collections import deque
+import redis
+import aio_pika
+from config import RABBITMQ_CONFIG, CONSUMER_CONFIG
+from engine import (r, result_cache, gpu_pool, gpu_inventory, initialize_gpu_list, leave_cluster, stage_dataset, release_gpu,
+                    process_output, open_log_sink)
+from gpu_pool import make_holder, estimate_gpu_request, record_gpu_usage, fits_empty_device, GpuUnavailableError, WAIT_SLICE
+from process_stream import TAIL_LINES
+from metric_parser import MetricParser
+from metric_store import AsyncMetricStore, get_latest, get_gpu_memory
+from metric_channel import METRICS_FD_ENV, open_metric_pipe
+from result_cache import apply_cached_result
+from job_schema import decode_job
+from job_handlers import handler_for, job_type_of, remove_temp_paths
+from job_codec import discard_payload
+from job_trace import JobTrace
+from instrumentation import (JOBS_STARTED, JOBS_SUCCEEDED, JOBS_FAILED, JOBS_CACHED, QUEUE_WAIT_SECONDS, GPU_ACQUIRE_SECONDS,
+                             JOB_RUNTIME_SECONDS, MESSAGES_IN_FLIGHT, QUEUE_DEPTH, AMQP_ROUNDTRIP_SECONDS,
+                             start_consumer_metrics)
+from warm_runner import popen_job, active_runner, start_warm_runner, stop_warm_runner
+from redis_client import connect_async_redis
+
+# engine.py와 같은 job 처리 경로를 asyncio로 실행하는 consumer core (CONSUMER_ASYNC=Y)
+# pika BlockingConnection은 콜백 안에서 학습이 도는 동안 I/O loop가 멈춰서, job이 heartbeat 간격보다 길면
+# broker가 연결을 끊고 -> ack가 실패하고 -> 같은 메시지가 다시 와서 학습이 두 번 돎
+# 여기서는 하나의 event loop가 AMQP(aio-pika) heartbeat / ack, 학습 프로세스 출력 읽기(asyncio subprocess),
+# 메트릭 기록(redis.asyncio)을 같이 처리하고, 블로킹 호출(config 로드, 데이터셋 복사, GPU 대기)은 스레드로 보냄
+# GPU 대여 연장은 engine과 같이 NodeHeartbeat 스레드가 처리 (event loop와 무관하게 계속 돎)
+#   CONSUMER_ASYNC=Y python src/consumer.py  또는  python src/async_engine.py
+# 스케줄러 모드(CONSUMER_SCHEDULER)와 augmentation 단계(CONSUMER_AUGMENTATION)는 engine.py에서만 지원
+
+# engine 로거 아래에 두어서 consumer 콘솔 출력에 같이 나오게 함
+logger = logging.getLogger('engine.aio')
+
+# 학습 프로세스 출력 한 줄의 최대 길이 (넘는 줄은 건너뜀)
+LINE_LIMIT = 1 << 20
+
+
+async def connect_async():
+    # connect_robust: 연결이 끊기면 다시 연결하고 queue consume도 다시 등록
+    connection = await aio_pika.connect_robust(host=RABBITMQ_CONFIG['HOST'], port=RABBITMQ_CONFIG['PORT'],
+                                               login=RABBITMQ_CONFIG['USER'], password=RABBITMQ_CONFIG['PASSWORD'],
+                                               heartbeat=RABBITMQ_CONFIG['HEARTBEAT'])
+    logger.info(f"Connected to RabbitMQ at {RABBITMQ_CONFIG['HOST']}:{RABBITMQ_CONFIG['PORT']} (heartbeat {RABBITMQ_CONFIG['HEARTBEAT']}s)")
+    return connection
+
+
+# 파이프(파일 객체)를 event loop에서 읽는 StreamReader로 연결
+async def open_reader(pipe):
+    reader = asyncio.StreamReader(limit=LINE_LIMIT)
+    await asyncio.get_running_loop().connect_read_pipe(lambda: asyncio.StreamReaderProtocol(reader), pipe)
+    return reader
+
+
+# 학습 프로세스 시작 -> (프로세스, stdout reader, stderr reader)
+# warm runner가 있으면 fork한 프로세스의 파이프를 그대로 읽고, 없으면 asyncio subprocess로 새 인터프리터 시작
+async def spawn_job(command, env, cwd, pass_fds):
+    if active_runner() is not None and command[0] == sys.executable:
+        process = await asyncio.to_thread(popen_job, command, env, cwd, pass_fds)
+        return process, await open_reader(process.stdout), await open_reader(process.stderr)
+    process = await asyncio.create_subprocess_exec(*command, stdout=asyncio.subprocess.PIPE, stderr=asyncio.subprocess.PIPE,
+                                                   env=env, cwd=cwd, pass_fds=pass_fds, limit=LINE_LIMIT)
+    return process, process.stdout, process.stderr
+
+
+# 종료 코드 (warm runner 프로세스는 wait()가 블로킹이라 스레드에서 기다림)
+async def wait_process(process):
+    if isinstance(process, asyncio.subprocess.Process):
+        return await process.wait()
+    return await asyncio.to_thread(process.wait)
+
+
+# reader에서 줄 단위로 읽어서 on_line(line, source)에 넘김. tail에는 마지막 줄들만 보관
+async def read_lines(reader, source, on_line, tail=None):
+    while True:
+        try:
+            line = await reader.readline()
+        except ValueError:
+            logger.warning(f"Skipping an output line longer than {LINE_LIMIT} bytes ({source})")
+            continue
+        if not line:
+            return
+        line = line.decode(errors='replace')
+        if tail is not None:
+            tail.append(line)
+        on_line(line, source)
+
+
+# GpuLeasePool.acquire의 asyncio 버전
+# acquire를 스레드에서 돌리면 task를 취소해도 스레드는 BLPOP에서 계속 기다리다가 나중에 GPU를 잡고, 그 대여는 아무도 반납하지 않음
+# 여기서는 한 번 시도(try_acquire)만 스레드에서 하고 반납 신호는 redis.asyncio BLPOP으로 기다리므로 취소하면 바로 멈춤
+# 시도하는 중에 취소되면 시도가 끝날 때까지 기다렸다가 잡은 GPU를 반납하고 취소를 이어감
+async def acquire_gpu(ar, holder, memory_mb=None, share=None, job_id=None):
+    devices = await asyncio.to_thread(gpu_pool.devices)
+    if devices and not fits_empty_device(devices, memory_mb, share):
+        raise GpuUnavailableError(f"Request ({memory_mb}MB, share {share}) does not fit on any GPU: {devices}")
+    while True:
+        attempt = asyncio.ensure_future(asyncio.to_thread(gpu_pool.try_acquire, holder, memory_mb, share, job_id))
+        try:
+            gpu_id = await asyncio.shield(attempt)
+        except asyncio.CancelledError:
+            gpu_id = await attempt
+            if gpu_id is not None:
+                await asyncio.to_thread(gpu_pool.release, gpu_id, holder)
+                logger.info(f"Released GPU {gpu_id} leased to {holder} while the job was being cancelled")
+            raise
+        if gpu_id is not None:
+            size = 'whole GPU' if memory_mb is None and share is None else f"{memory_mb}MB, share {share}"
+            logger.info(f"GPU {gpu_id} leased to {holder} ({size})")
+            return gpu_id
+        logger.info("No available GPU, waiting for release signal...")
+        await ar.blpop(gpu_pool.wakeup_key, timeout=WAIT_SLICE)
+
+
+# engine.run_job과 같은 순서: 학습 명령 -> 메트릭 파이프 -> 프로세스 시작 -> 출력 파싱 -> 종료 코드
+async def run_job(job, ar, gpu_id, staged_data_root=None, trace=None):
+    handler = handler_for(job)
+    env = os.environ.copy()
+    env['CUDA_VISIBLE_DEVICES'] = str(gpu_id)
+    env['PATH'] = f"{os.path.dirname(sys.executable)};{env['PATH']}"
+
+    working_dir = handler.working_dir(job)
+    logger.info(f"Working directory: {working_dir}")
+
+    # config 로드 / 데이터 파일 확인은 파일 I/O라 스레드에서 실행
+    temp_paths = []
+    command = await asyncio.to_thread(handler.build_command, job, r, staged_data_root, temp_paths)
+    if command is None:
+        remove_temp_paths(temp_paths)
+        return False
+    if trace is not None:
+        trace.mark('config_ready')
+    env['PYTHONPATH'] = f"{working_dir}:{env.get('PYTHONPATH', '')}"
+
+    process = None
+    store = AsyncMetricStore(ar, job['job_id'])
+    parser = MetricParser(store)
+    # 로그 전송은 sink의 스레드가 동기 Redis로 처리 (write는 buffer에 넣기만 함)
+    log_sink = open_log_sink(job['job_id'])
+    tails = {'stdout': deque(maxlen=TAIL_LINES), 'stderr': deque(maxlen=TAIL_LINES)}
+    parse_errors = 0
+
+    def on_line(line, source):
+        nonlocal parse_errors
+        try:
+            process_output(line, parser, source, trace, log_sink)
+        except Exception as e:
+            # 파싱 에러 때문에 학습을 멈추지는 않음
+            parse_errors += 1
+            if parse_errors <= 5:
+                logger.warning(f"Failed to process output line ({source}): {e}")
+
+    metric_pipe, metric_fd = open_metric_pipe()
+    if metric_fd is not None:
+        env[METRICS_FD_ENV] = str(metric_fd)
+    try:
+        try:
+            process, stdout, stderr = await spawn_job(command, env, working_dir, () if metric_fd is None else (metric_fd,))
+        finally:
+            # 쓰기 쪽은 자식만 들고 있어야 학습이 끝날 때 EOF가 옴
+            if metric_fd is not None:
+                os.close(metric_fd)
+        if trace is not None:
+            trace.mark('spawned')
+            await asyncio.to_thread(trace.flush)
+
+        readers = [read_lines(stdout, 'stdout', on_line, tails['stdout']), read_lines(stderr, 'stderr', on_line, tails['stderr'])]
+        if metric_pipe is not None:
+            readers.append(read_lines(await open_reader(metric_pipe), 'metrics', on_line))
+            metric_pipe = None
+        await asyncio.gather(*readers)
+        returncode = await wait_process(process)
+        if trace is not None:
+            trace.mark('exit')
+        if parse_errors:
+            logger.warning(f"{parse_errors} output lines could not be processed")
+
+        if returncode == 0:
+            logger.info(f"\nJob completed successfully for user{job['user']}")
+            return True
+        logger.error(f"\nJob failed for user {job['user']}")
+        logger.error(f"\nJob Error: {''.join(tails['stderr'])}, out msg: {''.join(tails['stdout'])}")
+        return False
+    except Exception as e:
+        logger.error(f"\nError during job execution: {str(e)}")
+        return False
+    finally:
+        # 종료(task 취소) 중이거나 읽기 중 에러가 난 경우 학습 프로세스 정리
+        if process is not None and process.returncode is None:
+            try:
+                process.terminate()
+            except ProcessLookupError:
+                pass
+            await wait_process(process)
+        if metric_pipe is not None:
+            metric_pipe.close()
+        parser.close()
+        await store.drain()
+        if log_sink is not None:
+            await asyncio.to_thread(log_sink.close, process.returncode if process is not None else None)
+        remove_temp_paths(temp_paths)
+
+
+# 결과 캐시 / GPU 메모리 기록 / 최종 메트릭 로그 (redis 조회라 스레드에서 실행)
+def record_result(job, handler, fingerprint, result):
+    peak_mb = get_gpu_memory(r, job['job_id'])
+    if peak_mb:
+        record_gpu_usage(r, job, peak_mb)
+    if not result:
+        logger.error(f"Job failed for user {job['user']}")
+        return
+    if fingerprint:
+        result_cache.store(fingerprint, job['job_id'], handler.artifacts(job, r))
+    final_metric = get_latest(r, job['job_id'], 'val_metric')
+    if final_metric:
+        logger.info(f"Job {job['job_id']} completed for user {job['user']}. Final accuracy: {final_metric}")
+    else:
+        logger.warning(f"Job {job['job_id']} completed for user {job['user']} but final accuracy not found")
+
+
+# GPU 반납 / trace 기록 / 데이터셋 / Redis에 둔 본문 정리 (스레드에서 실행)
+def cleanup(job, message, gpu_id, holder, staged, trace):
+    if gpu_id is not None:
+        release_gpu(r, gpu_id, holder)
+        trace.mark('gpu_released')
+    if trace is not None:
+        trace.flush()
+    if staged is not None:
+        staged.release()
+    if job is not None:
+        try:
+            discard_payload(job, message, r)
+        except redis.RedisError as e:
+            logger.warning(f"Could not delete payload of job {job['job_id']}: {e}")
+
+
+# engine.process_message의 asyncio 버전. aio-pika 메시지는 content_type / headers 속성을 그대로 가지고 있어서 decode_job에 바로 넘김
+async def process_message(message, ar):
+    gpu_id = None
+    holder = None
+    job = None
+    staged = None
+    result = None
+    trace = None
+    MESSAGES_IN_FLIGHT.inc()
+    try:
+        job = await asyncio.to_thread(decode_job, message.body, message, r)
+        job.setdefault('job_id', uuid.uuid4().hex)
+        logger.info(f"Processing {job_type_of(job)} job: {job}")
+        handler = handler_for(job)
+        JOBS_STARTED.inc()
+        trace = JobTrace(r, job['job_id'], job.get('submitted_at'))
+        trace.mark('dequeue')
+        if job.get('submitted_at'):
+            QUEUE_WAIT_SECONDS.observe(max(time.time() - job['submitted_at'], 0.0))
+        await AsyncMetricStore(ar, job['job_id']).register(job['user'], model_name=job.get('model_name', ''), script_path=job.get('script_path', ''))
+
+        fingerprint = None
+        try:
+            fingerprint = await asyncio.to_thread(handler.fingerprint, job, r)
+        except Exception as e:
+            logger.warning(f"Could not fingerprint job {job['job_id']}, skipping result cache: {e}")
+        if fingerprint and not job.get('force'):
+            cached = await asyncio.to_thread(result_cache.lookup, fingerprint)
+            if cached:
+                await asyncio.to_thread(apply_cached_result, r, job['job_id'], cached)
+                JOBS_CACHED.inc()
+                logger.info(f"Job {job['job_id']} is identical to finished job {cached['job_id']}, reusing its result "
+                            f"(hit {cached['hits']}, artifacts: {cached['artifacts']})")
+                return
+
+        data_root = handler.data_root(job)
+        if data_root:
+            staged = await asyncio.to_thread(stage_dataset, data_root)
+            trace.mark('dataset_staged')
+
+        holder = make_holder(job['job_id'])
+        memory_mb, share = await asyncio.to_thread(lambda: estimate_gpu_request(r, job, gpu_pool.devices()))
+        # 반납 신호를 redis.asyncio BLPOP으로 기다림 (그동안에도 heartbeat / 다른 job 출력 처리는 계속되고, 종료 시 바로 취소됨)
+        with GPU_ACQUIRE_SECONDS.time():
+            gpu_id = await acquire_gpu(ar, holder, memory_mb, share, job['job_id'])
+        trace.mark('gpu_acquired')
+        with JOB_RUNTIME_SECONDS.time():
+            result = await run_job(job, ar, gpu_id, staged.path if staged is not None else None, trace)
+        (JOBS_SUCCEEDED if result else JOBS_FAILED).inc()
+        await asyncio.to_thread(record_result, job, handler, fingerprint, result)
+    except json.JSONDecodeError as e:
+        logger.error(f"Error decoding JSON: {e}")
+        JOBS_FAILED.inc()
+    except Exception as e:
+        logger.error(f"Error processing message: {str(e)}", exc_info=True)
+        if result is None:
+            JOBS_FAILED.inc()
+    finally:
+        MESSAGES_IN_FLIGHT.dec()
+        await asyncio.to_thread(cleanup, job, message, gpu_id, holder, staged, trace)
+        logger.info("[*] Waiting for messages. To exit press CTRL+C")
+
+
+# instrumentation.schedule_amqp_probe의 asyncio 버전 (passive queue.declare 왕복 시간 + 큐 깊이)
+async def amqp_probe(channel, queue, interval):
+    depth = {'value': None}
+    QUEUE_DEPTH.fn = lambda: depth['value'] if depth['value'] is not None else float('nan')
+    while True:
+        await asyncio.sleep(interval)
+        start = time.perf_counter()
+        try:
+            declared = await channel.declare_queue(queue, passive=True)
+        except Exception as e:
+            logger.debug(f"AMQP probe failed: {e}")
+            continue
+        AMQP_ROUNDTRIP_SECONDS.observe(time.perf_counter() - start)
+        depth['value'] = declared.declaration_result.message_count
+
+
+# stop이 set될 때까지 큐를 처리. 종료 시 실행 중인 job은 취소(학습 프로세스 종료)하고 ack하지 않아서 다시 전달되게 함
+async def serve(stop):
+    await asyncio.to_thread(initialize_gpu_list, r)
+    start_consumer_metrics(CONSUMER_CONFIG['METRICS_PORT'], gpu_pool, r, CONSUMER_CONFIG['METRICS_PROBE_INTERVAL'])
+    ar = connect_async_redis()
+    connection = await connect_async()
+    tasks = set()
+    probe = None
+
+    async def handle(message):
+        logger.info(f"Received message: {message.body[:100]}...")
+        try:
+            await process_message(message, ar)
+        except Exception as e:
+            logger.error(f"Error processing message: {e}")
+        try:
+            await message.ack()
+        except Exception as e:
+            # 연결이 끊겼다가 다시 연결된 경우: broker가 이미 메시지를 되돌렸으므로 다시 전달됨
+            logger.warning(f"Could not ack message {message.delivery_tag}, it will be redelivered: {e}")
+
+    async def on_message(message):
+        task = asyncio.create_task(handle(message))
+        tasks.add(task)
+        task.add_done_callback(tasks.discard)
+
+    try:
+        channel = await connection.channel()
+        # 동시에 실행할 job 수 = prefetch (WORKERS=0이면 GPU 개수 * JOBS_PER_GPU)
+        workers = CONSUMER_CONFIG['WORKERS'] or gpu_pool.size * CONSUMER_CONFIG['JOBS_PER_GPU'] or 1
+        await channel.set_qos(prefetch_count=workers)
+        queue = await channel.declare_queue(RABBITMQ_CONFIG['QUEUE'], arguments=RABBITMQ_CONFIG['QUEUE_ARGS'])
+        await queue.consume(on_message)
+        if CONSUMER_CONFIG['METRICS_PROBE_INTERVAL'] > 0:
+            probe = asyncio.create_task(amqp_probe(channel, RABBITMQ_CONFIG['QUEUE'], CONSUMER_CONFIG['METRICS_PROBE_INTERVAL']))
+        logger.info(f"Async consumer: up to {workers} concurrent jobs")
+        logger.info(' [*] Waiting for messages. To exit press CTRL+C')
+        await stop.wait()
+    finally:
+        if probe is not None:
+            probe.cancel()
+        for task in list(tasks):
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        await connection.close()
+        await ar.aclose()
+
+
+def main():
+    if CONSUMER_CONFIG['SCHEDULER'] or CONSUMER_CONFIG['AUGMENTATION']:
+        logger.warning("CONSUMER_SCHEDULER / CONSUMER_AUGMENTATION are not supported by the async consumer, consuming only this user's queue")
+    if CONSUMER_CONFIG['WARM_RUNNER']:
+        start_warm_runner(CONSUMER_CONFIG['WARM_RUNNER_PRELOAD'], CONSUMER_CONFIG['WARM_RUNNER_SPARES'])
+    print(f"Number of available GPUs: {len(gpu_inventory.devices())} ({gpu_inventory.name})")
+
+    async def run():
+        stop = asyncio.Event()
+        loop = asyncio.get_running_loop()
+        for signum in (signal.SIGINT, signal.SIGTERM):
+            loop.add_signal_handler(signum, stop.set)
+        await serve(stop)
+
+    try:
+        asyncio.run(run())
+    finally:
+        leave_cluster()
+        stop_warm_runner()
+        logger.info("Connection Closed")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,77 +1,268 @@
 import pika
-import json
-import redis
-import yaml
 import os
 import sys
-import subprocess
+import csv
+import glob
+import time
+import signal
 import logging
-from config import RABBITMQ_HOST, AUGMENTATION_QUEUE, REDIS_HOST, REDIS_PORT, REDIS_DB
+import threading
+import functools
+import subprocess
+from concurrent.futures import ProcessPoolExecutor
+from pika.exceptions import AMQPConnectionError, AMQPChannelError
+from config import RABBITMQ_CONFIG, AUGMENTATION_CONFIG
+from config_loader import load_config
+from job_schema import decode_job, encode_message, submit_queue
+from job_handlers import handler_for
+
+logger = logging.getLogger(__name__)
+
+# 오프라인 augmentation 단계
+# augmentation_queue의 job을 CPU 프로세스 풀에서 처리하고, 성공하면 제출한 사용자의 gpu_tasks_ 큐로 넘김
+# -> GPU consumer가 job A를 학습하는 동안 job B의 augmentation이 CPU에서 같이 진행됨
+#
+# num_shards > 1이면 augmentation 스크립트를 shard 수만큼 동시에 실행함. 각 실행에는
+#   --shard_index i --num_shards n 인자와 AUG_SHARD_INDEX / AUG_NUM_SHARDS / AUG_SHARD_OUTPUT 환경변수가 전달되고,
+#   스크립트가 AUG_SHARD_OUTPUT(aug_path/augmented.shard{i}.csv)에 쓴 결과를 모두 끝난 뒤 augmented.csv로 합침
+SHARD_OUTPUT = 'augmented.shard{index}.csv'
+MERGED_OUTPUT = 'augmented.csv'
+# 실패 로그에 남길 stderr 길이
+STDERR_TAIL = 2000
+
+
+# job의 config_path / aug_path를 engine.py와 같이 작업 경로(MAIN_PROJECT_ROOT 또는 script_path 폴더) 기준 절대 경로로 바꿈
+# ratio를 읽을 때와 augmentation 스크립트 / shard 합치기에 모두 이 경로를 사용
+def resolve_paths(job):
+    working_dir = handler_for(job).working_dir(job)
+    return (os.path.abspath(os.path.join(working_dir, job['config_path'])),
+            os.path.abspath(os.path.join(working_dir, job['augmentation']['aug_path'])))
+
+
+# config의 offline_augmentation.ratio (없거나 0이면 augmentation 없이 바로 학습 큐로 넘김). 읽을 수 없으면 예외
+def augmentation_ratio(config_path):
+    config = load_config(config_path)
+    if not config:
+        raise ValueError(f"No config could be loaded from {config_path}")
+    return (config.get('offline_augmentation') or {}).get('ratio')
+
+
+# 프로세스 풀에서 실행: augmentation 스크립트 하나(shard 하나) 실행 (config_path, aug_path는 resolve_paths의 절대 경로)
+def run_shard(job, config_path, aug_path, shard_index, num_shards):
+    script_path = job['augmentation']['script_path']
+    env = os.environ.copy()
+    for key, name in (('train_csv_path', 'TRAIN_CSV_PATH'), ('test_csv_path', 'TEST_CSV_PATH')):
+        if job.get(key):
+            env[name] = job[key]
+
+    command = [
+        sys.executable,
+        script_path,
+        '--aug_path', aug_path,
+        '--config_path', config_path
+    ]
+    if num_shards > 1:
+        command += ['--shard_index', str(shard_index), '--num_shards', str(num_shards)]
+        env['AUG_SHARD_INDEX'] = str(shard_index)
+        env['AUG_NUM_SHARDS'] = str(num_shards)
+        env['AUG_SHARD_OUTPUT'] = os.path.join(aug_path, SHARD_OUTPUT.format(index=shard_index))
+
+    started = time.monotonic()
+    process = subprocess.run(command, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True,
+                             env=env, cwd=os.path.dirname(os.path.abspath(script_path)))
+    return process.returncode == 0, process.stderr[-STDERR_TAIL:], time.monotonic() - started
+
+
+# 프로세스 풀에서 실행: shard별 CSV를 하나로 합침 (헤더는 한 번만). shard 출력이 없으면 스크립트가 직접 합친 것으로 보고 그대로 둠
+def merge_shards(aug_path, num_shards):
+    parts = [os.path.join(aug_path, SHARD_OUTPUT.format(index=i)) for i in range(num_shards)]
+    existing = [p for p in parts if os.path.exists(p)]
+    if not existing:
+        return 0
+    if len(existing) != num_shards:
+        raise FileNotFoundError(f"Missing shard outputs: {sorted(set(parts) - set(existing))}")
+
+    rows = 0
+    tmp_path = os.path.join(aug_path, f"{MERGED_OUTPUT}.{os.getpid()}.tmp")
+    with open(tmp_path, 'w', newline='') as out:
+        writer = csv.writer(out)
+        for index, part in enumerate(parts):
+            with open(part, newline='') as f:
+                reader = csv.reader(f)
+                header = next(reader, None)
+                if index == 0 and header is not None:
+                    writer.writerow(header)
+                for row in reader:
+                    writer.writerow(row)
+                    rows += 1
+    os.replace(tmp_path, os.path.join(aug_path, MERGED_OUTPUT))
+    for part in glob.glob(os.path.join(aug_path, SHARD_OUTPUT.format(index='*'))):
+        os.remove(part)
+    return rows
+
+
+# 메시지 하나(job 하나)의 shard 진행 상황
+class AugmentationTask:
+    def __init__(self, job, method, num_shards, config_path, aug_path):
+        self.job = job
+        self.config_path = config_path
+        self.aug_path = aug_path
+        self.delivery_tag = method.delivery_tag
+        self.redelivered = method.redelivered
+        self.num_shards = num_shards
+        self.remaining = num_shards
+        self.failures = []
+        self.started = time.monotonic()
+        self.lock = threading.Lock()
+
+
+# 메시지를 받아 shard를 프로세스 풀에 넣고, 끝나면 connection 스레드에서 다음 큐로 넘긴 뒤 ack
+# (pika BlockingConnection은 스레드 안전하지 않으므로 publish/ack는 add_callback_threadsafe로 넘김)
+class AugmentationStage:
+    def __init__(self, pool):
+        self.pool = pool
+
+    def on_message(self, ch, method, properties, body):
+        try:
+            job = decode_job(body, properties)
+        except ValueError as e:
+            logger.error(f"Dropping undecodable augmentation message: {e}")
+            ch.basic_nack(delivery_tag=method.delivery_tag, requeue=False)
+            return
+
+        if 'augmentation' not in job:
+            logger.error(f"Job {job.get('job_id')} has no augmentation section, dropping")
+            ch.basic_nack(delivery_tag=method.delivery_tag, requeue=False)
+            return
+
+        # config를 못 읽으면 augmentation 없이 넘기지 않고 실패 처리 (처음 실패만 다시 큐에 넣음)
+        try:
+            config_path, aug_path = resolve_paths(job)
+            ratio = augmentation_ratio(config_path)
+        except Exception as e:
+            requeue = not method.redelivered
+            logger.error(f"Could not read offline_augmentation from {job['config_path']} for job {job.get('job_id')}: {e} "
+                         f"({'requeued for one retry' if requeue else 'dropped after retry'})")
+            ch.basic_nack(delivery_tag=method.delivery_tag, requeue=requeue)
+            return
+        if not ratio:
+            logger.info(f"Job {job.get('job_id')} has no offline_augmentation.ratio, forwarding without augmentation")
+            self._forward(ch, method.delivery_tag, job, method.redelivered)
+            return
+
+        num_shards = max(int(job['augmentation'].get('num_shards') or 1), 1)
+        task = AugmentationTask(job, method, num_shards, config_path, aug_path)
+        logger.info(f"Augmenting job {job.get('job_id')} (ratio {ratio}) in {num_shards} shard(s)")
+        connection = ch.connection
+        for shard_index in range(num_shards):
+            future = self.pool.submit(run_shard, job, config_path, aug_path, shard_index, num_shards)
+            future.add_done_callback(functools.partial(self._on_shard_done, connection, ch, task, shard_index))
+
+    # 풀의 결과 처리 스레드에서 실행됨
+    def _on_shard_done(self, connection, ch, task, shard_index, future):
+        try:
+            ok, stderr, elapsed = future.result()
+        except Exception as e:
+            ok, stderr, elapsed = False, str(e), 0.0
+        with task.lock:
+            if not ok:
+                task.failures.append((shard_index, stderr))
+            task.remaining -= 1
+            done = task.remaining == 0
+        logger.info(f"Job {task.job.get('job_id')} shard {shard_index + 1}/{task.num_shards} "
+                    f"{'done' if ok else 'FAILED'} in {elapsed:.1f}s")
+        if not done:
+            return
+
+        if task.failures or task.num_shards == 1:
+            connection.add_callback_threadsafe(functools.partial(self._finish, ch, task))
+            return
+        merge = self.pool.submit(merge_shards, task.aug_path, task.num_shards)
+        merge.add_done_callback(functools.partial(self._on_merged, connection, ch, task))
+
+    def _on_merged(self, connection, ch, task, future):
+        try:
+            rows = future.result()
+            logger.info(f"Merged {task.num_shards} shard outputs for job {task.job.get('job_id')} ({rows} rows)")
+        except Exception as e:
+            task.failures.append(('merge', str(e)))
+        connection.add_callback_threadsafe(functools.partial(self._finish, ch, task))
+
+    # connection 스레드에서 실행됨: 성공하면 다음 큐로 넘기고 ack, 실패하면 nack (처음 실패만 다시 큐에 넣음)
+    def _finish(self, ch, task):
+        if not ch.is_open:
+            logger.warning(f"Channel closed before job {task.job.get('job_id')} finished, message will be redelivered")
+            return
+        if task.failures:
+            for shard_index, stderr in task.failures:
+                logger.error(f"Augmentation failed for job {task.job.get('job_id')} (shard {shard_index}): {stderr}")
+            requeue = not task.redelivered
+            logger.error(f"Job {task.job.get('job_id')} {'requeued for one retry' if requeue else 'dropped after retry'}")
+            ch.basic_nack(delivery_tag=task.delivery_tag, requeue=requeue)
+            return
+        logger.info(f"Augmentation completed for job {task.job.get('job_id')} in {time.monotonic() - task.started:.1f}s")
+        self._forward(ch, task.delivery_tag, task.job, task.redelivered)
+
+    # broker가 넘긴 job을 받지 않으면(nack / unroutable) 처음 한 번만 다시 큐에 넣고, 다시 실패하면 버림 (무한 반복 방지)
+    def _forward(self, ch, delivery_tag, job, redelivered=False):
+        job = dict(job)
+        job['augmentation'] = {**job['augmentation'], 'completed_at': time.time()}
+        queue = submit_queue(job)
+        try:
+            ch.queue_declare(queue=queue, arguments=RABBITMQ_CONFIG['QUEUE_ARGS'])
+            body, properties = encode_message(job)
+            ch.basic_publish(exchange='', routing_key=queue, body=body, properties=properties)
+        except (pika.exceptions.NackError, pika.exceptions.UnroutableError) as e:
+            requeue = not redelivered
+            logger.error(f"Broker rejected forwarded job {job.get('job_id')}: {e} "
+                         f"({'requeued for one retry' if requeue else 'dropped after retry'})")
+            ch.basic_nack(delivery_tag=delivery_tag, requeue=requeue)
+            return
+        ch.basic_ack(delivery_tag=delivery_tag)
+        logger.info(f"Forwarded job {job.get('job_id')} to {queue}")
+
+
+def connect_to_rabbitmq():
+    connection = pika.BlockingConnection(
+        pika.ConnectionParameters(
+            host=RABBITMQ_CONFIG['HOST'],
+            port=RABBITMQ_CONFIG['PORT'],
+            credentials=pika.PlainCredentials(RABBITMQ_CONFIG['USER'], RABBITMQ_CONFIG['PASSWORD']),
+            heartbeat=RABBITMQ_CONFIG['HEARTBEAT'],
+            blocked_connection_timeout=300
+        )
+    )
+    channel = connection.channel()
+    channel.queue_declare(queue=AUGMENTATION_CONFIG['QUEUE'], arguments=RABBITMQ_CONFIG['QUEUE_ARGS'])
+    # 다음 큐로 넘긴 job이 broker에 저장된 것을 확인한 뒤에 ack
+    channel.confirm_delivery()
+    return connection, channel
+
+
+def main():
+    # pika 스레드가 생기기 전에 프로세스 풀을 먼저 만듦 (fork 시점에 잠금 상태가 복사되지 않도록)
+    pool = ProcessPoolExecutor(max_workers=AUGMENTATION_CONFIG['WORKERS'])
+    stage = AugmentationStage(pool)
+    signal.signal(signal.SIGTERM, lambda signum, frame: sys.exit(0))
 
-def augment_data(job):
-    try:
-        project_root = os.path.dirname(job['config_path'])
-        os.chdir(project_root)
-
-        config = {}
-        config_dir = os.path.join(project_root, 'configs')
-        for config_file in os.listdir(config_dir):
-            if config_file.endswith('yaml'):
-                with open(os.path.join(config_dir, config_file), 'r') as f:
-                    config.update(yaml.safe_load(f))
-
-        env = os.environ.copy()
-        env['TRAIN_CSV_PATH'] = job['train_csv_path']
-        env['TEST_CSV_PATH'] = job['test_csv_path']
-
-        os.chdir(os.path.dirname(job['script_path']))
-
-        command = [
-            sys.executable,
-            job['script_path'],
-            '--aug_path', job['aug_path'],
-            '--config_path', job['config_path']
-        ]
-
-        process = subprocess.Popen(command, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True)
-        stdout, stderr = process.communicate()
-
-        if process.returncode == 0:
-            logging.info("Augmentation completed successfully")
-            return True
-        else:
-            logging.error(f"Augmentation failed: {stderr}")
-            return False
-    except Exception as e:
-        logging.exception(f"An error occurred during augmentation:{str(e)}")
-        return False    
-    
-    
-def callback(ch, method, properties, body):
     try:
-        job = json.loads(body)
-        result = augment_data(job)
-        if result:
-            # 원래 작업 큐로 다시 전송
-            ch.basic_publish(
-                exchange='',
-                routing_key='original_queue',
-                body=body
-            )
-        else:
-            logging.error("Augmentation failed, not sending job back to original queue")
-    except Exception as e:
-        logging.exception(f"An error occurred in callback: {str(e)}")
+        while True:
+            try:
+                connection, channel = connect_to_rabbitmq()
+                channel.basic_qos(prefetch_count=AUGMENTATION_CONFIG['MAX_JOBS'])
+                channel.basic_consume(queue=AUGMENTATION_CONFIG['QUEUE'], on_message_callback=stage.on_message)
+                logger.info(f"Waiting for augmentation messages ({AUGMENTATION_CONFIG['WORKERS']} CPU workers, "
+                            f"up to {AUGMENTATION_CONFIG['MAX_JOBS']} jobs). To exit press CTRL+C")
+                channel.start_consuming()
+            except (AMQPConnectionError, AMQPChannelError) as e:
+                logger.error(f"RabbitMQ connection error: {e}")
+                logger.info("Attempting to reconnect in 5 seconds...")
+                time.sleep(5)
+    except KeyboardInterrupt:
+        logger.info("Augmentation consumer 종료")
     finally:
-        ch.basic_ack(delivery_tag=method.delivery_tag)
+        pool.shutdown(wait=False, cancel_futures=True)
 
-def main():
-    connection = pika.BlockingConnection(pika.ConnectionParameters(RABBITMQ_HOST))
-    channel = connection.channel()
-    channel.queue_declare(queue=AUGMENTATION_QUEUE)
-    channel.basic_consume(queue=AUGMENTATION_QUEUE, on_message_callback=callback)
-    logging.info("Waiting for augmentation messages, To exit press CTRL+C")
-    channel.start_consuming()
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
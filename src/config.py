@@ -13,6 +13,12 @@ RABBITMQ_HOST: str = os.getenv('RABBITMQ_HOST', '127.0.0.1')
 RABBITMQ_PORT: int = int(os.getenv('RABBITMQ_PORT', 5672))
 RABBITMQ_USER: str = os.getenv('RABBITMQ_USER', 'guest')
 RABBITMQ_PASSWORD: str = os.getenv('RABBITMQ_PASSWORD', 'guest')
+# 관리 플러그인 포트 (스케줄러가 gpu_tasks_* 큐 목록을 찾을 때 사용)
+RABBITMQ_MANAGEMENT_PORT: int = int(os.getenv('RABBITMQ_MANAGEMENT_PORT', 15672))
+# 0보다 크면 큐를 x-max-priority로 만들어서 job 우선순위 사용 (기존 큐는 삭제 후 다시 만들어야 함)
+RABBITMQ_MAX_PRIORITY: int = int(os.getenv('RABBITMQ_MAX_PRIORITY', 0))
+# broker와 협상할 heartbeat 간격 (초). 2배 동안 응답이 없으면 broker가 연결을 끊고 ack 안 된 메시지를 다시 보냄
+RABBITMQ_HEARTBEAT: int = int(os.getenv('RABBITMQ_HEARTBEAT', 600))
 
 REDIS_HOST = os.getenv('REDIS_HOST', '127.0.0.1')
 REDIS_PORT: int = int(os.getenv('REDIS_PORT', 6379))
@@ -26,7 +32,9 @@ MAIN_PROJECT_ROOT: str = os.getenv('MAIN_PROJECT_ROOT', r"C:\Users\User\Desktop\
 USER_NAME: str = os.getenv('USER_NAME', 'default_user')
 
 # 사용자별 고유 큐 생성
-RABBITMQ_QUEUE: str = f'gpu_tasks_{USER_NAME}'
+RABBITMQ_QUEUE_PREFIX: str = 'gpu_tasks_'
+RABBITMQ_QUEUE: str = f'{RABBITMQ_QUEUE_PREFIX}{USER_NAME}'
+RABBITMQ_QUEUE_ARGS = {'x-max-priority': RABBITMQ_MAX_PRIORITY} if RABBITMQ_MAX_PRIORITY > 0 else None
 AUGMENTATION_QUEUE:str = 'augmentation_queue'
 
 # 설정 그룹화
@@ -35,7 +43,11 @@ RABBITMQ_CONFIG: Dict[str, str] = {
     'QUEUE': RABBITMQ_QUEUE,
     'USER': RABBITMQ_USER,
     'PASSWORD': RABBITMQ_PASSWORD,
-    'PORT': RABBITMQ_PORT
+    'PORT': RABBITMQ_PORT,
+    'MANAGEMENT_PORT': RABBITMQ_MANAGEMENT_PORT,
+    'QUEUE_PREFIX': RABBITMQ_QUEUE_PREFIX,
+    'QUEUE_ARGS': RABBITMQ_QUEUE_ARGS,
+    'HEARTBEAT': RABBITMQ_HEARTBEAT
 }
 
 REDIS_CONFIG: Dict[str, any] = {
@@ -45,6 +57,127 @@ REDIS_CONFIG: Dict[str, any] = {
     'PASSWORD': REDIS_PASSWORD
 }
 
+# consumer 동시 실행 설정 (WORKERS=0이면 GPU 개수만큼 동시에 job 실행, 1이면 기존처럼 하나씩)
+CONSUMER_WORKERS: int = int(os.getenv('CONSUMER_WORKERS', 0))
+# WORKERS=0일 때 GPU 하나에 동시에 올릴 수 있는 최대 job 수 (메모리를 지정한 작은 job끼리 GPU를 나눠 씀)
+CONSUMER_JOBS_PER_GPU: int = int(os.getenv('CONSUMER_JOBS_PER_GPU', 1))
+# GPU 목록을 가져오는 방법
+#   auto(nvml -> nvidia-smi -> torch 순서로 시도), nvml, nvidia-smi, torch, cuda_visible:81920(CUDA_VISIBLE_DEVICES + GPU당 메모리 MB),
+#   static:81920,81920(GPU별 메모리 MB 지정), fake:4(테스트용)
+GPU_INVENTORY: str = os.getenv('GPU_INVENTORY', 'auto')
+# GPU 조회 결과를 파일에 캐시하는 시간 (초, 0이면 캐시 안 함). consumer를 재시작할 때 GPU 조회를 건너뜀
+GPU_INVENTORY_CACHE_TTL: int = int(os.getenv('GPU_INVENTORY_CACHE_TTL', 3600))
+GPU_INVENTORY_CACHE_PATH: str = os.getenv('GPU_INVENTORY_CACHE_PATH', os.path.join(os.path.expanduser('~'), '.cache', 'redis_rabbitmq', 'gpu_inventory.json'))
+# 데이터셋 로컬 캐시 (공유 마운트의 data_path를 노드 로컬 디스크에 복사해서 사용, 0이면 사용 안 함)
+DATASET_CACHE_DIR: str = os.getenv('DATASET_CACHE_DIR', os.path.join(os.path.expanduser('~'), '.cache', 'redis_rabbitmq', 'datasets'))
+DATASET_CACHE_MAX_GB: float = float(os.getenv('DATASET_CACHE_MAX_GB', 100))
+# 데이터셋 복사에 쓰는 스레드 수
+DATASET_COPY_WORKERS: int = int(os.getenv('DATASET_COPY_WORKERS', 8))
+# 클러스터 registry에 등록할 노드 이름 (없으면 hostname). 한 서버에서 consumer를 여러 개 띄울 때만 따로 지정
+NODE_ID: str = os.getenv('NODE_ID', '')
+# GPU 대여 TTL (초). consumer가 heartbeat로 연장하지 못하면(강제 종료 등) 이 시간 뒤에 회수됨
+GPU_LEASE_TTL: int = int(os.getenv('GPU_LEASE_TTL', 60))
+
+# 운영 지표 HTTP endpoint 포트 (GET /metrics, 0이면 끔). 한 서버에서 consumer를 여러 개 띄우면 각각 다른 포트 지정
+METRICS_PORT: int = int(os.getenv('METRICS_PORT', 9400))
+# Redis / AMQP 왕복 시간을 재는 간격 (초, 0이면 재지 않음)
+METRICS_PROBE_INTERVAL: float = float(os.getenv('METRICS_PROBE_INTERVAL', 15))
+
+# 학습 프로세스를 torch 등을 미리 import해 둔 인터프리터에서 fork해서 시작 (새 인터프리터 + import 시간 절약, Linux만)
+WARM_RUNNER: bool = os.getenv('WARM_RUNNER', 'N').upper() in ('Y', 'TRUE', '1')
+# 미리 import할 모듈 (쉼표 구분, 설치되지 않은 모듈은 건너뜀). import만으로 CUDA를 초기화하는 모듈은 넣으면 안 됨
+WARM_RUNNER_PRELOAD: str = os.getenv('WARM_RUNNER_PRELOAD', 'torch,torchvision,timm,mmcv,mmdet')
+# job을 기다리며 미리 fork해 둘 인터프리터 수
+WARM_RUNNER_SPARES: int = int(os.getenv('WARM_RUNNER_SPARES', 2))
+
+# engine이 augmentation_queue도 같이 처리 (aug_consumer.py를 따로 띄우지 않고 같은 연결에서 CPU 프로세스 풀로 실행)
+CONSUMER_AUGMENTATION: bool = os.getenv('CONSUMER_AUGMENTATION', 'N').upper() in ('Y', 'TRUE', '1')
+
+# asyncio consumer core (async_engine.py, aio-pika 필요): job 실행 중에도 heartbeat / ack / 메트릭 기록이 멈추지 않음
+CONSUMER_ASYNC: bool = os.getenv('CONSUMER_ASYNC', 'N').upper() in ('Y', 'TRUE', '1')
+
+# 스케줄러 모드: 하나의 consumer가 모든 사용자의 gpu_tasks_* 큐를 공정하게(가중치 DRR) 처리
+CONSUMER_SCHEDULER: bool = os.getenv('CONSUMER_SCHEDULER', 'N').upper() in ('Y', 'TRUE', '1')
+# 큐 목록을 관리 API로 못 찾을 때 사용할 사용자 목록 (쉼표 구분)
+SCHEDULER_USERS: str = os.getenv('SCHEDULER_USERS', '')
+# 사용자별 가중치 (예: "user1:2,user2:1", 없으면 1)
+SCHEDULER_WEIGHTS: str = os.getenv('SCHEDULER_WEIGHTS', '')
+
+CONSUMER_CONFIG: Dict[str, any] = {
+    'WORKERS': CONSUMER_WORKERS,
+    'JOBS_PER_GPU': CONSUMER_JOBS_PER_GPU,
+    'GPU_INVENTORY': GPU_INVENTORY,
+    'GPU_INVENTORY_CACHE_TTL': GPU_INVENTORY_CACHE_TTL,
+    'GPU_INVENTORY_CACHE_PATH': GPU_INVENTORY_CACHE_PATH,
+    'NODE_ID': NODE_ID or None,
+    'GPU_LEASE_TTL': GPU_LEASE_TTL,
+    'DATASET_CACHE_DIR': DATASET_CACHE_DIR,
+    'DATASET_CACHE_MAX_BYTES': int(DATASET_CACHE_MAX_GB * 1024 ** 3),
+    'DATASET_COPY_WORKERS': DATASET_COPY_WORKERS,
+    'METRICS_PORT': METRICS_PORT,
+    'METRICS_PROBE_INTERVAL': METRICS_PROBE_INTERVAL,
+    'WARM_RUNNER': WARM_RUNNER,
+    'WARM_RUNNER_PRELOAD': [m.strip() for m in WARM_RUNNER_PRELOAD.split(',') if m.strip()],
+    'WARM_RUNNER_SPARES': WARM_RUNNER_SPARES,
+    'SCHEDULER': CONSUMER_SCHEDULER,
+    'AUGMENTATION': CONSUMER_AUGMENTATION,
+    'ASYNC': CONSUMER_ASYNC,
+    'SCHEDULER_USERS': [u.strip() for u in SCHEDULER_USERS.split(',') if u.strip()],
+    'SCHEDULER_WEIGHTS': {u.split(':')[0].strip(): float(u.split(':')[1]) for u in SCHEDULER_WEIGHTS.split(',') if ':' in u}
+}
+
+# augmentation 단계 (aug_consumer.py): CPU 프로세스 수, 데이터셋 하나를 나눌 shard 수 기본값, 동시에 처리할 job 수
+AUG_WORKERS: int = int(os.getenv('AUG_WORKERS', os.cpu_count() or 1))
+AUG_SHARDS: int = int(os.getenv('AUG_SHARDS', 1))
+AUG_MAX_JOBS: int = int(os.getenv('AUG_MAX_JOBS', 2))
+
+AUGMENTATION_CONFIG: Dict[str, any] = {
+    'QUEUE': AUGMENTATION_QUEUE,
+    'WORKERS': AUG_WORKERS,
+    'SHARDS': AUG_SHARDS,
+    'MAX_JOBS': AUG_MAX_JOBS
+}
+
+# job 메시지 인코딩 (json 또는 msgpack), 이 크기(bytes) 이상이면 zlib 압축,
+# 인코딩 결과가 MESSAGE_MAX_INLINE_KB를 넘으면 본문은 Redis에 PAYLOAD_TTL초 동안 저장하고 메시지에는 키만 보냄 (0이면 항상 메시지에 포함)
+MESSAGE_CODEC: str = os.getenv('MESSAGE_CODEC', 'json')
+MESSAGE_COMPRESS_MIN_BYTES: int = int(os.getenv('MESSAGE_COMPRESS_MIN_BYTES', 1024))
+MESSAGE_MAX_INLINE_KB: int = int(os.getenv('MESSAGE_MAX_INLINE_KB', 128))
+MESSAGE_PAYLOAD_TTL: int = int(os.getenv('MESSAGE_PAYLOAD_TTL', 7 * 24 * 3600))
+
+MESSAGE_CONFIG: Dict[str, any] = {
+    'CODEC': MESSAGE_CODEC.lower(),
+    'COMPRESS_MIN_BYTES': MESSAGE_COMPRESS_MIN_BYTES,
+    'MAX_INLINE_BYTES': MESSAGE_MAX_INLINE_KB * 1024,
+    'PAYLOAD_TTL': MESSAGE_PAYLOAD_TTL
+}
+
+# 학습 출력 줄을 job별 Redis Stream(job_logs:{job_id})으로 전송 (python src/producer.py tail <job_id>로 확인)
+# 출력 줄은 ring buffer(BUFFER_LINES)에 넣기만 하고, 전송 스레드가 BATCH_LINES개씩 또는 FLUSH_INTERVAL초마다 pipeline으로 보냄
+# buffer가 가득 차면(Redis가 느리거나 로그가 너무 많으면) 오래된 줄부터 버리고 버린 줄 수만 stream에 기록
+JOB_LOG_STREAM: bool = os.getenv('JOB_LOG_STREAM', 'Y').upper() in ('Y', 'TRUE', '1')
+# job당 stream에 남길 최근 줄 수 (XADD MAXLEN ~, 대략적인 값)
+JOB_LOG_MAXLEN: int = int(os.getenv('JOB_LOG_MAXLEN', 10000))
+JOB_LOG_BUFFER_LINES: int = int(os.getenv('JOB_LOG_BUFFER_LINES', 20000))
+JOB_LOG_BATCH_LINES: int = int(os.getenv('JOB_LOG_BATCH_LINES', 1000))
+JOB_LOG_FLUSH_INTERVAL: float = float(os.getenv('JOB_LOG_FLUSH_INTERVAL', 0.5))
+JOB_LOG_TTL: int = int(os.getenv('JOB_LOG_TTL', 7 * 24 * 3600))
+# Y면 학습 출력 줄을 consumer 콘솔에도 출력 (줄마다 logger.info라 출력이 많은 job에서는 느림)
+JOB_LOG_CONSOLE: bool = os.getenv('JOB_LOG_CONSOLE', 'N').upper() in ('Y', 'TRUE', '1')
+
+JOB_LOG_CONFIG: Dict[str, any] = {
+    'STREAM': JOB_LOG_STREAM,
+    'MAXLEN': JOB_LOG_MAXLEN,
+    'BUFFER_LINES': JOB_LOG_BUFFER_LINES,
+    'BATCH_LINES': JOB_LOG_BATCH_LINES,
+    'FLUSH_INTERVAL': JOB_LOG_FLUSH_INTERVAL,
+    'TTL': JOB_LOG_TTL,
+    'CONSOLE': JOB_LOG_CONSOLE
+}
+
+# 파싱된 config 캐시 경로 (config 파일 내용 해시별로 저장)
+CONFIG_CACHE_DIR: str = os.getenv('CONFIG_CACHE_DIR', os.path.join(os.path.expanduser('~'), '.cache', 'redis_rabbitmq', 'configs'))
+
 # 프로젝트 메인 경로 지정하기 (./mmdetection 등과 같이 .에 대한 상대경로를 지정해줄 수 있습니다)
 PROJECT_CONFIG: Dict[str, str] = {
     'MAIN_PROJECT_ROOT': MAIN_PROJECT_ROOT
@@ -52,6 +185,21 @@ PROJECT_CONFIG: Dict[str, str] = {
 
 assert REDIS_PORT > 0, "REDIS_PORT must be a positive integer"
 assert REDIS_DB >= 0, "REDIS_DB must be a non-negative integer"
+assert 0 <= RABBITMQ_MAX_PRIORITY <= 255, "RABBITMQ_MAX_PRIORITY must be between 0 and 255"
+assert RABBITMQ_HEARTBEAT >= 0, "RABBITMQ_HEARTBEAT must be non-negative (0 disables heartbeats)"
+assert CONSUMER_WORKERS >= 0, "CONSUMER_WORKERS must be a non-negative integer"
+assert GPU_LEASE_TTL >= 30, "GPU_LEASE_TTL must be at least 30 seconds (heartbeat runs every 10 seconds)"
+assert DATASET_CACHE_MAX_GB >= 0, "DATASET_CACHE_MAX_GB must be non-negative"
+assert AUG_WORKERS > 0 and AUG_SHARDS > 0 and AUG_MAX_JOBS > 0, "AUG_WORKERS, AUG_SHARDS and AUG_MAX_JOBS must be positive integers"
+assert MESSAGE_CODEC.lower() in ('json', 'msgpack'), "MESSAGE_CODEC must be json or msgpack"
+assert MESSAGE_COMPRESS_MIN_BYTES >= 0 and MESSAGE_MAX_INLINE_KB >= 0, "MESSAGE_COMPRESS_MIN_BYTES and MESSAGE_MAX_INLINE_KB must be non-negative"
+assert MESSAGE_PAYLOAD_TTL > 0, "MESSAGE_PAYLOAD_TTL must be positive"
+assert 0 <= METRICS_PORT <= 65535, "METRICS_PORT must be between 0 and 65535"
+assert CONSUMER_JOBS_PER_GPU > 0, "CONSUMER_JOBS_PER_GPU must be a positive integer"
+assert GPU_INVENTORY_CACHE_TTL >= 0, "GPU_INVENTORY_CACHE_TTL must be non-negative"
+assert WARM_RUNNER_SPARES > 0, "WARM_RUNNER_SPARES must be a positive integer"
+assert JOB_LOG_MAXLEN > 0 and JOB_LOG_BUFFER_LINES > 0 and JOB_LOG_BATCH_LINES > 0, "JOB_LOG_MAXLEN, JOB_LOG_BUFFER_LINES and JOB_LOG_BATCH_LINES must be positive integers"
+assert JOB_LOG_FLUSH_INTERVAL > 0 and JOB_LOG_TTL > 0, "JOB_LOG_FLUSH_INTERVAL and JOB_LOG_TTL must be positive"
 
 # 로깅 설정
 LOG_LEVEL = os.getenv('LOG_LEVEL', 'INFO')
@@ -0,0 +1,184 @@
+import os
+import ast
+import copy
+import types
+import hashlib
+import logging
+import threading
+from collections import OrderedDict
+import importlib.util
+from config import CONFIG_CACHE_DIR
+
+logger = logging.getLogger(__name__)
+
+# producer/consumer가 같이 쓰는 config 폴더 로더.
+# 관련된 파일(폴더 안의 .yaml/.py + mmdetection _base_로 상속하는 파일들)의 내용 해시를 키로 캐시해서
+# 같은 config로 여러 job을 제출/실행해도 .py config는 한 번만 실행됨.
+# 파일이 하나라도 바뀌면 해시가 달라지므로 캐시도 자동으로 무효화됨
+# 캐시에는 pickle 대신 파이썬 literal(repr)로 저장하고 ast.literal_eval로 읽음
+# (Redis는 여러 사용자가 같이 쓰므로 캐시 값을 읽을 때 코드가 실행되면 안 됨. JSON과 달리 tuple / int 키도 그대로 유지)
+REDIS_CACHE_KEY = 'config_cache:{key}'
+REDIS_CACHE_TTL = 24 * 60 * 60
+
+# 프로세스 안 메모리 캐시에 둘 config 수 (가장 오래 안 쓴 것부터 버림, 버린 config는 디스크 캐시에서 다시 읽음)
+MEMORY_CACHE_SIZE = 128
+
+_memory_cache = OrderedDict()
+_lock = threading.Lock()
+
+
+def _file_hash(path):
+    with open(path, 'rb') as f:
+        return hashlib.sha256(f.read()).hexdigest()
+
+
+# .py config의 _base_ 값을 실행 없이 읽어옴 (mmdetection 상속)
+def _read_bases(path):
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            tree = ast.parse(f.read(), filename=path)
+    except (OSError, SyntaxError, ValueError):
+        return []
+    for node in tree.body:
+        if isinstance(node, ast.Assign) and any(isinstance(t, ast.Name) and t.id == '_base_' for t in node.targets):
+            try:
+                bases = ast.literal_eval(node.value)
+            except ValueError:
+                return []
+            if isinstance(bases, str):
+                bases = [bases]
+            base_dir = os.path.dirname(path)
+            return [os.path.normpath(os.path.join(base_dir, b)) for b in bases if isinstance(b, str)]
+    return []
+
+
+# config로 읽을 파일 목록 (정렬해서 항상 같은 순서로 merge)
+def list_config_files(config_path):
+    if os.path.isfile(config_path):
+        return [config_path]
+    names = sorted(f for f in os.listdir(config_path) if f.endswith(('.yaml', '.py')))
+    return [os.path.join(config_path, f) for f in names]
+
+
+# config 결과에 영향을 주는 모든 파일 내용 해시로 캐시 키 계산
+def config_fingerprint(config_path):
+    files = list_config_files(config_path)
+    digest = hashlib.sha256()
+    seen = set()
+    pending = list(files)
+    while pending:
+        path = pending.pop(0)
+        if path in seen or not os.path.isfile(path):
+            continue
+        seen.add(path)
+        digest.update(os.path.relpath(path, os.path.dirname(config_path)).encode())
+        digest.update(_file_hash(path).encode())
+        if path.endswith('.py'):
+            pending.extend(_read_bases(path))
+    return digest.hexdigest()
+
+
+def _load_file(file_path):
+    if file_path.endswith('.yaml'):
+        import yaml
+        with open(file_path, 'r') as f:
+            return yaml.safe_load(f) or {}
+    spec = importlib.util.spec_from_file_location(os.path.basename(file_path)[:-3], file_path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    # 모듈에서 _로 시작하지 않고 함수/모듈이 아닌 변수를 설정으로 간주
+    return {k: v for k, v in module.__dict__.items()
+            if not k.startswith('_') and not callable(v) and not isinstance(v, types.ModuleType)}
+
+
+# 실제로 파일을 읽고 실행해서 merge
+def _parse_config(config_path):
+    config = {}
+    for file_path in list_config_files(config_path):
+        try:
+            config.update(_load_file(file_path))
+            logger.info(f"Loaded config file: {os.path.basename(file_path)}")
+        except Exception as e:
+            logger.warning(f"Failed loading config file {file_path} as {e}")
+    if not config:
+        logger.warning(f"No valid YAML/py files found in {config_path}")
+    return config
+
+
+# 캐시 값 -> config dict. 형식이 맞지 않으면 None
+def _decode(payload):
+    try:
+        config = ast.literal_eval(payload.decode())
+    except (ValueError, SyntaxError, MemoryError, RecursionError, UnicodeDecodeError):
+        return None
+    return config if isinstance(config, dict) else None
+
+
+# config dict -> 캐시 값. literal로 다시 읽었을 때 같은 값이 아니면(객체, nan 등) 캐시하지 않음
+def _encode(config):
+    payload = repr(config).encode()
+    if _decode(payload) != config:
+        return None
+    return payload
+
+
+def _read_disk_cache(key):
+    path = os.path.join(CONFIG_CACHE_DIR, f"{key}.cfg")
+    try:
+        with open(path, 'rb') as f:
+            return _decode(f.read())
+    except OSError:
+        return None
+
+
+def _write_disk_cache(key, payload):
+    try:
+        os.makedirs(CONFIG_CACHE_DIR, exist_ok=True)
+        tmp_path = os.path.join(CONFIG_CACHE_DIR, f"{key}.{os.getpid()}.tmp")
+        with open(tmp_path, 'wb') as f:
+            f.write(payload)
+        os.replace(tmp_path, os.path.join(CONFIG_CACHE_DIR, f"{key}.cfg"))
+    except OSError as e:
+        logger.debug(f"Could not write config cache: {e}")
+
+
+# config 폴더(또는 파일)를 읽어서 merge된 dict 반환
+# 메모리 -> 로컬 디스크 -> (r을 넘긴 경우) redis 순서로 캐시를 확인하고, 없으면 파싱 후 모든 캐시에 저장
+# 반환값은 복사본이라 호출한 쪽에서 수정해도 캐시에는 영향 없음
+def load_config(config_path, r=None):
+    key = config_fingerprint(config_path)
+
+    with _lock:
+        config = _memory_cache.get(key)
+        if config is not None:
+            _memory_cache.move_to_end(key)
+    if config is not None:
+        return copy.deepcopy(config)
+
+    config = _read_disk_cache(key)
+    source = 'disk'
+    if config is None and r is not None:
+        payload = r.get(REDIS_CACHE_KEY.format(key=key))
+        config = _decode(payload) if payload else None
+        if config is not None:
+            source = 'redis'
+            _write_disk_cache(key, payload)
+
+    if config is None:
+        config = _parse_config(config_path)
+        source = 'parsed'
+        payload = _encode(config)
+        if payload is None:
+            logger.debug(f"Config {config_path} is not cacheable (values other than python literals)")
+        else:
+            _write_disk_cache(key, payload)
+            if r is not None:
+                r.set(REDIS_CACHE_KEY.format(key=key), payload, ex=REDIS_CACHE_TTL)
+
+    logger.debug(f"Config {config_path} loaded from {source} ({key[:12]})")
+    with _lock:
+        _memory_cache[key] = config
+        _memory_cache.move_to_end(key)
+        while len(_memory_cache) > MEMORY_CACHE_SIZE:
+            _memory_cache.popitem(last=False)
+    return copy.deepcopy(config)
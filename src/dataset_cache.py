@@ -0,0 +1,182 @@
+import os
+import json
+import time
+import shutil
+import hashlib
+import logging
+import threading
+from contextlib import contextmanager
+from concurrent.futures import ThreadPoolExecutor
+from dataset_manifest import build_manifest
+
+try:
+    import fcntl
+except ImportError:  # Windows: 스테이징 없이 원본 경로 사용
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+# 공유 마운트에 있는 데이터셋을 노드 로컬 디스크에 복사해두고 job들이 같이 쓰는 캐시
+#   {root}/{manifest 해시}/            복사본 (원본 폴더와 같은 구조)
+#   {root}/{manifest 해시}/.staged     완료 표시 (원본 경로, 크기). mtime = 마지막 사용 시각 (LRU)
+#   {root}/{manifest 해시}.lock        복사 중 잠금 (같은 데이터셋은 한 job만 복사, 나머지는 기다렸다가 공유)
+#   {root}/{manifest 해시}.use         사용 중 표시 (job 실행 동안 공유 잠금 -> 사용 중인 복사본은 지우지 않음)
+#   {root}/.evict.lock                 용량 정리 잠금
+# 잠금은 flock이라 consumer가 죽으면 자동으로 풀림
+STAGED_FILE = '.staged'
+EVICT_LOCK = '.evict.lock'
+
+# 큰 파일은 이 크기로 나눠서 여러 스레드가 동시에 복사
+CHUNK_SIZE = 64 * 1024 * 1024
+COPY_BUFFER = 1024 * 1024
+COPY_WORKERS = 8
+
+
+def _copy_chunk(src, dst, offset, length):
+    src_fd = os.open(src, os.O_RDONLY)
+    dst_fd = os.open(dst, os.O_WRONLY)
+    try:
+        end = offset + length
+        while offset < end:
+            data = os.pread(src_fd, min(COPY_BUFFER, end - offset), offset)
+            if not data:
+                break
+            written = 0
+            while written < len(data):
+                written += os.pwrite(dst_fd, data[written:], offset + written)
+            offset += len(data)
+    finally:
+        os.close(src_fd)
+        os.close(dst_fd)
+
+
+# 실행 중인 job이 쓰는 데이터셋 경로. release() 전까지 복사본이 지워지지 않음
+class StagedDataset:
+    def __init__(self, path, use_file=None):
+        self.path = path
+        self._use_file = use_file
+
+    @property
+    def staged(self):
+        return self._use_file is not None
+
+    def release(self):
+        if self._use_file is not None:
+            self._use_file.close()
+            self._use_file = None
+
+
+class DatasetCache:
+    def __init__(self, root, max_bytes, workers=COPY_WORKERS, chunk_size=CHUNK_SIZE):
+        self.root = root
+        self.max_bytes = max_bytes
+        self.workers = max(int(workers), 1)
+        self.chunk_size = chunk_size
+
+    @property
+    def enabled(self):
+        return fcntl is not None and self.max_bytes > 0
+
+    @contextmanager
+    def _locked(self, name, mode=None):
+        with open(os.path.join(self.root, name), 'a') as f:
+            fcntl.flock(f, fcntl.LOCK_EX if mode is None else mode)
+            yield f
+
+    # source 데이터셋을 로컬 캐시에 준비하고 StagedDataset 반환
+    # 캐시를 쓸 수 없으면(비활성화, 폴더가 아님, 캐시보다 큼) 원본 경로를 그대로 돌려줌
+    def stage(self, source):
+        if not self.enabled or not os.path.isdir(source):
+            return StagedDataset(source)
+        entries = build_manifest(source)
+        total = sum(size for _, size, _ in entries)
+        if total > self.max_bytes:
+            logger.warning(f"Dataset {source} ({total / 1e9:.1f}GB) is larger than the dataset cache, using it in place")
+            return StagedDataset(source)
+
+        os.makedirs(self.root, exist_ok=True)
+        key = hashlib.sha256(json.dumps(entries, separators=(',', ':')).encode()).hexdigest()[:32]
+        entry_dir = os.path.join(self.root, key)
+
+        # 사용 표시를 먼저 잡아서, 복사가 끝나기 전에 다른 consumer가 지우지 못하게 함
+        use_file = open(os.path.join(self.root, f"{key}.use"), 'a')
+        try:
+            fcntl.flock(use_file, fcntl.LOCK_SH)
+            with self._locked(f"{key}.lock"):
+                staged_file = os.path.join(entry_dir, STAGED_FILE)
+                if os.path.exists(staged_file):
+                    logger.info(f"Dataset {source} already staged at {entry_dir}")
+                else:
+                    with self._locked(EVICT_LOCK):
+                        self._evict(total, keep=key)
+                    self._copy(source, entries, entry_dir, total)
+                os.utime(staged_file)
+        except BaseException:
+            use_file.close()
+            raise
+        return StagedDataset(entry_dir, use_file)
+
+    def _copy(self, source, entries, entry_dir, total):
+        started = time.monotonic()
+        tmp_dir = f"{entry_dir}.tmp-{os.getpid()}-{threading.get_ident()}"
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+        shutil.rmtree(entry_dir, ignore_errors=True)
+        try:
+            tasks = []
+            for rel_path, size, _ in entries:
+                src = os.path.join(source, rel_path)
+                dst = os.path.join(tmp_dir, rel_path)
+                os.makedirs(os.path.dirname(dst), exist_ok=True)
+                with open(dst, 'wb') as f:
+                    f.truncate(size)
+                for offset in range(0, size, self.chunk_size):
+                    tasks.append((src, dst, offset, min(self.chunk_size, size - offset)))
+
+            with ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix='dataset-copy') as pool:
+                for future in [pool.submit(_copy_chunk, *task) for task in tasks]:
+                    future.result()
+
+            with open(os.path.join(tmp_dir, STAGED_FILE), 'w') as f:
+                json.dump({'source': os.path.abspath(source), 'bytes': total, 'files': len(entries), 'staged_at': time.time()}, f)
+            os.rename(tmp_dir, entry_dir)
+        except BaseException:
+            shutil.rmtree(tmp_dir, ignore_errors=True)
+            raise
+        elapsed = time.monotonic() - started
+        logger.info(f"Staged dataset {source} -> {entry_dir} ({len(entries)} files, {total / 1e9:.2f}GB "
+                    f"in {elapsed:.1f}s, {total / 1e6 / max(elapsed, 1e-6):.0f}MB/s)")
+
+    # 캐시에 있는 복사본 목록 [(key, bytes, 마지막 사용 시각), ...] 오래된 순
+    def entries(self):
+        result = []
+        if not os.path.isdir(self.root):
+            return result
+        for key in os.listdir(self.root):
+            staged_file = os.path.join(self.root, key, STAGED_FILE)
+            try:
+                with open(staged_file) as f:
+                    size = json.load(f)['bytes']
+                result.append((key, size, os.path.getmtime(staged_file)))
+            except (OSError, ValueError, KeyError):
+                continue
+        return sorted(result, key=lambda e: e[2])
+
+    # 새로 needed 바이트를 넣을 수 있을 때까지 오래 안 쓴 복사본부터 삭제 (사용 중인 복사본은 건너뜀)
+    def _evict(self, needed, keep=None):
+        entries = self.entries()
+        used = sum(size for _, size, _ in entries)
+        for key, size, _ in entries:
+            if used + needed <= self.max_bytes:
+                break
+            if key == keep:
+                continue
+            with open(os.path.join(self.root, f"{key}.use"), 'a') as use_file:
+                try:
+                    fcntl.flock(use_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                except BlockingIOError:
+                    continue
+                shutil.rmtree(os.path.join(self.root, key), ignore_errors=True)
+            used -= size
+            logger.info(f"Evicted staged dataset {key} ({size / 1e9:.2f}GB)")
+        if used + needed > self.max_bytes:
+            logger.warning(f"Dataset cache over budget: {(used + needed) / 1e9:.1f}GB in use (limit {self.max_bytes / 1e9:.1f}GB)")
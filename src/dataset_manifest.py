@@ -0,0 +1,30 @@
+import os
+import json
+import hashlib
+
+# 데이터셋 폴더의 내용 목록 (파일별 상대경로, 크기, 수정 시각)
+# 파일 내용을 다 읽지 않고 stat만 하므로 큰 데이터셋에서도 빠르게 바뀐 여부를 확인할 수 있음
+
+
+def build_manifest(root):
+    root = os.path.abspath(root)
+    if os.path.isfile(root):
+        st = os.stat(root)
+        return [(os.path.basename(root), st.st_size, st.st_mtime_ns)]
+    entries = []
+    for dirpath, dirnames, filenames in os.walk(root):
+        dirnames.sort()
+        for name in sorted(filenames):
+            path = os.path.join(dirpath, name)
+            try:
+                st = os.stat(path)
+            except OSError:
+                continue
+            entries.append((os.path.relpath(path, root).replace(os.sep, '/'), st.st_size, st.st_mtime_ns))
+    return entries
+
+
+def manifest_hash(root):
+    if not os.path.exists(root):
+        return hashlib.sha256(f"missing:{os.path.abspath(root)}".encode()).hexdigest()
+    return hashlib.sha256(json.dumps(build_manifest(root), separators=(',', ':')).encode()).hexdigest()
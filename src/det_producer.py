@@ -5,52 +5,21 @@ import pika.exceptions
 import yaml
 import time
 from config import RABBITMQ_CONFIG, USER_NAME
+from config_loader import load_config
+from job_schema import extract_info, build_det_job, encode_message
+from sweep import load_sweep_spec, expand_sweep, apply_overrides, ConfirmedPublisher, MAX_IN_FLIGHT
 import sys
 import logging
 import zlib
 import os
 import importlib
+import uuid
 
 logger = logging.getLogger(__name__)
 
-# config.yaml 가져오기
+# config.yaml 가져오기 (파일 내용 해시 기준으로 캐시됨)
 def get_config(config_path):
-    config = {}
-
-    config_files = [f for f in os.listdir(config_path) if f.endswith(('.yaml', '.py'))]
-
-    for files in config_files:
-        file_path = os.path.join(config_path, files)
-        try:
-            if files.endswith('.yaml'):
-                with open(file_path, 'r') as f:
-                    yaml_content = yaml.safe_load(f)
-                    if yaml_content:
-                        config.update(yaml_content)
-                logger.info(f"Loaded config file: {files}")
-            elif files.endswith('.py'):
-                # Python 파일 로드
-                spec = importlib.util.spec_from_file_location(files[:-3], file_path)
-                module = importlib.util.module_from_spec(spec)
-                spec.loader.exec_module(module)
-                
-                # 모듈에서 대문자로 시작하는 모든 변수를 설정으로 간주
-                py_config = {k: v for k, v in module.__dict__.items() if not k.startswith('__') and not callable(v) and not k.startswith('_')}
-                config.update(py_config)
-                logger.info(f"Loaded Python config file: {files}")
-        except Exception as e:
-            logger.warning(f"Failed loading config file {files} as {e}")
-    
-    if not config:
-        logger.warning(f"No valid YAML/py files found in {file_path}")
-
-    return config
-
-# config 정보 추출 (추후 추가 예정)
-def extract_info(config):
-    model_name = config.get('model', {}).get('name', 'default_model')
-    learning_rate = config.get('training', {}).get('learning_rate', 0.001)
-    return model_name, learning_rate
+    return load_config(config_path)
 
 # config validate
 def validate_config(config):
@@ -59,6 +28,13 @@ def validate_config(config):
         if key not in config:
             raise ValueError(f"Missing required key in config: {key}")
 
+def connection_parameters():
+    return pika.ConnectionParameters(
+        host=RABBITMQ_CONFIG['HOST'],
+        port=RABBITMQ_CONFIG['PORT'],
+        credentials=pika.PlainCredentials(RABBITMQ_CONFIG['USER'], RABBITMQ_CONFIG['PASSWORD'])
+    )
+
 # rabbitmq 연결
 def connect_to_rabbitmq():
     retries = 0
@@ -66,13 +42,9 @@ def connect_to_rabbitmq():
     RETRY_DELAY = 5  # seconds
     while retries < MAX_RETRIES:
         try:
-            connection = pika.BlockingConnection(pika.ConnectionParameters(
-                host=RABBITMQ_CONFIG['HOST'],
-                port=RABBITMQ_CONFIG['PORT'],
-                credentials=pika.PlainCredentials(RABBITMQ_CONFIG['USER'], RABBITMQ_CONFIG['PASSWORD'])
-            ))
+            connection = pika.BlockingConnection(connection_parameters())
             channel = connection.channel()
-            channel.queue_declare(queue=RABBITMQ_CONFIG['QUEUE'])
+            channel.queue_declare(queue=RABBITMQ_CONFIG['QUEUE'], arguments=RABBITMQ_CONFIG['QUEUE_ARGS'])
             logger.info("Successfully connected to RabbitMQ")
             return connection, channel
         except pika.exceptions.AMQPConnectionError as e:
@@ -95,6 +67,23 @@ def submit_job(channel, job_data):
     )
     logger.info(f"Submitted job: {job_data}")
 
+# sweep spec을 펼쳐서 연결 하나로 모두 제출 (publisher confirm으로 확인)
+def submit_sweep(spec_path, base_job, max_in_flight=MAX_IN_FLIGHT):
+    jobs = [apply_overrides(base_job, overrides) for overrides in expand_sweep(load_sweep_spec(spec_path))]
+    messages = [(job['job_id'], *encode_message(job)) for job in jobs]
+
+    start = time.time()
+    results = ConfirmedPublisher(connection_parameters(), RABBITMQ_CONFIG['QUEUE'], messages, max_in_flight,
+                                 queue_arguments=RABBITMQ_CONFIG['QUEUE_ARGS']).run()
+    elapsed = time.time() - start
+
+    for job in jobs:
+        status = 'submitted' if results[job['job_id']] else 'FAILED'
+        print(f"{job['job_id']}\t{status}\t{' '.join(job['script_args'])}")
+    confirmed = sum(1 for ok in results.values() if ok)
+    logger.info(f"Sweep: {confirmed}/{len(jobs)} jobs confirmed in {elapsed:.2f}s ({len(jobs) / max(elapsed, 1e-9):.0f} jobs/sec) by user {USER_NAME}")
+    return results
+
 # main
 def main():
     print("Script is starting...")
@@ -107,38 +96,43 @@ def main():
     parser.add_argument('--script_path', type=str, required=True, help='Path to the training script')
     parser.add_argument('--seed', type=int, default=42, help='Random seed')
     parser.add_argument('--device', type=str, default='cuda', help='Device to use')
+    parser.add_argument('--priority', type=int, default=0, help='Job priority (needs RABBITMQ_MAX_PRIORITY > 0)')
+    parser.add_argument('--gpu_memory', type=int, help='Estimated GPU memory in MB (lets small jobs share a GPU)')
+    parser.add_argument('--gpu_share', type=float, help='Estimated share of GPU compute (0-1)')
+    parser.add_argument('--force', action='store_true', help='Re-run even if an identical job already finished')
+    parser.add_argument('--sweep', type=str, help='YAML/JSON sweep spec (grid or jobs list) to submit many jobs at once')
+    parser.add_argument('--max_in_flight', type=int, default=MAX_IN_FLIGHT, help='Max unconfirmed messages during --sweep')
     parser.add_argument('script_args', nargs=argparse.REMAINDER, help='Additional arguments for the script')
 
     args = parser.parse_args()
     print("Parsed arguments:", args)
 
     try:
-        connection, channel = connect_to_rabbitmq()
-
         # config = get_config(args.config_path)
         # model_name, learning_rate = extract_info(config)
 
-        job = {
-            'user': USER_NAME,
-            'config_path': args.config_path,
-            'work_dir': args.work_dir,
-            'seed': args.seed,
-            'device': args.device,
-            'script_path': args.script_path,
-            'script_args': args.script_args
-        }
+        job = build_det_job(args.script_path, args.config_path, args.work_dir,
+                            seed=args.seed, device=args.device, script_args=args.script_args, priority=args.priority,
+                            gpu_memory_mb=args.gpu_memory, gpu_share=args.gpu_share, force=args.force)
+
+        if args.sweep:
+            results = submit_sweep(args.sweep, job, args.max_in_flight)
+            if not all(results.values()):
+                sys.exit(1)
+            return
 
-        compressed_message = zlib.compress(json.dumps(job).encode())
+        connection, channel = connect_to_rabbitmq()
+        body, properties = encode_message(job)
 
         channel.basic_publish(
             exchange='',
             routing_key=RABBITMQ_CONFIG['QUEUE'],
-            body=compressed_message,
-            properties=pika.BasicProperties(delivery_mode=2)
+            body=body,
+            properties=properties
         )
 
         # submit_job(channel, job)
-        logger.info(f"Job submitted to queue by user {USER_NAME}")
+        logger.info(f"Job {job['job_id']} submitted to queue by user {USER_NAME}")
     except pika.exceptions.AMQPConnectionError:
         logger.error("Failed to connect to RabbitMQ after multiple attempts. Exiting.")
         sys.exit(1)
@@ -0,0 +1,473 @@
+import pika
+import json
+import pika.exceptions
+import redis
+import os
+import time
+import logging
+import signal
+import sys
+import threading
+import uuid
+from pika.exceptions import AMQPConnectionError, AMQPChannelError
+from config import RABBITMQ_CONFIG, CONSUMER_CONFIG, AUGMENTATION_CONFIG, JOB_LOG_CONFIG
+from gpu_pool import GpuLeasePool, make_holder, estimate_gpu_request, record_gpu_usage
+from gpu_inventory import make_inventory
+from gpu_registry import GpuRegistry, NodeHeartbeat
+from worker_pool import JobWorkerPool
+from scheduler import run_scheduler
+from process_stream import stream_process
+from metric_parser import MetricParser
+from metric_store import MetricStore, get_latest, get_gpu_memory
+from result_cache import ResultCache, apply_cached_result
+from dataset_cache import DatasetCache, StagedDataset
+from job_schema import decode_job
+from job_handlers import handler_for, job_type_of, remove_temp_paths
+from job_codec import discard_payload
+from job_trace import JobTrace
+from job_logs import JobLogSink
+from instrumentation import (JOBS_STARTED, JOBS_SUCCEEDED, JOBS_FAILED, JOBS_CACHED, QUEUE_WAIT_SECONDS, GPU_ACQUIRE_SECONDS,
+                             JOB_RUNTIME_SECONDS, PARSE_LINE_SECONDS, MESSAGES_IN_FLIGHT, start_consumer_metrics, schedule_amqp_probe)
+from metric_channel import METRICS_FD_ENV, open_metric_pipe, apply_record
+from warm_runner import popen_job, start_warm_runner, stop_warm_runner
+from redis_client import LazyRedis
+
+# 분류 / mmdetection / augmentation job을 처리하는 consumer engine
+# 연결 하나, GPU 대여 풀 하나, 메트릭 파서 경로 하나를 모든 job 종류가 같이 사용하고, 종류별로 다른 부분
+# (학습 명령, 결과 캐시 지문, 결과물 경로)은 job['job_type']에 따라 job_handlers의 handler가 처리
+# 한 서버의 GPU는 job 종류와 상관없이 이 풀에서 대여되므로, 먼저 뜬 consumer가 GPU를 모두 가져가지 않음
+# CONSUMER_AUGMENTATION=Y이면 augmentation_queue도 같은 연결의 다른 channel에서 CPU 프로세스 풀로 처리
+#   python src/engine.py  (consumer.py / det_consumer.py도 같은 engine을 실행)
+
+# job_handlers의 로거(engine.jobs)도 이 핸들러로 출력되도록 이름을 고정
+logger = logging.getLogger('engine')
+logger.setLevel(logging.INFO)
+
+# 콘솔 핸들러 추가
+console_handler = logging.StreamHandler()
+console_handler.setLevel(logging.INFO)
+formatter = logging.Formatter('%(asctime)s - %(levelname)s - %(message)s')
+console_handler.setFormatter(formatter)
+logger.addHandler(console_handler)
+
+# Redis 클라이언트는 처음 쓸 때 생성 (import만 하는 도구 / 벤치마크에서는 만들지 않음)
+r = LazyRedis()
+result_cache = ResultCache(r)
+dataset_cache = DatasetCache(CONSUMER_CONFIG['DATASET_CACHE_DIR'], CONSUMER_CONFIG['DATASET_CACHE_MAX_BYTES'], CONSUMER_CONFIG['DATASET_COPY_WORKERS'])
+# GPU 목록은 initialize_gpu_list()에서 처음 조회 (nvml 등 설정된 backend, 결과는 캐시)
+gpu_inventory = make_inventory(CONSUMER_CONFIG['GPU_INVENTORY'], CONSUMER_CONFIG['GPU_INVENTORY_CACHE_PATH'], CONSUMER_CONFIG['GPU_INVENTORY_CACHE_TTL'])
+gpu_pool = GpuLeasePool(r, gpu_inventory, CONSUMER_CONFIG['NODE_ID'], CONSUMER_CONFIG['GPU_LEASE_TTL'])
+# 한 서버의 모든 job 종류가 같이 쓰는 GPU 대여 풀
+# 이 서버의 GPU를 클러스터 registry에 node_id:gpu로 등록하고 heartbeat 전송 (실행 중인 job의 GPU 대여도 같이 연장)
+gpu_registry = GpuRegistry(r)
+node_heartbeat = NodeHeartbeat(gpu_registry, gpu_pool.node_id, gpu_pool)
+
+# 실행 중인 학습 프로세스 (종료 시그널 때 정리용)
+running_processes = set()
+running_lock = threading.Lock()
+ 
+# rabbitmq의 queue와 연결
+def connect_to_rabbitmq():
+    retries = 0
+    MAX_RETRIES = 5
+    RETRY_DELAY = 5  # seconds
+    while retries < MAX_RETRIES:
+        try:
+            logger.info(f"Attempting to connect to RabbitMQ with host: {RABBITMQ_CONFIG['HOST']}, port: {RABBITMQ_CONFIG['PORT']}, user: {RABBITMQ_CONFIG['USER']}, pw: {RABBITMQ_CONFIG['PASSWORD']}")
+            connection = pika.BlockingConnection(
+                pika.ConnectionParameters(
+                host=RABBITMQ_CONFIG['HOST'],
+                port=RABBITMQ_CONFIG['PORT'],
+                credentials=pika.PlainCredentials(RABBITMQ_CONFIG['USER'], RABBITMQ_CONFIG['PASSWORD']),
+                heartbeat=RABBITMQ_CONFIG['HEARTBEAT'],
+                blocked_connection_timeout=300
+                )
+            )
+            channel = connection.channel()
+            channel.queue_declare(queue=RABBITMQ_CONFIG['QUEUE'], arguments=RABBITMQ_CONFIG['QUEUE_ARGS'])
+            logger.info("Successfully connected to RabbitMQ")
+            return connection, channel
+        except AMQPConnectionError as e:
+            retries += 1
+            logger.warning(f"Failed to connect to RabbitMQ (attempt {retries}/{MAX_RETRIES}): {e}")
+            if retries < MAX_RETRIES:
+                logger.info(f"Retrying in {RETRY_DELAY} seconds...")
+                time.sleep(RETRY_DELAY)
+            else:
+                logger.error("Max retries reached. Unable to connect to RabbitMQ.")
+                raise
+
+def initialize_gpu_list(r):
+    devices = gpu_pool.initialize()
+    gpu_registry.register(gpu_pool.node_id, devices)
+    node_heartbeat.start()
+    print(f"Initialized available GPUs on {gpu_pool.node_id}: {gpu_pool.devices()}")
+
+# 종료 시 이 프로세스의 GPU 대여를 반납하고 registry에서 이 노드를 뺌
+# (풀 자체는 같은 노드의 다른 consumer가 쓰고 있을 수 있으므로 지우지 않음)
+def leave_cluster():
+    node_heartbeat.stop()
+    try:
+        gpu_pool.release_all()
+        gpu_registry.deregister(gpu_pool.node_id)
+    except redis.RedisError as e:
+        logger.error(f"Error leaving GPU registry: {e}")
+
+# 사용 가능한 GPU 대여 (반납 신호가 올 때까지 블로킹). memory_mb/share를 주면 다른 job과 GPU를 나눠 씀
+def get_available_gpu(r, holder=None, memory_mb=None, share=None, job_id=None):
+    return gpu_pool.acquire(holder or make_holder(), memory_mb, share, job_id=job_id)
+
+def release_gpu(r: redis.Redis, gpu_id: int, holder=None):
+    gpu_pool.release(gpu_id, holder or make_holder())
+
+# 데이터셋을 노드 로컬 캐시에 준비. 복사에 실패하면 원본 경로를 그대로 사용
+def stage_dataset(data_root):
+    try:
+        return dataset_cache.stage(data_root)
+    except OSError as e:
+        logger.warning(f"Could not stage dataset {data_root}, using it in place: {e}")
+        return StagedDataset(data_root)
+
+# 학습 출력 줄을 보낼 job별 로그 stream (JOB_LOG_STREAM=N이면 None)
+def open_log_sink(job_id):
+    if not JOB_LOG_CONFIG['STREAM']:
+        return None
+    return JobLogSink(r, job_id, JOB_LOG_CONFIG['MAXLEN'], JOB_LOG_CONFIG['BUFFER_LINES'], JOB_LOG_CONFIG['BATCH_LINES'],
+                      JOB_LOG_CONFIG['FLUSH_INTERVAL'], JOB_LOG_CONFIG['TTL'])
+
+# staged_data_root: 로컬 캐시에 복사된 데이터셋 경로 (없으면 job의 원래 경로 사용), trace: 단계별 시각 기록 (job_trace.JobTrace)
+def run_job(job, r, channel, gpu_id, staged_data_root=None, trace=None):
+    handler = handler_for(job)
+    env = os.environ.copy()
+    env['CUDA_VISIBLE_DEVICES'] = str(gpu_id)
+    env['PATH'] = f"{os.path.dirname(sys.executable)};{env['PATH']}"
+
+    # 여러 job이 동시에 돌기 때문에 os.chdir 대신 Popen의 cwd로 작업 경로 지정
+    working_dir = handler.working_dir(job)
+    logger.info(f"Working directory: {working_dir}")
+
+    # job 종류별 학습 명령 (분류 job은 config의 데이터 경로를 바꾸고 데이터 파일을 확인함)
+    temp_paths = []
+    command = handler.build_command(job, r, staged_data_root, temp_paths)
+    if command is None:
+        remove_temp_paths(temp_paths)
+        return False
+    if trace is not None:
+        trace.mark('config_ready')
+
+    process = None
+    parser = None
+    log_sink = None
+
+    env['PYTHONPATH'] = f"{working_dir}:{env.get('PYTHONPATH', '')}"
+
+    try:
+        # 학습 스크립트가 metric_channel로 메트릭을 직접 보낼 수 있도록 전용 파이프 연결
+        metric_pipe, metric_fd = open_metric_pipe()
+        if metric_fd is not None:
+            env[METRICS_FD_ENV] = str(metric_fd)
+        try:
+            # WARM_RUNNER=Y이면 torch 등을 미리 import해 둔 인터프리터에서 fork (아니면 기존처럼 새 인터프리터)
+            process = popen_job(command, env, working_dir, pass_fds=() if metric_fd is None else (metric_fd,))
+        finally:
+            # 쓰기 쪽은 자식만 들고 있어야 학습이 끝날 때 EOF가 옴
+            if metric_fd is not None:
+                os.close(metric_fd)
+        with running_lock:
+            running_processes.add(process)
+        if trace is not None:
+            trace.mark('spawned')
+            # 실행 중인 job도 trace CLI에서 보이도록 여기까지 기록
+            trace.flush()
+
+        # 학습 중에 stdout/stderr를 줄 단위로 바로 파싱 (redis 진행 상황도 실시간 반영)
+        parser = MetricParser(MetricStore(r, job['job_id']))
+        log_sink = open_log_sink(job['job_id'])
+        stdout, stderr = stream_process(process, lambda line, source: process_output(line, parser, source, trace, log_sink),
+                                        extra_pipes={'metrics': metric_pipe} if metric_pipe else None)
+        process.wait()
+        if trace is not None:
+            trace.mark('exit')
+
+        if process.returncode == 0:
+            logger.info(f"\nJob completed successfully for user{job['user']}")
+            return True
+        else:
+            logger.error(f"\nJob failed for user {job['user']}")
+            logger.error(f"\nJob Error: {stderr}, out msg: {stdout}")
+            return False
+    except Exception as e:
+        logger.error(f"\nError during job execution: {str(e)}")
+        return False
+    except KeyboardInterrupt as e:
+        logger.error(f"\n Error KeyboardInterrupt")
+        if process and process.poll() is None:
+            process.terminate()
+            process.wait
+        raise
+    finally:
+        if process and process.poll() is None:
+            process.terminate()
+            process.wait()
+        with running_lock:
+            running_processes.discard(process)
+        if parser is not None:
+            parser.close()
+        if log_sink is not None:
+            log_sink.close(process.returncode if process is not None else None)
+        remove_temp_paths(temp_paths)
+
+def process_output(line, parser, source='stdout', trace=None, log_sink=None):
+    # metric_channel로 들어온 구조화된 메트릭은 정규식 없이 바로 반영
+    if source == 'metrics':
+        apply_record(line, parser)
+    else:
+        # 학습 로그는 job별 Redis stream으로 (ring buffer에 넣기만 하고 바로 반환, 전송은 별도 스레드)
+        if log_sink is not None:
+            log_sink.write(line, source)
+        # 콘솔 실시간 출력 (JOB_LOG_CONSOLE=Y)
+        if JOB_LOG_CONFIG['CONSOLE']:
+            logger.info(line.strip())
+
+        # 에폭 결과 파싱 (redis 기록은 parser가 모아서 처리)
+        start = time.perf_counter()
+        parser.feed(line)
+        PARSE_LINE_SECONDS.observe(time.perf_counter() - start)
+
+    # 첫 출력 / 첫 에폭 시각 기록
+    if trace is not None:
+        trace.on_output(parser)
+
+def process_message(message, channel, properties=None):
+    gpu_id = None
+    holder = None
+    job = None
+    staged = None
+    result = None
+    trace = None
+    MESSAGES_IN_FLIGHT.inc()
+    try:
+        # content_type에 따라 디코딩 (큰 job은 Redis에 저장된 본문을 가져옴)
+        job = decode_job(message, properties, r)
+
+        # job_id가 없는 예전 형식의 메시지도 처리
+        job.setdefault('job_id', uuid.uuid4().hex)
+        logger.info(f"Processing {job_type_of(job)} job: {job}")
+        # job_type에 맞는 handler (모르는 종류면 ValueError로 실패 처리)
+        handler = handler_for(job)
+        JOBS_STARTED.inc()
+        trace = JobTrace(r, job['job_id'], job.get('submitted_at'))
+        trace.mark('dequeue')
+        if job.get('submitted_at'):
+            QUEUE_WAIT_SECONDS.observe(max(time.time() - job['submitted_at'], 0.0))
+        MetricStore(r, job['job_id']).register(job['user'], model_name=job.get('model_name', ''), script_path=job.get('script_path', ''))
+        # 같은 입력으로 이미 성공한 job이 있으면 GPU를 잡지 않고 그 결과를 그대로 사용 (--force면 다시 학습)
+        fingerprint = None
+        try:
+            fingerprint = handler.fingerprint(job, r)
+        except Exception as e:
+            logger.warning(f"Could not fingerprint job {job['job_id']}, skipping result cache: {e}")
+        if fingerprint and not job.get('force'):
+            cached = result_cache.lookup(fingerprint)
+            if cached:
+                apply_cached_result(r, job['job_id'], cached)
+                JOBS_CACHED.inc()
+                logger.info(f"Job {job['job_id']} is identical to finished job {cached['job_id']}, reusing its result "
+                            f"(hit {cached['hits']}, artifacts: {cached['artifacts']})")
+                return
+
+        # GPU를 잡기 전에 데이터셋을 복사해둠 (복사하는 동안 GPU가 놀지 않게). 같은 데이터셋을 쓰는 job은 복사본 하나를 공유
+        data_root = handler.data_root(job)
+        if data_root:
+            staged = stage_dataset(data_root)
+            trace.mark('dataset_staged')
+
+        # 한 GPU에 여러 job이 올라갈 수 있으므로 대여자는 job 단위로 구분
+        holder = make_holder(job['job_id'])
+        memory_mb, share = estimate_gpu_request(r, job, gpu_pool.devices())
+        with GPU_ACQUIRE_SECONDS.time():
+            gpu_id = get_available_gpu(r, holder, memory_mb, share, job['job_id'])
+        trace.mark('gpu_acquired')
+        with JOB_RUNTIME_SECONDS.time():
+            result = run_job(job, r, channel, gpu_id, staged.path if staged is not None else None, trace)
+        (JOBS_SUCCEEDED if result else JOBS_FAILED).inc()
+
+        # 학습 스크립트가 report_gpu_memory()로 알려준 peak 메모리는 같은 config job의 다음 요청 크기로 사용
+        peak_mb = get_gpu_memory(r, job['job_id'])
+        if peak_mb:
+            record_gpu_usage(r, job, peak_mb)
+
+        if result:
+            if fingerprint:
+                result_cache.store(fingerprint, job['job_id'], handler.artifacts(job, r))
+            final_metric = get_latest(r, job['job_id'], 'val_metric')
+            if final_metric:
+                logger.info(f"Job {job['job_id']} completed for user {job['user']}. Final accuracy: {final_metric}")
+            else:
+                logger.warning(f"Job {job['job_id']} completed for user {job['user']} but final accuracy not found")
+        else:
+            logger.error(f"Job failed for user {job['user']}")
+    except json.JSONDecodeError as e:
+        logger.error(f"Error decoding JSON: {e}")
+        JOBS_FAILED.inc()
+        return
+    except Exception as e:
+        logger.error(f"Error processing message: {str(e)}", exc_info=True)
+        if result is None:
+            JOBS_FAILED.inc()
+        return
+    except KeyboardInterrupt as e:
+        logger.error(f"KeyboardInterrupt. 종료.")
+        return
+    finally:
+        MESSAGES_IN_FLIGHT.dec()
+        if gpu_id is not None:
+            release_gpu(r, gpu_id, holder)
+            trace.mark('gpu_released')
+        if trace is not None:
+            trace.flush()
+        if staged is not None:
+            staged.release()
+        if job is not None:
+            try:
+                discard_payload(job, properties, r)
+            except redis.RedisError as e:
+                logger.warning(f"Could not delete payload of job {job['job_id']}: {e}")
+        logger.info("[*] Waiting for messages. To exit press CTRL+C")
+
+def process_batch(messages):
+    for message in messages:
+        process_message(message)
+
+def callback(ch, method, properties, body):
+    try:
+        logger.info(f"Received message: {body[:100]}...")
+        process_message(body, ch, properties)
+    except Exception as e:
+        logger.error(f"Error processing message: {e}")
+    finally:
+        ch.basic_ack(delivery_tag=method.delivery_tag)
+
+
+# augmentation_queue를 같은 연결의 별도 channel에서 처리 (prefetch / publisher confirm을 GPU 큐와 따로 설정)
+def consume_augmentation(connection, stage):
+    aug_channel = connection.channel()
+    aug_channel.queue_declare(queue=AUGMENTATION_CONFIG['QUEUE'], arguments=RABBITMQ_CONFIG['QUEUE_ARGS'])
+    # 다음 큐로 넘긴 job이 broker에 저장된 것을 확인한 뒤에 ack
+    aug_channel.confirm_delivery()
+    aug_channel.basic_qos(prefetch_count=AUGMENTATION_CONFIG['MAX_JOBS'])
+    aug_channel.basic_consume(queue=AUGMENTATION_CONFIG['QUEUE'], on_message_callback=stage.on_message)
+    logger.info(f"Augmentation stage: {AUGMENTATION_CONFIG['WORKERS']} CPU workers, up to {AUGMENTATION_CONFIG['MAX_JOBS']} jobs")
+    return aug_channel
+
+
+def signal_handler(signum, frame):
+    logger.info("Interrupt received, stopping consumer...")
+    with running_lock:
+        for process in running_processes:
+            if process.poll() is None:
+                process.terminate()
+    if 'channel' in globals() and channel.is_open:
+        try:
+            channel.queue_delete(queue=RABBITMQ_CONFIG['QUEUE'])
+            logger.info("Queue is successfully deleted")
+        except Exception as e:
+            logger.error(f"Error deleting queue: {e}")
+        channel.stop_consuming()
+    if 'connection' and connection.is_open:
+        try:
+            connection.close()
+        except Exception as e:
+            logger.error(f"Error closing connection: {e}")
+    sys.exit(0)
+
+def main():
+    # CONSUMER_ASYNC=Y이면 같은 job 처리 경로를 asyncio core(async_engine.py)로 실행
+    if CONSUMER_CONFIG['ASYNC']:
+        from async_engine import main as async_main
+        return async_main()
+    # 학습 프로세스를 fork할 warm runner는 preload(torch import 등)에 시간이 걸리므로 먼저 띄워둠
+    if CONSUMER_CONFIG['WARM_RUNNER']:
+        start_warm_runner(CONSUMER_CONFIG['WARM_RUNNER_PRELOAD'], CONSUMER_CONFIG['WARM_RUNNER_SPARES'])
+    # torch 대신 설정된 GPU 조회 backend 사용 (nvml이면 수십 ms, 캐시가 있으면 조회 없음)
+    print(f"Number of available GPUs: {len(gpu_inventory.devices())} ({gpu_inventory.name})")
+
+    global channel, connection
+
+    channel = None
+    connection = None
+    worker_pool = None
+    # GPU 목록 / 지표 서버는 처음 연결할 때 한 번만 (다시 연결할 때 GPU 대여 상태를 덮어쓰지 않도록)
+    initialized = False
+    aug_pool = None
+    aug_stage = None
+    if CONSUMER_CONFIG['AUGMENTATION']:
+        from concurrent.futures import ProcessPoolExecutor
+        from aug_consumer import AugmentationStage
+        # pika / heartbeat 스레드가 생기기 전에 프로세스 풀을 먼저 만듦 (fork 시점에 잠금 상태가 복사되지 않도록)
+        aug_pool = ProcessPoolExecutor(max_workers=AUGMENTATION_CONFIG['WORKERS'])
+        aug_stage = AugmentationStage(aug_pool)
+
+    signal.signal(signal.SIGINT, signal_handler)
+    signal.signal(signal.SIGTERM, signal_handler)
+
+    try:
+        while True:
+            try:
+                connection, channel = connect_to_rabbitmq()
+                if not initialized:
+                    initialize_gpu_list(r)
+                    start_consumer_metrics(CONSUMER_CONFIG['METRICS_PORT'], gpu_pool, r, CONSUMER_CONFIG['METRICS_PROBE_INTERVAL'])
+                    initialized = True
+                schedule_amqp_probe(connection, channel, RABBITMQ_CONFIG['QUEUE'], CONSUMER_CONFIG['METRICS_PROBE_INTERVAL'])
+                if aug_stage is not None:
+                    consume_augmentation(connection, aug_stage)
+
+                # WORKERS > 1 (또는 0 = GPU 개수)이면 여러 GPU에서 job을 동시에 실행
+                workers = CONSUMER_CONFIG['WORKERS'] or gpu_pool.size * CONSUMER_CONFIG['JOBS_PER_GPU'] or 1
+                if CONSUMER_CONFIG['SCHEDULER']:
+                    # 모든 사용자의 gpu_tasks_* 큐를 가중치 공정 분배로 처리
+                    if worker_pool is None:
+                        worker_pool = JobWorkerPool(process_message, workers)
+                    logger.info(f"Scheduler mode: up to {workers} concurrent jobs across all user queues")
+                    run_scheduler(connection, channel, worker_pool, RABBITMQ_CONFIG, CONSUMER_CONFIG)
+                elif workers > 1 or aug_stage is not None:
+                    # augmentation stage는 같은 connection을 쓰므로 workers=1이어도 학습은 worker 스레드에서 실행
+                    # (콜백 안에서 학습하면 그동안 augmentation 결과 전달 / ack / heartbeat가 멈춤)
+                    if worker_pool is None:
+                        worker_pool = JobWorkerPool(process_message, workers)
+                    channel.basic_qos(prefetch_count=workers)
+                    channel.basic_consume(queue=RABBITMQ_CONFIG['QUEUE'], on_message_callback=worker_pool.on_message)
+                    logger.info(f"Worker pool mode: up to {workers} concurrent jobs")
+                else:
+                    channel.basic_qos(prefetch_count=1)
+                    channel.basic_consume(queue=RABBITMQ_CONFIG['QUEUE'], on_message_callback=callback)
+                logger.info(' [*] Waiting for messages. To exit press CTRL+C')
+                channel.start_consuming()
+            except (AMQPConnectionError, AMQPChannelError) as e:
+                logger.error(f"RabbitMQ connection error: {e}")
+                logger.info("Attempting to reconnect in 5 seconds...")
+                time.sleep(5)
+            except Exception as e:
+                logger.error(f"Unexpected error: {e}")
+                logger.info("Attempting to reconnect in 5 seconds...")
+                time.sleep(5)
+    except KeyboardInterrupt:
+        logger.info("Consumer 종료")
+    finally:
+        if worker_pool is not None:
+            worker_pool.shutdown(wait=False)
+        if aug_pool is not None:
+            aug_pool.shutdown(wait=False, cancel_futures=True)
+        leave_cluster()
+        stop_warm_runner()
+        if channel and channel.is_open:
+            channel.stop_consuming()
+        if connection and not connection.is_closed:
+            connection.close()
+        logger.info("Connection Closed")
+        sys.exit(0)
+
+
+if __name__ == "__main__":
+    main()
\ No newline at end of file
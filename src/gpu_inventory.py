@@ -0,0 +1,238 @@
+import os
+import json
+import time
+import socket
+import logging
+import subprocess
+from collections import namedtuple
+
+logger = logging.getLogger(__name__)
+
+MB = 1024 * 1024
+
+# GPU 한 장 (id는 CUDA_VISIBLE_DEVICES에 넣는 번호, memory_mb는 전체 메모리)
+GpuDevice = namedtuple('GpuDevice', ['id', 'memory_mb'])
+
+# nvml / nvidia-smi의 번호는 PCI bus 순서. CUDA 기본 순서(FASTEST_FIRST)와 다를 수 있으므로
+# 종류가 다른 GPU가 섞인 서버에서는 CUDA_DEVICE_ORDER=PCI_BUS_ID로 맞춰야 메모리 정보가 맞음
+
+
+class GpuDiscoveryError(RuntimeError):
+    pass
+
+
+# consumer 프로세스의 CUDA_VISIBLE_DEVICES (없으면 None = 전부 보임). UUID 형식은 지원하지 않아 건너뜀
+def visible_device_ids():
+    value = os.environ.get('CUDA_VISIBLE_DEVICES')
+    if value is None:
+        return None
+    ids = []
+    for item in value.split(','):
+        item = item.strip()
+        if not item:
+            continue
+        if not item.lstrip('-').isdigit():
+            logger.warning(f"Ignoring CUDA_VISIBLE_DEVICES entry {item} (only numeric ids are supported)")
+            continue
+        # -1 이후 번호는 CUDA에서도 무시됨
+        if int(item) < 0:
+            break
+        ids.append(int(item))
+    return ids
+
+
+def _filter_visible(devices):
+    visible = visible_device_ids()
+    if visible is None:
+        return devices
+    by_id = {d.id: d for d in devices}
+    return [by_id[i] for i in visible if i in by_id]
+
+
+# NVML로 조회 (nvidia-ml-py 필요, CUDA context를 만들지 않아서 가장 빠름)
+class NvmlGpuInventory:
+    name = 'nvml'
+
+    def devices(self):
+        try:
+            import pynvml
+        except ImportError:
+            raise GpuDiscoveryError("pynvml is not installed (pip install nvidia-ml-py)")
+        try:
+            pynvml.nvmlInit()
+        except pynvml.NVMLError as e:
+            raise GpuDiscoveryError(f"NVML is not available: {e}")
+        try:
+            devices = []
+            for i in range(pynvml.nvmlDeviceGetCount()):
+                memory = pynvml.nvmlDeviceGetMemoryInfo(pynvml.nvmlDeviceGetHandleByIndex(i))
+                devices.append(GpuDevice(i, memory.total // MB))
+        finally:
+            pynvml.nvmlShutdown()
+        return _filter_visible(devices)
+
+
+# nvidia-smi 출력으로 조회 (드라이버만 있으면 동작)
+class NvidiaSmiGpuInventory:
+    name = 'nvidia-smi'
+
+    def __init__(self, timeout=10):
+        self.timeout = timeout
+
+    def devices(self):
+        try:
+            output = subprocess.run(['nvidia-smi', '--query-gpu=index,memory.total', '--format=csv,noheader,nounits'],
+                                    capture_output=True, text=True, timeout=self.timeout, check=True).stdout
+        except (OSError, subprocess.SubprocessError) as e:
+            raise GpuDiscoveryError(f"nvidia-smi failed: {e}")
+        devices = []
+        for line in output.splitlines():
+            if not line.strip():
+                continue
+            index, memory_mb = [part.strip() for part in line.split(',')[:2]]
+            devices.append(GpuDevice(int(index), int(float(memory_mb))))
+        return _filter_visible(devices)
+
+
+# CUDA_VISIBLE_DEVICES에 적힌 GPU를 그대로 사용 (메모리는 조회하지 않고 지정한 값)
+#   GPU_INVENTORY=cuda_visible:81920
+class CudaVisibleGpuInventory:
+    name = 'cuda_visible'
+
+    def __init__(self, memory_mb):
+        self.memory_mb = int(memory_mb)
+
+    def devices(self):
+        ids = visible_device_ids()
+        if ids is None:
+            raise GpuDiscoveryError("CUDA_VISIBLE_DEVICES is not set")
+        return [GpuDevice(i, self.memory_mb) for i in ids]
+
+
+# 실제 GPU 목록 (torch로 조회, import와 CUDA 초기화에 몇 초 걸림)
+class TorchGpuInventory:
+    name = 'torch'
+
+    def devices(self):
+        try:
+            import torch
+        except ImportError:
+            raise GpuDiscoveryError("torch is not installed")
+        return [GpuDevice(i, torch.cuda.get_device_properties(i).total_memory // MB)
+                for i in range(torch.cuda.device_count())]
+
+
+# 정해진 GPU 목록을 돌려주는 inventory (CPU 전용 머신에서 테스트하거나 GPU_INVENTORY=static:...으로 지정할 때)
+#   StaticGpuInventory([81920, 81920, 24576])
+class StaticGpuInventory:
+    name = 'static'
+
+    def __init__(self, memory_mb):
+        self._devices = [GpuDevice(i, int(m)) for i, m in enumerate(memory_mb)]
+
+    def devices(self):
+        return list(self._devices)
+
+
+# 테스트용 가짜 GPU (GPU_INVENTORY=fake:4 또는 fake:4x24576)
+def fake_inventory(count, memory_mb=81920):
+    return StaticGpuInventory([memory_mb] * int(count))
+
+
+# 앞에서부터 시도해서 처음 성공한 backend 결과 사용 (GPU_INVENTORY=auto)
+class AutoGpuInventory:
+    name = 'auto'
+
+    def __init__(self, backends):
+        self.backends = backends
+        self.used = None
+
+    def devices(self):
+        errors = []
+        for backend in self.backends:
+            try:
+                devices = backend.devices()
+            except GpuDiscoveryError as e:
+                errors.append(f"{backend.name}: {e}")
+                continue
+            self.used = backend.name
+            if errors:
+                logger.info(f"GPU discovery skipped {'; '.join(errors)}")
+            return devices
+        raise GpuDiscoveryError(f"No GPU discovery backend worked ({'; '.join(errors)})")
+
+
+# 조회 결과 캐시: 프로세스 안에서는 한 번만 조회하고, cache_path가 있으면 ttl초 동안 재시작해도 파일 값을 사용
+# (같은 서버, 같은 CUDA_VISIBLE_DEVICES일 때만 사용)
+class CachedGpuInventory:
+    def __init__(self, inventory, cache_path=None, ttl=0):
+        self.inventory = inventory
+        self.name = inventory.name
+        self.cache_path = cache_path
+        self.ttl = ttl
+        self._devices = None
+
+    def _cache_key(self, spec):
+        return f"{socket.gethostname()}|{spec}|{os.environ.get('CUDA_VISIBLE_DEVICES')}"
+
+    def _load(self, key):
+        try:
+            with open(self.cache_path) as f:
+                cached = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if cached.get('key') != key or time.time() - cached.get('at', 0) > self.ttl:
+            return None
+        return [GpuDevice(int(i), int(m)) for i, m in cached['devices']]
+
+    def _save(self, key, devices):
+        try:
+            os.makedirs(os.path.dirname(self.cache_path), exist_ok=True)
+            tmp_path = f"{self.cache_path}.{os.getpid()}"
+            with open(tmp_path, 'w') as f:
+                json.dump({'key': key, 'at': time.time(), 'devices': [list(d) for d in devices]}, f)
+            os.replace(tmp_path, self.cache_path)
+        except OSError as e:
+            logger.warning(f"Could not write GPU inventory cache {self.cache_path}: {e}")
+
+    def devices(self):
+        if self._devices is None:
+            use_file = bool(self.cache_path and self.ttl > 0)
+            key = self._cache_key(self.name) if use_file else None
+            devices = self._load(key) if use_file else None
+            if devices is None:
+                start = time.perf_counter()
+                devices = self.inventory.devices()
+                logger.info(f"Discovered {len(devices)} GPUs with {getattr(self.inventory, 'used', None) or self.name} "
+                            f"in {(time.perf_counter() - start) * 1000:.0f}ms")
+                if use_file:
+                    self._save(key, devices)
+            self._devices = devices
+        return list(self._devices)
+
+
+# GPU_INVENTORY 설정값으로 inventory 생성
+#   auto                   nvml -> nvidia-smi -> torch 순서로 처음 성공한 것
+#   nvml / nvidia-smi / torch
+#   cuda_visible:81920     CUDA_VISIBLE_DEVICES의 GPU, GPU당 메모리(MB) 지정
+#   static:81920,24576     GPU별 메모리(MB)를 직접 지정
+#   fake:4 / fake:4x24576  테스트용 가짜 GPU
+# cache_path / cache_ttl을 주면 실제 GPU 조회 결과를 파일에 캐시 (static / fake는 캐시하지 않음)
+def make_inventory(spec='auto', cache_path=None, cache_ttl=0):
+    spec = (spec or 'auto').strip()
+    if spec.startswith('static:'):
+        return StaticGpuInventory([m for m in spec[len('static:'):].split(',') if m.strip()])
+    if spec.startswith('fake:'):
+        count, _, memory_mb = spec[len('fake:'):].partition('x')
+        return fake_inventory(count, int(memory_mb) if memory_mb else 81920)
+    if spec.startswith('cuda_visible:'):
+        return CachedGpuInventory(CudaVisibleGpuInventory(spec[len('cuda_visible:'):]))
+
+    backends = {'nvml': NvmlGpuInventory, 'nvidia-smi': NvidiaSmiGpuInventory, 'torch': TorchGpuInventory}
+    if spec == 'auto':
+        inventory = AutoGpuInventory([NvmlGpuInventory(), NvidiaSmiGpuInventory(), TorchGpuInventory()])
+    elif spec in backends:
+        inventory = backends[spec]()
+    else:
+        raise ValueError(f"Unknown GPU inventory: {spec}")
+    return CachedGpuInventory(inventory, cache_path, cache_ttl)
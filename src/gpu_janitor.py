@@ -0,0 +1,55 @@
+import time
+import logging
+import argparse
+import redis
+from config import REDIS_CONFIG, CONSUMER_CONFIG
+from gpu_pool import GpuLeasePool, get_orphans
+from gpu_registry import GpuRegistry, HEARTBEAT_INTERVAL
+
+logger = logging.getLogger(__name__)
+
+# 독립 실행 janitor: registry에 있는 모든 노드(죽은 노드 포함)의 만료된 GPU 대여를 회수
+# consumer도 heartbeat 때 자기 노드를 정리하지만, 노드 전체가 꺼진 경우에는 이 스크립트가 정리함
+#   python src/gpu_janitor.py             계속 실행
+#   python src/gpu_janitor.py --once      한 번만 정리
+#   python src/gpu_janitor.py --orphans   최근 회수 기록 출력
+
+
+def sweep(r, registry, lease_ttl):
+    reclaimed = []
+    for node_id in registry.nodes(include_dead=True):
+        reclaimed.extend(GpuLeasePool(r, node_id=node_id, lease_ttl=lease_ttl).reclaim_expired())
+    return reclaimed
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Reclaim expired GPU leases across the cluster')
+    parser.add_argument('--interval', type=float, default=HEARTBEAT_INTERVAL, help='Seconds between sweeps')
+    parser.add_argument('--once', action='store_true', help='Run a single sweep and exit')
+    parser.add_argument('--prune', type=float, help='Also drop registry nodes without a heartbeat for this many seconds')
+    parser.add_argument('--orphans', type=int, nargs='?', const=20, help='Print the most recent reclaimed leases and exit')
+    args = parser.parse_args()
+
+    r = redis.Redis(host=REDIS_CONFIG['HOST'], port=REDIS_CONFIG['PORT'], db=REDIS_CONFIG['DB'], password=REDIS_CONFIG['PASSWORD'])
+    registry = GpuRegistry(r)
+
+    if args.orphans is not None:
+        for lease in get_orphans(r, args.orphans):
+            reclaimed_at = time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(lease['reclaimed_at']))
+            print(f"{reclaimed_at}  {lease['node']}:{lease['gpu']}  job {lease.get('job_id')}  {lease['holder']}  ({lease['reason']})")
+        return
+
+    while True:
+        reclaimed = sweep(r, registry, CONSUMER_CONFIG['GPU_LEASE_TTL'])
+        if reclaimed:
+            logger.info(f"Reclaimed {len(reclaimed)} GPU lease(s)")
+        if args.prune is not None:
+            for node_id in registry.prune(args.prune):
+                logger.info(f"Pruned dead node {node_id}")
+        if args.once:
+            break
+        time.sleep(args.interval)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,378 @@
+import os
+import json
+import socket
+import time
+import hashlib
+import logging
+import threading
+import redis
+from gpu_inventory import TorchGpuInventory
+from metric_store import MetricStore
+
+logger = logging.getLogger(__name__)
+
+# Redis 키 (노드마다 따로 관리 -> 여러 서버가 redis 하나를 같이 써도 서로 덮어쓰지 않음)
+DEVICES_KEY = 'gpu_pool:{node}:devices'  # gpu_id -> 전체 메모리(MB)
+LEASE_KEY = 'gpu_pool:{node}:leases'     # holder -> {"gpu", "memory_mb", "share", "job_id", "acquired_at"} JSON
+EXPIRY_KEY = 'gpu_pool:{node}:expiry'    # zset holder -> 만료 시각 (heartbeat로 연장)
+WAKEUP_KEY = 'gpu_pool:{node}:wakeup'    # 반납 시 대기자를 깨우는 신호 리스트
+ORPHANS_KEY = 'gpu_pool:orphans'         # 만료되어 회수된 대여 기록 (최신이 앞)
+PROFILE_KEY = 'gpu_profile:{key}' # 같은 config로 돌았던 job의 peak GPU 메모리 (peak_mb, runs)
+
+# 대기 중인 consumer가 신호를 놓쳤을 때를 대비한 최대 블로킹 시간 (초)
+WAIT_SLICE = 5
+# 과거 실행 기록으로 메모리를 추정할 때 더하는 여유분
+PROFILE_HEADROOM = 1.1
+# heartbeat로 연장하지 않으면 대여가 만료되는 시간 (초)
+LEASE_TTL = 60
+# 보관할 회수 기록 수
+ORPHANS_LIMIT = 1000
+
+# 대여자가 일치할 때만 반납 -> 중복 반납이나 남의 GPU 반납을 막음
+RELEASE_SCRIPT = """
+local lease = redis.call('HGET', KEYS[1], ARGV[1])
+if not lease then
+    return 0
+end
+if tostring(cjson.decode(lease)['gpu']) ~= ARGV[2] then
+    return -1
+end
+redis.call('HDEL', KEYS[1], ARGV[1])
+redis.call('ZREM', KEYS[3], ARGV[1])
+redis.call('LPUSH', KEYS[2], '1')
+redis.call('LTRIM', KEYS[2], 0, tonumber(ARGV[3]) - 1)
+return 1
+"""
+
+# 만료된 대여 회수. 그 사이에 heartbeat로 연장됐으면 건드리지 않음 (ARGV[4]가 1이면 만료 여부와 관계없이 회수)
+RECLAIM_SCRIPT = """
+local expires = redis.call('ZSCORE', KEYS[2], ARGV[1])
+if ARGV[4] ~= '1' and expires and tonumber(expires) > tonumber(ARGV[2]) then
+    return false
+end
+local lease = redis.call('HGET', KEYS[1], ARGV[1])
+redis.call('HDEL', KEYS[1], ARGV[1])
+redis.call('ZREM', KEYS[2], ARGV[1])
+if lease then
+    redis.call('LPUSH', KEYS[3], '1')
+    redis.call('LTRIM', KEYS[3], 0, tonumber(ARGV[3]) - 1)
+end
+return lease
+"""
+
+
+class GpuUnavailableError(Exception):
+    pass
+
+
+# 노드 이름 (NODE_ID 설정이 없으면 hostname). 같은 서버에서 GPU를 나눠 consumer를 여러 개 띄울 때만 따로 지정
+def default_node_id():
+    return socket.gethostname()
+
+
+# 현재 프로세스를 나타내는 대여자 이름 (한 GPU에 여러 job이 올라가므로 job마다 달라야 함)
+def make_holder(tag=None):
+    holder = f"{socket.gethostname()}:{os.getpid()}"
+    return f"{holder}:{tag}" if tag else holder
+
+
+# 이 서버에서 이미 종료된 프로세스의 대여인지 (make_holder 형식 host:pid[:tag])
+# 다른 서버의 대여이거나 형식이 다르면 알 수 없으므로 False -> TTL 만료를 기다림
+def holder_is_dead(holder):
+    parts = holder.split(':')
+    if len(parts) < 2 or parts[0] != socket.gethostname() or not parts[1].isdigit():
+        return False
+    pid = int(parts[1])
+    if pid == os.getpid():
+        return False
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return True
+    except OSError:
+        return False
+    return False
+
+
+# 요청을 GPU 하나에 올릴 때 실제로 차지하는 (메모리, 연산 비율)
+#   memory_mb, share 둘 다 없으면 GPU 전체를 단독으로 사용 (기존 동작)
+#   하나만 있으면 나머지는 GPU 메모리 대비 같은 비율로 계산
+def lease_size(capacity_mb, memory_mb=None, share=None):
+    if memory_mb is None and share is None:
+        return capacity_mb, 1.0
+    if memory_mb is None:
+        memory_mb = share * capacity_mb
+    if share is None:
+        share = memory_mb / capacity_mb if capacity_mb else 1.0
+    return int(memory_mb), float(share)
+
+
+# 요청이 들어갈 수 있는 GPU 중 가장 꽉 찬(남는 메모리가 가장 적은) GPU 선택 (best fit)
+#   devices: {gpu_id: 전체 메모리 MB}, leases: [{"gpu", "memory_mb", "share"}, ...]
+#   들어갈 곳이 없으면 None
+def pick_device(devices, leases, memory_mb=None, share=None):
+    used_memory = {gpu_id: 0 for gpu_id in devices}
+    used_share = {gpu_id: 0.0 for gpu_id in devices}
+    for lease in leases:
+        if lease['gpu'] in used_memory:
+            used_memory[lease['gpu']] += lease['memory_mb']
+            used_share[lease['gpu']] += lease['share']
+
+    best = None
+    for gpu_id, capacity in devices.items():
+        need_memory, need_share = lease_size(capacity, memory_mb, share)
+        free_memory = capacity - used_memory[gpu_id] - need_memory
+        free_share = 1.0 - used_share[gpu_id] - need_share
+        if free_memory < 0 or free_share < -1e-9:
+            continue
+        rank = (free_memory, free_share, gpu_id)
+        if best is None or rank < best[0]:
+            best = (rank, gpu_id, need_memory, need_share)
+    if best is None:
+        return None
+    return best[1], best[2], best[3]
+
+
+# 비어 있는 GPU에도 들어가지 않는 요청인지 (기다려도 소용없음)
+def fits_empty_device(devices, memory_mb=None, share=None):
+    return pick_device(devices, [], memory_mb, share) is not None
+
+
+# 노드 하나의 GPU별 사용량 {gpu_id: {"memory_mb", "used_mb", "used_share", "jobs"}}
+# 다른 노드의 사용량도 읽을 수 있도록 풀 객체 없이 사용 가능
+def node_usage(r, node_id):
+    pipe = r.pipeline(transaction=False)
+    pipe.hgetall(DEVICES_KEY.format(node=node_id))
+    pipe.hvals(LEASE_KEY.format(node=node_id))
+    devices, leases = pipe.execute()
+    usage = {int(gpu_id): {'memory_mb': int(capacity), 'used_mb': 0, 'used_share': 0.0, 'jobs': 0}
+             for gpu_id, capacity in devices.items()}
+    for lease in leases:
+        lease = json.loads(lease)
+        if lease['gpu'] in usage:
+            usage[lease['gpu']]['used_mb'] += lease['memory_mb']
+            usage[lease['gpu']]['used_share'] += lease['share']
+            usage[lease['gpu']]['jobs'] += 1
+    return usage
+
+
+# 노드 하나의 GPU를 여러 job이 메모리/연산 비율만큼 나눠 쓰는 대여 풀
+# 대여 기록은 holder별로 저장하고, 할당은 WATCH 트랜잭션으로 처리해서 여러 consumer가 동시에 요청해도 용량을 넘지 않음
+# 대여에는 TTL이 있어서 consumer가 renew_leases()로 계속 연장해야 하고, consumer가 죽으면(SIGKILL, OOM, 전원)
+# reclaim_expired()가 만료된 대여를 풀로 되돌리고 해당 job을 orphan으로 기록함
+class GpuLeasePool:
+    def __init__(self, r: redis.Redis, inventory=None, node_id=None, lease_ttl=LEASE_TTL):
+        self.r = r
+        self.inventory = inventory or TorchGpuInventory()
+        self.node_id = node_id or default_node_id()
+        self.lease_ttl = lease_ttl
+        self.devices_key = DEVICES_KEY.format(node=self.node_id)
+        self.lease_key = LEASE_KEY.format(node=self.node_id)
+        self.expiry_key = EXPIRY_KEY.format(node=self.node_id)
+        self.wakeup_key = WAKEUP_KEY.format(node=self.node_id)
+        self._release = r.register_script(RELEASE_SCRIPT)
+        self._reclaim = r.register_script(RECLAIM_SCRIPT)
+        self.size = 0
+        # 이 프로세스가 들고 있는 대여 (holder -> gpu_id), heartbeat 때 연장
+        self._held = {}
+        self._held_lock = threading.Lock()
+
+    # inventory의 GPU 목록으로 이 노드의 풀 초기화
+    # 대여 기록은 지우지 않음 -> 같은 노드의 다른 consumer job은 유지되고, 죽은 프로세스의 대여만 회수
+    def initialize(self, devices=None):
+        devices = list(self.inventory.devices() if devices is None else devices)
+        pipe = self.r.pipeline()
+        pipe.delete(self.devices_key, self.wakeup_key)
+        if devices:
+            pipe.hset(self.devices_key, mapping={str(d.id): d.memory_mb for d in devices})
+        pipe.execute()
+        self.size = len(devices)
+        logger.info(f"Initialized GPU lease pool on {self.node_id}: {[f'{d.id}({d.memory_mb}MB)' for d in devices]}")
+        self.reclaim_expired()
+        return devices
+
+    # 노드가 빠질 때 이 노드의 풀 삭제
+    def clear(self):
+        self.r.delete(self.devices_key, self.lease_key, self.expiry_key, self.wakeup_key)
+        self.size = 0
+
+    def devices(self):
+        return {int(k): int(v) for k, v in self.r.hgetall(self.devices_key).items()}
+
+    # 대기 없이 한 번만 시도. 들어갈 GPU가 없으면 None
+    def try_acquire(self, holder, memory_mb=None, share=None, job_id=None):
+        with self.r.pipeline() as pipe:
+            while True:
+                try:
+                    pipe.watch(self.devices_key, self.lease_key)
+                    devices = {int(k): int(v) for k, v in pipe.hgetall(self.devices_key).items()}
+                    leases = [json.loads(v) for v in pipe.hvals(self.lease_key)]
+                    picked = pick_device(devices, leases, memory_mb, share)
+                    if picked is None:
+                        pipe.unwatch()
+                        return None
+                    gpu_id, lease_memory, lease_share = picked
+                    now = time.time()
+                    pipe.multi()
+                    pipe.hset(self.lease_key, holder, json.dumps({'gpu': gpu_id, 'memory_mb': lease_memory, 'share': lease_share,
+                                                                  'job_id': job_id, 'acquired_at': now}))
+                    pipe.zadd(self.expiry_key, {holder: now + self.lease_ttl})
+                    pipe.execute()
+                    with self._held_lock:
+                        self._held[holder] = gpu_id
+                    return gpu_id
+                except redis.WatchError:
+                    # 다른 consumer가 먼저 할당/반납함 -> 최신 상태로 다시 계산
+                    continue
+
+    # GPU를 얻을 때까지 반납 신호를 기다림. timeout=None이면 무한 대기
+    def acquire(self, holder, memory_mb=None, share=None, timeout=None, job_id=None):
+        devices = self.devices()
+        if devices and not fits_empty_device(devices, memory_mb, share):
+            raise GpuUnavailableError(f"Request ({memory_mb}MB, share {share}) does not fit on any GPU: {devices}")
+
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            gpu_id = self.try_acquire(holder, memory_mb, share, job_id)
+            if gpu_id is not None:
+                size = 'whole GPU' if memory_mb is None and share is None else f"{memory_mb}MB, share {share}"
+                logger.info(f"GPU {gpu_id} leased to {holder} ({size})")
+                return gpu_id
+
+            wait = WAIT_SLICE
+            if deadline is not None:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    raise GpuUnavailableError(f"No GPU available after {timeout} seconds")
+                wait = min(wait, remaining)
+            logger.info("No available GPU, waiting for release signal...")
+            # BLPOP timeout은 초 단위 (소수 허용)
+            self.r.blpop(self.wakeup_key, timeout=max(wait, 0.01))
+
+    def release(self, gpu_id, holder):
+        with self._held_lock:
+            self._held.pop(holder, None)
+        result = self._release(keys=[self.lease_key, self.wakeup_key, self.expiry_key], args=[holder, str(gpu_id), max(self.size, 1)])
+        if result == 1:
+            logger.info(f"GPU {gpu_id} released by {holder}.")
+        elif result == -1:
+            logger.warning(f"{holder} does not hold GPU {gpu_id}, not releasing")
+        else:
+            logger.debug(f"{holder} has no GPU lease")
+        return result == 1
+
+    def leases(self):
+        return {k.decode(): json.loads(v) for k, v in self.r.hgetall(self.lease_key).items()}
+
+    def usage(self):
+        return node_usage(self.r, self.node_id)
+
+    # 아무 job도 올라가 있지 않은 GPU 수
+    def free_count(self):
+        return sum(1 for u in self.usage().values() if u['jobs'] == 0)
+
+    # 이 프로세스가 들고 있는 대여를 모두 반납 (consumer 종료 시)
+    def release_all(self):
+        with self._held_lock:
+            held = dict(self._held)
+        for holder, gpu_id in held.items():
+            self.release(gpu_id, holder)
+
+    # 이 프로세스가 들고 있는 대여의 만료 시각 연장 (heartbeat마다 호출)
+    # 이미 회수된 대여는 연장하지 않고 경고만 남김 (heartbeat가 TTL 넘게 밀린 경우)
+    def renew_leases(self):
+        with self._held_lock:
+            held = dict(self._held)
+        if not held:
+            return 0
+        expires_at = time.time() + self.lease_ttl
+        pipe = self.r.pipeline(transaction=False)
+        for holder in held:
+            pipe.zadd(self.expiry_key, {holder: expires_at}, xx=True, ch=True)
+        renewed = 0
+        for (holder, gpu_id), changed in zip(held.items(), pipe.execute()):
+            if changed:
+                renewed += 1
+                continue
+            logger.error(f"GPU {gpu_id} lease of {holder} was already reclaimed (missed heartbeats for over {self.lease_ttl}s)")
+            with self._held_lock:
+                self._held.pop(holder, None)
+        return renewed
+
+    # 만료된 대여(와 이 서버에서 이미 죽은 프로세스의 대여)를 풀로 되돌리고 orphan으로 기록
+    # 반환값: 회수한 대여 목록 [{"holder", "gpu", "job_id", ...}, ...]
+    def reclaim_expired(self):
+        now = time.time()
+        candidates = {holder.decode(): False for holder in self.r.zrangebyscore(self.expiry_key, '-inf', now)}
+        for holder in self.r.hkeys(self.lease_key):
+            holder = holder.decode()
+            if holder not in candidates and holder_is_dead(holder):
+                candidates[holder] = True
+
+        reclaimed = []
+        for holder, force in candidates.items():
+            lease = self._reclaim(keys=[self.lease_key, self.expiry_key, self.wakeup_key],
+                                  args=[holder, now, max(self.size, 1), '1' if force else '0'])
+            if lease is None:
+                continue
+            lease = json.loads(lease)
+            lease.update(holder=holder, node=self.node_id, reclaimed_at=now, reason='process exited' if force else 'lease expired')
+            reclaimed.append(lease)
+            self._report_orphan(lease)
+        return reclaimed
+
+    def _report_orphan(self, lease):
+        logger.warning(f"Reclaimed GPU {self.node_id}:{lease['gpu']} from {lease['holder']} "
+                       f"(job {lease.get('job_id')}, {lease['reason']})")
+        pipe = self.r.pipeline(transaction=False)
+        pipe.lpush(ORPHANS_KEY, json.dumps(lease))
+        pipe.ltrim(ORPHANS_KEY, 0, ORPHANS_LIMIT - 1)
+        pipe.execute()
+        if lease.get('job_id'):
+            store = MetricStore(self.r, lease['job_id'])
+            store.set_fields(status='orphaned', orphaned_at=lease['reclaimed_at'])
+            store.flush()
+
+
+# 최근 회수된 대여 기록
+def get_orphans(r, count=20):
+    return [json.loads(v) for v in r.lrange(ORPHANS_KEY, 0, count - 1)]
+
+
+# ---- job별 GPU 요청 추정 ----
+
+# 같은 config로 돌린 job을 묶는 키 (producer가 넣은 config_key, 없으면 경로/모델 이름으로 계산)
+def job_profile_key(job):
+    if job.get('config_key'):
+        return job['config_key']
+    raw = '|'.join(str(job.get(k, '')) for k in ('script_path', 'config_path', 'model_name'))
+    return hashlib.sha256(raw.encode()).hexdigest()
+
+
+# job이 요청할 (memory_mb, share). producer가 지정한 값이 우선이고,
+# 메모리가 없으면 같은 config로 돌았던 job의 peak 메모리에 여유분을 더해서 사용. 둘 다 없으면 (None, None) = GPU 전체
+# devices({gpu_id: 전체 메모리 MB})를 넘기면, 여유분을 더한 추정값이 가장 큰 GPU보다 클 때 GPU 전체를 요청
+# (peak가 GPU 메모리의 대부분인 config도 예전처럼 GPU 하나를 통째로 잡고 실행되도록)
+def estimate_gpu_request(r, job, devices=None):
+    memory_mb = job.get('gpu_memory_mb')
+    share = job.get('gpu_share')
+    if memory_mb is None:
+        peak = r.hget(PROFILE_KEY.format(key=job_profile_key(job)), 'peak_mb')
+        if peak:
+            memory_mb = int(float(peak) * PROFILE_HEADROOM)
+            if devices and memory_mb > max(devices.values()):
+                logger.info(f"Estimated GPU memory {memory_mb}MB is larger than any GPU, requesting a whole GPU")
+                memory_mb = None
+            else:
+                logger.info(f"Estimated GPU memory from past runs: {memory_mb}MB")
+    return (int(memory_mb) if memory_mb is not None else None,
+            float(share) if share is not None else None)
+
+
+# job이 끝난 뒤 실제 peak 메모리 기록 (다음 실행의 추정값으로 사용)
+def record_gpu_usage(r, job, peak_mb):
+    key = PROFILE_KEY.format(key=job_profile_key(job))
+    pipe = r.pipeline(transaction=False)
+    pipe.hset(key, 'peak_mb', int(float(peak_mb)))
+    pipe.hincrby(key, 'runs', 1)
+    pipe.execute()
@@ -0,0 +1,177 @@
+import os
+import json
+import time
+import socket
+import logging
+import argparse
+import threading
+import redis
+from gpu_pool import node_usage, pick_device
+
+logger = logging.getLogger(__name__)
+
+# 클러스터 전체 GPU 노드 목록
+#   gpu_registry:nodes          zset   node_id -> 마지막 heartbeat 시각
+#   gpu_registry:node:{node}    hash   host, pid, gpus(["node:gpu", ...] JSON), started_at
+# GPU 서버를 늘릴 때는 그 서버에서 consumer를 하나 더 띄우기만 하면 자동으로 등록됨
+NODES_KEY = 'gpu_registry:nodes'
+NODE_INFO_KEY = 'gpu_registry:node:{node}'
+
+# heartbeat 간격 / 이 시간 동안 heartbeat가 없으면 죽은 노드로 간주 (초)
+HEARTBEAT_INTERVAL = 10
+NODE_TIMEOUT = 30
+# free_capacity에서 세는 최대 job 수 (아주 작은 요청으로 무한히 세는 것 방지)
+MAX_FIT_COUNT = 10000
+
+
+def resource_id(node_id, gpu_id):
+    return f"{node_id}:{gpu_id}"
+
+
+class GpuRegistry:
+    def __init__(self, r: redis.Redis, node_timeout=NODE_TIMEOUT):
+        self.r = r
+        self.node_timeout = node_timeout
+
+    def register(self, node_id, devices):
+        pipe = self.r.pipeline()
+        pipe.hset(NODE_INFO_KEY.format(node=node_id), mapping={
+            'host': socket.gethostname(),
+            'pid': os.getpid(),
+            'gpus': json.dumps([resource_id(node_id, d.id) for d in devices]),
+            'started_at': time.time(),
+        })
+        pipe.zadd(NODES_KEY, {node_id: time.time()})
+        pipe.execute()
+        logger.info(f"Registered node {node_id} with {len(devices)} GPU(s)")
+
+    def heartbeat(self, node_id):
+        self.r.zadd(NODES_KEY, {node_id: time.time()})
+
+    def deregister(self, node_id):
+        pipe = self.r.pipeline()
+        pipe.zrem(NODES_KEY, node_id)
+        pipe.delete(NODE_INFO_KEY.format(node=node_id))
+        pipe.execute()
+        logger.info(f"Deregistered node {node_id}")
+
+    # 노드 목록 {node_id: {"host", "pid", "gpus", "started_at", "last_seen", "alive"}}
+    def nodes(self, include_dead=False):
+        now = time.time()
+        rows = self.r.zrange(NODES_KEY, 0, -1, withscores=True)
+        if not include_dead:
+            rows = [(node, seen) for node, seen in rows if now - seen <= self.node_timeout]
+        pipe = self.r.pipeline(transaction=False)
+        for node, _ in rows:
+            pipe.hgetall(NODE_INFO_KEY.format(node=node.decode()))
+        result = {}
+        for (node, seen), info in zip(rows, pipe.execute()):
+            info = {k.decode(): v.decode() for k, v in info.items()}
+            info['gpus'] = json.loads(info.get('gpus', '[]'))
+            info['last_seen'] = seen
+            info['alive'] = now - seen <= self.node_timeout
+            result[node.decode()] = info
+        return result
+
+    # 살아 있는 노드의 GPU별 사용량 {"node:gpu": {"memory_mb", "used_mb", "used_share", "jobs"}}
+    def cluster_usage(self):
+        usage = {}
+        for node_id in self.nodes():
+            for gpu_id, gpu_usage in node_usage(self.r, node_id).items():
+                usage[resource_id(node_id, gpu_id)] = gpu_usage
+        return usage
+
+    # 클러스터 전체 여유 용량. memory_mb/share를 주면 그 크기의 job이 지금 몇 개 더 들어가는지도 계산
+    # (둘 다 없으면 GPU 전체를 쓰는 job 기준 = 비어 있는 GPU 수)
+    def free_capacity(self, memory_mb=None, share=None):
+        nodes = self.nodes()
+        capacity = {'nodes': len(nodes), 'gpus': 0, 'free_gpus': 0, 'free_memory_mb': 0, 'fits': 0}
+        for node_id in nodes:
+            usage = node_usage(self.r, node_id)
+            capacity['gpus'] += len(usage)
+            capacity['free_gpus'] += sum(1 for u in usage.values() if u['jobs'] == 0)
+            capacity['free_memory_mb'] += sum(u['memory_mb'] - u['used_mb'] for u in usage.values())
+
+            devices = {gpu_id: u['memory_mb'] for gpu_id, u in usage.items()}
+            leases = [{'gpu': gpu_id, 'memory_mb': u['used_mb'], 'share': u['used_share']} for gpu_id, u in usage.items()]
+            while capacity['fits'] < MAX_FIT_COUNT:
+                picked = pick_device(devices, leases, memory_mb, share)
+                if picked is None:
+                    break
+                gpu_id, lease_memory, lease_share = picked
+                leases.append({'gpu': gpu_id, 'memory_mb': lease_memory, 'share': lease_share})
+                capacity['fits'] += 1
+        return capacity
+
+    # 오래된 heartbeat의 노드 정보 삭제 (해당 노드의 GPU 풀은 그대로 둠)
+    def prune(self, max_age=None):
+        cutoff = time.time() - (max_age if max_age is not None else self.node_timeout)
+        dead = [node.decode() for node in self.r.zrangebyscore(NODES_KEY, '-inf', cutoff)]
+        for node_id in dead:
+            self.deregister(node_id)
+        return dead
+
+
+# consumer가 살아 있는 동안 주기적으로 heartbeat를 보내는 스레드
+# lease_pool을 넘기면 실행 중인 job의 GPU 대여도 같이 연장하고, 이 노드의 만료된 대여를 회수함 (프로세스 내 janitor)
+class NodeHeartbeat:
+    def __init__(self, registry, node_id, lease_pool=None, interval=HEARTBEAT_INTERVAL):
+        self.registry = registry
+        self.node_id = node_id
+        self.lease_pool = lease_pool
+        self.interval = interval
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name=f"heartbeat-{self.node_id}", daemon=True)
+        self._thread.start()
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            try:
+                self.registry.heartbeat(self.node_id)
+                if self.lease_pool is not None:
+                    self.lease_pool.renew_leases()
+                    self.lease_pool.reclaim_expired()
+            except redis.RedisError as e:
+                logger.warning(f"Heartbeat for {self.node_id} failed: {e}")
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=self.interval)
+
+
+# 클러스터 상태 출력
+#   python src/gpu_registry.py                 노드/GPU별 사용량
+#   python src/gpu_registry.py --memory 12000  12GB job이 지금 몇 개 더 들어가는지
+def main():
+    from config import REDIS_CONFIG
+
+    parser = argparse.ArgumentParser(description='Show cluster GPU registry')
+    parser.add_argument('--memory', type=int, help='Job GPU memory in MB for the capacity query')
+    parser.add_argument('--share', type=float, help='Job GPU compute share (0-1) for the capacity query')
+    parser.add_argument('--all', action='store_true', help='Include nodes without a recent heartbeat')
+    args = parser.parse_args()
+
+    r = redis.Redis(host=REDIS_CONFIG['HOST'], port=REDIS_CONFIG['PORT'], db=REDIS_CONFIG['DB'], password=REDIS_CONFIG['PASSWORD'])
+    registry = GpuRegistry(r)
+    now = time.time()
+    for node_id, info in registry.nodes(include_dead=args.all).items():
+        state = 'alive' if info['alive'] else 'dead'
+        print(f"{node_id} ({info.get('host', '?')}, pid {info.get('pid', '?')}) {state}, last heartbeat {now - info['last_seen']:.0f}s ago")
+        for gpu_id, u in sorted(node_usage(r, node_id).items()):
+            print(f"  {resource_id(node_id, gpu_id)}  {u['used_mb']}/{u['memory_mb']}MB  share {u['used_share']:.2f}  jobs {u['jobs']}")
+
+    capacity = registry.free_capacity(args.memory, args.share)
+    size = 'whole-GPU' if args.memory is None and args.share is None else f"{args.memory}MB / share {args.share}"
+    print(f"{capacity['nodes']} node(s), {capacity['free_gpus']}/{capacity['gpus']} GPUs idle, "
+          f"{capacity['free_memory_mb']}MB free, room for {capacity['fits']} more {size} job(s)")
+
+
+if __name__ == '__main__':
+    main()
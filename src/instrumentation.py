@@ -0,0 +1,384 @@
+import abc
+import time
+import bisect
+import logging
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+logger = logging.getLogger(__name__)
+
+# consumer 운영 지표 (Prometheus text exposition 형식, GET /metrics)
+# 값은 스레드마다 따로 가진 칸(shard)에만 더하고, 읽을 때(scrape) 모든 칸을 합침
+#   -> 기록하는 쪽(hot path)에는 lock이 없음. 스레드가 처음 기록할 때 한 번만 칸 목록에 등록함
+# 운영 지표라 학습 메트릭(metric_store / metric_parser)과는 별개
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+# 초 단위 기본 bucket (queue 대기, GPU 대여, job 실행 시간)
+DURATION_BUCKETS = (0.01, 0.05, 0.1, 0.5, 1, 5, 10, 30, 60, 300, 900, 1800, 3600, 4 * 3600, 12 * 3600, 24 * 3600)
+# 짧은 작업 (Redis / AMQP 왕복, 줄 하나 파싱)
+LATENCY_BUCKETS = (0.00001, 0.00005, 0.0001, 0.0005, 0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1, 5)
+
+
+def _format_labels(names, values, extra=None):
+    pairs = list(zip(names, values)) + list(extra or [])
+    if not pairs:
+        return ''
+    escaped = (str(v).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n') for _, v in pairs)
+    return '{' + ','.join(f'{k}="{v}"' for (k, _), v in zip(pairs, escaped)) + '}'
+
+
+def _format_value(value):
+    if value == float('inf'):
+        return '+Inf'
+    if value != value:
+        return 'NaN'
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+# 스레드별 칸 목록. 칸 생성은 스레드마다 한 번뿐이라 그때만 lock을 씀
+class _Shards:
+    def __init__(self, make_cell):
+        self._make_cell = make_cell
+        self._local = threading.local()
+        self._cells = []
+        self._lock = threading.Lock()
+
+    def cell(self):
+        try:
+            return self._local.cell
+        except AttributeError:
+            cell = self._local.cell = self._make_cell()
+            with self._lock:
+                self._cells.append(cell)
+            return cell
+
+    def cells(self):
+        with self._lock:
+            return list(self._cells)
+
+
+class _Metric(abc.ABC):
+    kind = None
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._children = {}
+        self._children_lock = threading.Lock()
+        if not self.labelnames:
+            self._default = self._new_child()
+
+    # label 값별 자식 (자주 쓰는 값은 미리 꺼내서 변수에 두면 매번 dict 조회도 없음)
+    def labels(self, *values):
+        values = tuple(str(v) for v in values)
+        child = self._children.get(values)
+        if child is None:
+            with self._children_lock:
+                child = self._children.get(values)
+                if child is None:
+                    child = self._children[values] = self._new_child()
+        return child
+
+    # 종류별 값 객체 (Counter / Gauge / Histogram이 구현)
+    @abc.abstractmethod
+    def _new_child(self):
+        pass
+
+    def _samples(self):
+        if not self.labelnames:
+            yield (), self._default
+        with self._children_lock:
+            children = sorted(self._children.items())
+        yield from children
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+        for values, child in self._samples():
+            lines.extend(child.render(self.name, self.labelnames, values))
+        return lines
+
+
+class _CounterChild:
+    def __init__(self):
+        self._shards = _Shards(lambda: [0])
+
+    def inc(self, amount=1):
+        self._shards.cell()[0] += amount
+
+    def dec(self, amount=1):
+        self._shards.cell()[0] -= amount
+
+    @property
+    def value(self):
+        return sum(cell[0] for cell in self._shards.cells())
+
+    def render(self, name, labelnames, values):
+        return [f"{name}{_format_labels(labelnames, values)} {_format_value(self.value)}"]
+
+
+class Counter(_Metric):
+    kind = 'counter'
+
+    def _new_child(self):
+        return _CounterChild()
+
+    def inc(self, amount=1):
+        self._default.inc(amount)
+
+    @property
+    def value(self):
+        return self._default.value
+
+
+# 올리고 내리는 값 (inc/dec도 스레드별 칸에 기록하므로 다른 스레드에서 inc/dec 해도 합은 정확함)
+# fn을 주면 scrape할 때 fn()을 호출해서 값을 구함 (숫자 또는 {label 값 tuple: 숫자})
+class Gauge(_Metric):
+    kind = 'gauge'
+
+    def __init__(self, name, documentation, labelnames=(), fn=None):
+        super().__init__(name, documentation, labelnames)
+        self.fn = fn
+
+    def _new_child(self):
+        return _CounterChild()
+
+    def inc(self, amount=1):
+        self._default.inc(amount)
+
+    def dec(self, amount=1):
+        self._default.dec(amount)
+
+    @property
+    def value(self):
+        return self._default.value
+
+    def render(self):
+        if self.fn is None:
+            return super().render()
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+        try:
+            result = self.fn()
+        except Exception as e:
+            logger.debug(f"Gauge {self.name} failed: {e}")
+            return lines
+        items = result.items() if isinstance(result, dict) else [((), result)]
+        for values, value in items:
+            values = values if isinstance(values, tuple) else (values,)
+            lines.append(f"{self.name}{_format_labels(self.labelnames, values)} {_format_value(value)}")
+        return lines
+
+
+class _HistogramChild:
+    def __init__(self, buckets):
+        self.buckets = buckets
+        # 칸: bucket별 개수 + [+Inf 개수, 합계]
+        self._shards = _Shards(lambda: [0] * (len(buckets) + 1) + [0.0])
+
+    def observe(self, value):
+        cell = self._shards.cell()
+        cell[bisect.bisect_left(self.buckets, value)] += 1
+        cell[-1] += value
+
+    # with histogram.time(): ...
+    def time(self):
+        return _Timer(self)
+
+    def snapshot(self):
+        counts = [0] * (len(self.buckets) + 1)
+        total = 0.0
+        for cell in self._shards.cells():
+            for i in range(len(counts)):
+                counts[i] += cell[i]
+            total += cell[-1]
+        return counts, total
+
+    def render(self, name, labelnames, values):
+        counts, total = self.snapshot()
+        lines = []
+        cumulative = 0
+        for bound, count in zip(list(self.buckets) + [float('inf')], counts):
+            cumulative += count
+            lines.append(f"{name}_bucket{_format_labels(labelnames, values, [('le', _format_value(bound))])} {cumulative}")
+        lines.append(f"{name}_sum{_format_labels(labelnames, values)} {_format_value(total)}")
+        lines.append(f"{name}_count{_format_labels(labelnames, values)} {cumulative}")
+        return lines
+
+
+class _Timer:
+    def __init__(self, child):
+        self.child = child
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.child.observe(time.perf_counter() - self.start)
+
+
+class Histogram(_Metric):
+    kind = 'histogram'
+
+    def __init__(self, name, documentation, labelnames=(), buckets=DURATION_BUCKETS):
+        self.buckets = tuple(sorted(buckets))
+        super().__init__(name, documentation, labelnames)
+
+    def _new_child(self):
+        return _HistogramChild(self.buckets)
+
+    def observe(self, value):
+        self._default.observe(value)
+
+    def time(self):
+        return self._default.time()
+
+
+class Registry:
+    def __init__(self):
+        self.metrics = {}
+        self._lock = threading.Lock()
+
+    def register(self, metric):
+        with self._lock:
+            if metric.name in self.metrics:
+                raise ValueError(f"Metric {metric.name} is already registered")
+            self.metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name, documentation, labelnames=()):
+        return self.register(Counter(name, documentation, labelnames))
+
+    def gauge(self, name, documentation, labelnames=(), fn=None):
+        return self.register(Gauge(name, documentation, labelnames, fn))
+
+    def histogram(self, name, documentation, labelnames=(), buckets=DURATION_BUCKETS):
+        return self.register(Histogram(name, documentation, labelnames, buckets))
+
+    def render(self):
+        with self._lock:
+            metrics = list(self.metrics.values())
+        lines = []
+        for metric in metrics:
+            lines.extend(metric.render())
+        return '\n'.join(lines) + '\n'
+
+
+REGISTRY = Registry()
+
+
+# GET /metrics -> REGISTRY.render()
+class _MetricsHandler(BaseHTTPRequestHandler):
+    registry = REGISTRY
+
+    def do_GET(self):
+        if self.path.split('?')[0] not in ('/metrics', '/'):
+            self.send_error(404)
+            return
+        body = self.registry.render().encode()
+        self.send_response(200)
+        self.send_header('Content-Type', CONTENT_TYPE)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        logger.debug(format % args)
+
+
+# 백그라운드 스레드에서 HTTP 서버 실행. 포트를 못 쓰면 경고만 남기고 None (consumer는 계속 동작)
+def serve_metrics(port, host='0.0.0.0', registry=REGISTRY):
+    if not port:
+        return None
+    handler = type('MetricsHandler', (_MetricsHandler,), {'registry': registry})
+    try:
+        server = ThreadingHTTPServer((host, port), handler)
+    except OSError as e:
+        logger.warning(f"Could not start metrics endpoint on port {port}: {e}")
+        return None
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, name='metrics-http', daemon=True).start()
+    logger.info(f"Metrics endpoint on http://{host}:{port}/metrics")
+    return server
+
+
+# 일정 간격으로 probe()의 왕복 시간을 histogram에 기록하는 스레드 (예: redis PING)
+class RoundTripProbe(threading.Thread):
+    def __init__(self, histogram, probe, interval):
+        super().__init__(name='metrics-probe', daemon=True)
+        self.histogram = histogram
+        self.probe = probe
+        self.interval = interval
+        self._stop_event = threading.Event()
+
+    def run(self):
+        while not self._stop_event.wait(self.interval):
+            start = time.perf_counter()
+            try:
+                self.probe()
+            except Exception as e:
+                logger.debug(f"Round-trip probe failed: {e}")
+                continue
+            self.histogram.observe(time.perf_counter() - start)
+
+    def stop(self):
+        self._stop_event.set()
+
+
+# consumer engine(engine.py)의 지표
+JOBS = REGISTRY.counter('consumer_jobs_total', 'Jobs by outcome (started, succeeded, failed, cached)', ('status',))
+JOBS_STARTED, JOBS_SUCCEEDED, JOBS_FAILED, JOBS_CACHED = (JOBS.labels(s) for s in ('started', 'succeeded', 'failed', 'cached'))
+QUEUE_WAIT_SECONDS = REGISTRY.histogram('consumer_queue_wait_seconds', 'Time from submit to the consumer picking the job up')
+GPU_ACQUIRE_SECONDS = REGISTRY.histogram('consumer_gpu_acquire_seconds', 'Time spent waiting for a GPU lease')
+JOB_RUNTIME_SECONDS = REGISTRY.histogram('consumer_job_runtime_seconds', 'Training process runtime')
+PARSE_LINE_SECONDS = REGISTRY.histogram('consumer_parse_line_seconds', 'Metric parser time per output line', buckets=LATENCY_BUCKETS)
+JOB_LOG_LINES = REGISTRY.counter('consumer_job_log_lines_total', 'Training output lines sent to the job log stream (shipped) or dropped when the buffer was full', ('outcome',))
+JOB_LOG_SHIPPED, JOB_LOG_DROPPED = (JOB_LOG_LINES.labels(s) for s in ('shipped', 'dropped'))
+MESSAGES_IN_FLIGHT = REGISTRY.gauge('consumer_messages_in_flight', 'Messages received but not yet acked')
+# fn은 consumer가 GPU 풀 / 큐를 만든 뒤에 지정
+GPUS = REGISTRY.gauge('consumer_gpus', 'GPUs on this node by state (leased, free)', ('state',))
+QUEUE_DEPTH = REGISTRY.gauge('consumer_queue_depth', 'Ready messages in the consumed queue (sampled by the AMQP probe)')
+REDIS_ROUNDTRIP_SECONDS = REGISTRY.histogram('consumer_redis_roundtrip_seconds', 'Redis PING round trip', buckets=LATENCY_BUCKETS)
+AMQP_ROUNDTRIP_SECONDS = REGISTRY.histogram('consumer_amqp_roundtrip_seconds', 'AMQP passive queue.declare round trip', buckets=LATENCY_BUCKETS)
+
+
+_consumer_metrics_started = False
+
+
+# consumer 시작 시 호출: GPU 상태 gauge, Redis PING probe, HTTP endpoint (재연결 때 다시 불려도 한 번만 시작)
+def start_consumer_metrics(port, gpu_pool, r, probe_interval):
+    global _consumer_metrics_started
+    if _consumer_metrics_started:
+        return None
+    _consumer_metrics_started = True
+    def gpu_states():
+        usage = gpu_pool.usage()
+        leased = sum(1 for u in usage.values() if u['jobs'] > 0)
+        return {('leased',): leased, ('free',): len(usage) - leased}
+    GPUS.fn = gpu_states
+    if probe_interval > 0:
+        RoundTripProbe(REDIS_ROUNDTRIP_SECONDS, r.ping, probe_interval).start()
+    return serve_metrics(port)
+
+
+# AMQP 왕복은 connection 스레드에서만 잴 수 있으므로 call_later로 주기적으로 passive queue.declare
+# (응답의 message_count는 큐 깊이 gauge로 사용). 연결이 바뀌면 새 connection에 다시 등록
+def schedule_amqp_probe(connection, channel, queue, interval):
+    if interval <= 0:
+        return
+    depth = {'value': None}
+    QUEUE_DEPTH.fn = lambda: depth['value'] if depth['value'] is not None else float('nan')
+
+    def probe():
+        if not channel.is_open:
+            return
+        start = time.perf_counter()
+        try:
+            frame = channel.queue_declare(queue=queue, passive=True)
+        except Exception as e:
+            logger.debug(f"AMQP probe failed: {e}")
+            return
+        AMQP_ROUNDTRIP_SECONDS.observe(time.perf_counter() - start)
+        depth['value'] = frame.method.message_count
+        connection.call_later(interval, probe)
+    connection.call_later(interval, probe)
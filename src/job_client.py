@@ -0,0 +1,197 @@
+import time
+import queue
+import asyncio
+import logging
+import threading
+from contextlib import contextmanager
+import pika
+import pika.exceptions
+from config import RABBITMQ_CONFIG, AUGMENTATION_CONFIG
+from job_schema import build_job, build_det_job, encode_message, submit_queue
+
+logger = logging.getLogger(__name__)
+
+# 연결이 끊겼을 때 재시도 횟수 / 간격 (초)
+MAX_RETRIES = 5
+RETRY_DELAY = 1
+
+# 재연결로 복구할 수 있는 에러
+RETRYABLE_ERRORS = (
+    pika.exceptions.AMQPConnectionError,
+    pika.exceptions.AMQPChannelError,
+    pika.exceptions.StreamLostError,
+    ConnectionError,
+)
+
+
+# Optuna 드라이버나 노트북에서 반복적으로 job을 제출할 때 쓰는 클라이언트
+# 연결/채널을 pool_size개까지 유지하면서 스레드마다 하나씩 빌려 쓰고, 끊어지면 자동으로 다시 연결함
+#
+# job은 producer.py와 같이 submit_queue(job)로 보냄 (augmentation이 있으면 augmentation_queue, 아니면 제출한 사용자의 gpu_tasks_ 큐)
+# queue_name을 지정하면 augmentation이 없는 job은 그 큐로 보냄
+#
+#   with JobClient() as client:
+#       job_id = client.submit(script_path=..., config_path=..., data_path=...)
+#       job_ids = client.submit_many([job1, job2, ...])
+class JobClient:
+    def __init__(self, pool_size=4, queue_name=None, confirm=True, parameters=None):
+        self.pool_size = max(int(pool_size), 1)
+        self.queue_name = queue_name
+        self.confirm = confirm
+        self.parameters = parameters or pika.ConnectionParameters(
+            host=RABBITMQ_CONFIG['HOST'],
+            port=RABBITMQ_CONFIG['PORT'],
+            credentials=pika.PlainCredentials(RABBITMQ_CONFIG['USER'], RABBITMQ_CONFIG['PASSWORD'])
+        )
+        self._idle = queue.LifoQueue()
+        self._created = 0
+        self._lock = threading.Lock()
+        self._closed = False
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def _connect(self):
+        connection = pika.BlockingConnection(self.parameters)
+        channel = connection.channel()
+        if self.confirm:
+            channel.confirm_delivery()
+        # (connection, channel, 이 연결에서 이미 선언한 큐 이름)
+        return connection, channel, set()
+
+    # 풀에서 연결 하나를 빌림. 없으면 pool_size까지 새로 만들고, 다 쓰는 중이면 반납될 때까지 기다림
+    @contextmanager
+    def _checkout(self):
+        if self._closed:
+            raise RuntimeError("JobClient is closed")
+        item = None
+        try:
+            item = self._idle.get_nowait()
+        except queue.Empty:
+            with self._lock:
+                can_create = self._created < self.pool_size
+                if can_create:
+                    self._created += 1
+            if not can_create:
+                item = self._idle.get()
+
+        try:
+            if item is None or item[0].is_closed or item[1].is_closed:
+                item = self._reconnect(item)
+            else:
+                # 쉬는 동안 밀린 heartbeat 처리
+                item[0].process_data_events(time_limit=0)
+        except Exception:
+            with self._lock:
+                self._created -= 1
+            raise
+
+        ok = False
+        try:
+            yield item
+            ok = True
+        finally:
+            if ok and not self._closed:
+                self._idle.put(item)
+            else:
+                self._discard(item)
+
+    def _reconnect(self, item):
+        self._close_quietly(item)
+        retries = 0
+        while True:
+            try:
+                return self._connect()
+            except pika.exceptions.AMQPConnectionError as e:
+                retries += 1
+                if retries >= MAX_RETRIES:
+                    logger.error("Max retries reached. Unable to connect to RabbitMQ.")
+                    raise
+                logger.warning(f"Failed to connect to RabbitMQ (attempt {retries}/{MAX_RETRIES}): {e}")
+                time.sleep(RETRY_DELAY)
+
+    def _discard(self, item):
+        self._close_quietly(item)
+        with self._lock:
+            self._created -= 1
+
+    @staticmethod
+    def _close_quietly(item):
+        if item is None:
+            return
+        try:
+            if item[0].is_open:
+                item[0].close()
+        except Exception:
+            pass
+
+    # augmentation이 남은 job은 항상 augmentation_queue로 (queue_name을 지정해도 augmentation을 건너뛰지 않도록)
+    def queue_for(self, job):
+        queue_name = submit_queue(job)
+        if self.queue_name and queue_name != AUGMENTATION_CONFIG['QUEUE']:
+            return self.queue_name
+        return queue_name
+
+    def _publish(self, item, job):
+        _, channel, declared = item
+        queue_name = self.queue_for(job)
+        if queue_name not in declared:
+            channel.queue_declare(queue=queue_name, arguments=RABBITMQ_CONFIG['QUEUE_ARGS'])
+            declared.add(queue_name)
+        body, properties = encode_message(job)
+        channel.basic_publish(
+            exchange='',
+            routing_key=queue_name,
+            body=body,
+            properties=properties
+        )
+        return queue_name
+
+    # job dict(build_job/build_det_job 결과) 또는 build_job 인자로 제출하고 job_id 반환
+    def submit(self, job=None, **job_args):
+        job = job if job is not None else build_job(**job_args)
+        return self.submit_many([job])[0]
+
+    def submit_det(self, **job_args):
+        return self.submit(build_det_job(**job_args))
+
+    # 여러 job을 한 연결로 연속 제출. 중간에 끊기면 다시 연결해서 남은 job부터 이어서 보냄
+    def submit_many(self, jobs):
+        jobs = list(jobs)
+        sent = 0
+        attempts = 0
+        queues = set()
+        while sent < len(jobs):
+            try:
+                with self._checkout() as item:
+                    while sent < len(jobs):
+                        queues.add(self._publish(item, jobs[sent]))
+                        sent += 1
+            except RETRYABLE_ERRORS as e:
+                attempts += 1
+                if attempts >= MAX_RETRIES:
+                    raise
+                logger.warning(f"Publish failed, reconnecting (attempt {attempts}/{MAX_RETRIES}): {e}")
+        logger.info(f"Submitted {len(jobs)} job(s) to {', '.join(sorted(queues))}")
+        return [job['job_id'] for job in jobs]
+
+    # asyncio 버전 (블로킹 제출을 executor 스레드에서 실행)
+    async def submit_async(self, job=None, **job_args):
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(None, lambda: self.submit(job, **job_args))
+
+    async def submit_many_async(self, jobs):
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(None, self.submit_many, list(jobs))
+
+    def close(self):
+        self._closed = True
+        while True:
+            try:
+                item = self._idle.get_nowait()
+            except queue.Empty:
+                break
+            self._discard(item)
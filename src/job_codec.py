@@ -0,0 +1,132 @@
+import json
+import zlib
+import logging
+from config import MESSAGE_CONFIG
+
+try:
+    import msgpack
+except ImportError:  # msgpack이 없으면 JSON만 사용
+    msgpack = None
+
+logger = logging.getLogger(__name__)
+
+# job 메시지 인코딩
+# 형식은 AMQP content_type / content_encoding 속성에 기록하고, consumer는 추측하지 않고 그 값대로 디코딩함
+#   content_type      application/json | application/msgpack | application/x-job-ref
+#   content_encoding  zlib (COMPRESS_MIN_BYTES 이상일 때만 압축) | 없음
+# 인코딩한 크기가 MAX_INLINE_BYTES를 넘으면 본문은 Redis(job_payload:{job_id})에 두고 메시지에는 키만 보냄
+#   (이때 원래 content_type / content_encoding은 headers의 x-payload-type / x-payload-encoding에 기록)
+# content_type이 없는 예전 메시지는 zlib -> plain JSON 순서로 시도
+CONTENT_TYPE_JSON = 'application/json'
+CONTENT_TYPE_MSGPACK = 'application/msgpack'
+CONTENT_TYPE_REF = 'application/x-job-ref'
+ENCODING_ZLIB = 'zlib'
+PAYLOAD_KEY = 'job_payload:{job_id}'
+
+CODECS = {'json': CONTENT_TYPE_JSON, 'msgpack': CONTENT_TYPE_MSGPACK}
+
+_redis = None
+
+
+# by-reference 본문을 저장/조회할 Redis (r을 안 넘기면 처음 필요할 때 REDIS_CONFIG로 연결)
+def _payload_redis(r):
+    global _redis
+    if r is not None:
+        return r
+    if _redis is None:
+        from redis_client import connect_redis
+        _redis = connect_redis()
+    return _redis
+
+
+def serialize(job, content_type):
+    if content_type == CONTENT_TYPE_MSGPACK:
+        if msgpack is None:
+            raise ValueError("msgpack is not installed (pip install msgpack)")
+        return msgpack.packb(job, use_bin_type=True)
+    if content_type == CONTENT_TYPE_JSON:
+        return json.dumps(job, separators=(',', ':')).encode()
+    raise ValueError(f"Unknown job content type: {content_type}")
+
+
+def deserialize(data, content_type):
+    if content_type == CONTENT_TYPE_MSGPACK:
+        if msgpack is None:
+            raise ValueError("Received a msgpack job but msgpack is not installed (pip install msgpack)")
+        return msgpack.unpackb(data, raw=False)
+    if content_type == CONTENT_TYPE_JSON:
+        return json.loads(data)
+    raise ValueError(f"Unknown job content type: {content_type}")
+
+
+# 설정된 codec의 content_type (msgpack을 골랐는데 설치돼 있지 않으면 JSON)
+def default_content_type(codec=None):
+    codec = codec or MESSAGE_CONFIG['CODEC']
+    if codec not in CODECS:
+        raise ValueError(f"Unknown MESSAGE_CODEC: {codec} (choose from {sorted(CODECS)})")
+    if codec == 'msgpack' and msgpack is None:
+        logger.warning("MESSAGE_CODEC=msgpack but msgpack is not installed, falling back to JSON")
+        return CONTENT_TYPE_JSON
+    return CODECS[codec]
+
+
+# job -> (body, content_type, content_encoding, headers)
+def encode(job, r=None, codec=None, compress_min_bytes=None, max_inline_bytes=None):
+    compress_min_bytes = MESSAGE_CONFIG['COMPRESS_MIN_BYTES'] if compress_min_bytes is None else compress_min_bytes
+    max_inline_bytes = MESSAGE_CONFIG['MAX_INLINE_BYTES'] if max_inline_bytes is None else max_inline_bytes
+
+    content_type = default_content_type(codec)
+    body = serialize(job, content_type)
+    content_encoding = None
+    # 작은 메시지는 압축해도 거의 줄지 않고 CPU만 쓰므로 그대로 보냄
+    if len(body) >= compress_min_bytes:
+        compressed = zlib.compress(body)
+        if len(compressed) < len(body):
+            body, content_encoding = compressed, ENCODING_ZLIB
+
+    if max_inline_bytes and len(body) > max_inline_bytes and job.get('job_id'):
+        key = PAYLOAD_KEY.format(job_id=job['job_id'])
+        _payload_redis(r).set(key, body, ex=MESSAGE_CONFIG['PAYLOAD_TTL'])
+        logger.debug(f"Job {job['job_id']} payload is {len(body)} bytes, stored in Redis as {key}")
+        headers = {'x-payload-type': content_type}
+        if content_encoding:
+            headers['x-payload-encoding'] = content_encoding
+        return key.encode(), CONTENT_TYPE_REF, None, headers
+    return body, content_type, content_encoding, None
+
+
+def _decompress(data, content_encoding):
+    if content_encoding == ENCODING_ZLIB:
+        return zlib.decompress(data)
+    if content_encoding:
+        raise ValueError(f"Unknown job content encoding: {content_encoding}")
+    return data
+
+
+# 메시지 본문 + AMQP 속성 -> job. properties가 없으면(예전 메시지) 형식을 추측
+def decode(body, properties=None, r=None):
+    content_type = getattr(properties, 'content_type', None)
+    if content_type is None:
+        try:
+            body = zlib.decompress(body)
+        except zlib.error:
+            pass
+        return json.loads(body.decode())
+
+    content_encoding = getattr(properties, 'content_encoding', None)
+    if content_type == CONTENT_TYPE_REF:
+        key = body.decode()
+        data = _payload_redis(r).get(key)
+        if data is None:
+            raise ValueError(f"Job payload {key} is missing from Redis (expired after {MESSAGE_CONFIG['PAYLOAD_TTL']}s?)")
+        headers = properties.headers or {}
+        content_type = headers.get('x-payload-type', CONTENT_TYPE_JSON)
+        content_encoding = headers.get('x-payload-encoding')
+        body = data
+    return deserialize(_decompress(body, content_encoding), content_type)
+
+
+# 처리가 끝난 job의 by-reference 본문 삭제 (없으면 TTL로 지워짐)
+def discard_payload(job, properties, r=None):
+    if getattr(properties, 'content_type', None) == CONTENT_TYPE_REF and job.get('job_id'):
+        _payload_redis(r).delete(PAYLOAD_KEY.format(job_id=job['job_id']))
@@ -0,0 +1,206 @@
+import os
+import sys
+import json
+import logging
+import shutil
+import tempfile
+from config import PROJECT_CONFIG
+from config_loader import load_config, config_fingerprint
+from metric_store import get_summary
+from result_cache import job_fingerprint
+
+# engine 로거 아래에 두어서 consumer 콘솔 출력에 같이 나오게 함
+logger = logging.getLogger('engine.jobs')
+
+# job 종류(job['job_type'])별로 다른 부분: 작업 경로, 학습 명령, 결과 캐시 지문, 결과물 경로, 로컬 캐시에 복사할 데이터셋
+# GPU 대여 / 프로세스 실행 / 메트릭 파싱 / 결과 캐시는 engine.py가 종류와 상관없이 같은 경로로 처리
+# 새 종류는 같은 메서드를 가진 클래스를 만들어 register_job_type()으로 등록
+
+
+# config.py에서 MAIN_PROJECT_ROOT를 설정한대로 진행
+# 만약 설정하지 않은 경우는 script_path에 대해서 os.path.dirname(job['script_path']) 로 메인 루트 조정 가능
+def job_working_dir(job):
+    main_script_dir = PROJECT_CONFIG['MAIN_PROJECT_ROOT']
+    script_dir = os.path.dirname(job['script_path'])
+    return main_script_dir if main_script_dir else script_dir
+
+
+# 분류 학습 job (producer.py)
+class ClassificationJob:
+    job_type = 'classification'
+
+    def working_dir(self, job):
+        return job_working_dir(job)
+
+    # 지정해준 data_path (GPU를 잡기 전에 로컬 캐시로 복사)
+    def data_root(self, job):
+        return os.path.join(self.working_dir(job), job['data_path'])
+
+    # 학습 스크립트 내용 + merge된 config + config 파일 내용 + 데이터셋 manifest + 실행 인자로 만든 job 지문
+    def fingerprint(self, job, r):
+        working_dir = self.working_dir(job)
+        config_path = os.path.join(working_dir, job['config_path'])
+        config = load_config(config_path, r)
+        args = [job.get('model_name'), job.get('learning_rate')] + list(job.get('script_args') or [])
+        return job_fingerprint(os.path.join(working_dir, job['script_path']), config, self.data_root(job), args,
+                               config_fingerprint(config_path))
+
+    # 학습 스크립트가 report_artifact()로 알려준 결과물 경로
+    def artifacts(self, job, r):
+        return json.loads(get_summary(r, job['job_id']).get('artifacts', '[]'))
+
+    # staged_data_root: 로컬 캐시에 복사된 데이터셋 경로 (없으면 job의 data_path 사용). 데이터 파일이 없으면 None
+    # temp_paths: 데이터 경로를 바꾼 config를 쓴 임시 폴더를 여기에 추가 (run_job이 끝나면 remove_temp_paths로 삭제)
+    def build_command(self, job, r, staged_data_root=None, temp_paths=None):
+        working_dir = self.working_dir(job)
+        config_dir = os.path.join(working_dir, job['config_path'])
+        data_root = self.data_root(job)
+        if staged_data_root and staged_data_root != data_root:
+            logger.info(f"Using staged dataset {staged_data_root} (source {data_root})")
+            data_root = staged_data_root
+        logger.info(f"main_script_dir:{PROJECT_CONFIG['MAIN_PROJECT_ROOT']}, scirpt_dir:{os.path.dirname(job['script_path'])}")
+
+        # config 파일 내용이 같으면 캐시된 결과 사용 (.py config 재실행 없음)
+        config = load_config(config_dir, r)
+
+        # 기본적으로 dataset이 지정된 폴더명
+        dataset_folder = 'data'
+
+        # config data 파일의 경로 업데이트
+        config[dataset_folder]['data_dir'] = data_root
+        config[dataset_folder]['train_dir'] = os.path.join(data_root, 'train')
+        config[dataset_folder]['train_info_file'] = os.path.join(data_root, 'train.json')
+        config[dataset_folder]['test_dir'] = os.path.join(data_root, 'test')
+        config[dataset_folder]['test_info_file'] = os.path.join(data_root, 'test.json')
+        config[dataset_folder]['augmented_dir'] = os.path.join(data_root, 'augmented.csv')
+
+        # 파일 존재 여부 확인
+        for key in ['train_info_file', 'test_info_file']:
+            if not os.path.exists(config[dataset_folder][key]):
+                logger.error(f"{key} not found: {config[dataset_folder][key]}")
+                return None
+
+        # train_file과 test_file 경로 설정 (여기도 project_root는 프로젝트의 최상위 폴더임. 그 밑에 data train, test가 있는 폴더랑 파일명 지정하기)
+        train_file = os.path.join(data_root, 'train.json')
+        test_file = os.path.join(data_root, 'test.json')
+        aug_file = os.path.join(data_root, 'augmented.csv')
+
+        logger.info(f"Train file path: {train_file}")
+        logger.info(f"Test file path: {test_file}")
+        logger.info(f"Aug file path: {aug_file}")
+
+        if not os.path.exists(train_file) or not os.path.exists(test_file):
+            logger.error(f"Train file ({train_file}) or test file ({test_file}) not found")
+            return None
+
+        config[dataset_folder]['augmented_info_file'] = os.path.join(data_root, 'augmented.csv')
+
+        # 데이터 경로를 바꾼 config를 임시 폴더에 써서 원래 config 대신 학습 스크립트에 넘김
+        # (config_path가 파일이면 같은 이름의 파일, 폴더면 merge된 config.yaml 하나만 있는 폴더)
+        import yaml
+        temp_dir = tempfile.mkdtemp(prefix='job_config_')
+        if temp_paths is not None:
+            temp_paths.append(temp_dir)
+        is_file = os.path.isfile(config_dir)
+        name = os.path.basename(config_dir) if is_file and config_dir.endswith('.yaml') else 'config.yaml'
+        with open(os.path.join(temp_dir, name), 'w') as temp_file:
+            yaml.dump(config, temp_file)
+        job_config_path = os.path.join(temp_dir, name) if is_file else temp_dir
+        logger.info(f"Job config written to {job_config_path} (source {config_dir})")
+
+        logger.info(f"Actual train file path: {os.path.abspath(config[dataset_folder]['train_info_file'])}")
+        logger.info(f"Augmented file path: {os.path.abspath(config[dataset_folder]['augmented_info_file'])}")
+
+        mode = config.get('mode', 'train')
+
+        command = [
+            sys.executable,
+            job['script_path'],
+            'config_path', job_config_path,
+            '--mode', mode,
+            '--model_name', job['model_name'],
+            '--learning_rate', str(job['learning_rate'])
+        ]
+        if job.get('script_args'):
+            command.extend(job['script_args'])
+        return command
+
+
+# mmdetection 학습 job (det_producer.py)
+class DetectionJob:
+    job_type = 'det'
+
+    def working_dir(self, job):
+        return job_working_dir(job)
+
+    # 데이터셋 경로는 mmdetection config 안에 있어서 로컬 캐시로 바꿔치기하지 않음
+    def data_root(self, job):
+        return None
+
+    # 학습 스크립트 내용 + merge된 config + config 파일 내용(_base_ 포함) + 데이터셋 manifest(config의 data_root) + 실행 인자로 만든 job 지문
+    # work_dir은 결과를 저장할 위치일 뿐이라 지문에 넣지 않음
+    def fingerprint(self, job, r):
+        working_dir = self.working_dir(job)
+        config_path = os.path.join(working_dir, job['config_path'])
+        config = load_config(config_path, r)
+        data_root = config.get('data_root')
+        data_root = os.path.join(working_dir, data_root) if isinstance(data_root, str) else None
+        args = [job.get('seed'), job.get('device')] + list(job.get('script_args') or [])
+        return job_fingerprint(os.path.join(working_dir, job['script_path']), config, data_root, args,
+                               config_fingerprint(config_path))
+
+    # 결과물 경로 (work_dir + 학습 스크립트가 report_artifact()로 알려준 경로)
+    def artifacts(self, job, r):
+        work_dir = os.path.abspath(os.path.join(self.working_dir(job), job['work_dir']))
+        return [work_dir] + json.loads(get_summary(r, job['job_id']).get('artifacts', '[]'))
+
+    def build_command(self, job, r, staged_data_root=None, temp_paths=None):
+        command = [
+            sys.executable,
+            job['script_path'],
+            job['config_path'],
+            '--work-dir', job['work_dir'],
+            '--seed', str(job['seed']),
+            '--device', job['device']
+        ]
+        if job.get('script_args'):
+            command.extend(job['script_args'])
+        return command
+
+
+# build_command가 만든 임시 파일 / 폴더 삭제
+def remove_temp_paths(temp_paths):
+    for path in temp_paths:
+        if os.path.isdir(path):
+            shutil.rmtree(path, ignore_errors=True)
+        else:
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+
+JOB_TYPES = {}
+
+
+def register_job_type(handler):
+    JOB_TYPES[handler.job_type] = handler
+    return handler
+
+
+register_job_type(ClassificationJob())
+register_job_type(DetectionJob())
+
+
+# job_type이 없는 예전 메시지: mmdetection job은 data_path 대신 work_dir이 있음
+def job_type_of(job):
+    if job.get('job_type'):
+        return job['job_type']
+    return 'det' if 'work_dir' in job and 'data_path' not in job else 'classification'
+
+
+def handler_for(job):
+    job_type = job_type_of(job)
+    if job_type not in JOB_TYPES:
+        raise ValueError(f"Unknown job_type {job_type!r} (known: {sorted(JOB_TYPES)})")
+    return JOB_TYPES[job_type]
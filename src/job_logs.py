@@ -0,0 +1,178 @@
+import sys
+import logging
+import argparse
+import threading
+from collections import deque, namedtuple
+import redis
+from instrumentation import JOB_LOG_SHIPPED, JOB_LOG_DROPPED
+
+logger = logging.getLogger(__name__)
+
+# job별 학습 로그 (Redis Stream, 최근 MAXLEN줄 정도만 유지, TTL 후 삭제)
+#   job_logs:{job_id}   stream   source(stdout/stderr/sink), line  (+ sink 기록: dropped=버린 줄 수, end=1 job 종료)
+LOG_STREAM_KEY = 'job_logs:{job_id}'
+
+# 한 줄 최대 길이 (넘는 부분은 잘라서 저장)
+MAX_LINE_CHARS = 4096
+
+LogEntry = namedtuple('LogEntry', ['id', 'source', 'line', 'dropped', 'end'])
+
+
+# consumer 쪽: 학습 출력 줄을 ring buffer에 넣고, 전송 스레드가 모아서 XADD pipeline으로 보냄
+# write()는 buffer에 넣기만 하므로 Redis가 느려도 출력을 읽는 스레드(-> 학습 프로세스)가 기다리지 않음
+# buffer가 가득 차면 가장 오래된 줄을 버리고 수만 세어 두었다가, 다음 전송 때 "N lines dropped" 한 줄로 기록
+class JobLogSink:
+    def __init__(self, r, job_id, maxlen=10000, buffer_lines=20000, batch_lines=1000, flush_interval=0.5, ttl=7 * 24 * 3600):
+        self.r = r
+        self.job_id = job_id
+        self.key = LOG_STREAM_KEY.format(job_id=job_id)
+        self.maxlen = maxlen
+        self.buffer_lines = buffer_lines
+        self.batch_lines = batch_lines
+        self.flush_interval = flush_interval
+        self.ttl = ttl
+        self.buffer = deque()
+        self.dropped = 0
+        self.shipped_total = 0
+        self.dropped_total = 0
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._closing = False
+        self._end_line = None
+        self._warned = False
+        self._thread = threading.Thread(target=self._run, name=f"job-logs-{job_id[:8]}", daemon=True)
+        self._thread.start()
+
+    def write(self, line, source='stdout'):
+        line = line.rstrip('\n')
+        if len(line) > MAX_LINE_CHARS:
+            line = line[:MAX_LINE_CHARS] + ' ...'
+        with self._lock:
+            if len(self.buffer) >= self.buffer_lines:
+                self.buffer.popleft()
+                self.dropped += 1
+            self.buffer.append((source, line))
+            full = len(self.buffer) >= self.batch_lines
+        if full and not self._wakeup.is_set():
+            self._wakeup.set()
+
+    def _run(self):
+        while True:
+            self._wakeup.wait(self.flush_interval)
+            self._wakeup.clear()
+            closing = self._closing
+            self._ship()
+            if closing:
+                return
+
+    # buffer를 batch_lines개씩 pipeline으로 전송 (buffer가 빌 때까지)
+    def _ship(self):
+        while True:
+            with self._lock:
+                count = min(len(self.buffer), self.batch_lines)
+                batch = [self.buffer.popleft() for _ in range(count)]
+                dropped, self.dropped = self.dropped, 0
+                end_line = self._end_line if self._closing and not self.buffer else None
+            if not batch and not dropped and end_line is None:
+                return
+            pipe = self.r.pipeline(transaction=False)
+            # 버린 줄은 지금 보내는 줄보다 오래된 줄이므로 먼저 기록
+            if dropped:
+                pipe.xadd(self.key, {'source': 'sink', 'line': f"... {dropped} lines dropped (log buffer full) ...", 'dropped': dropped},
+                          maxlen=self.maxlen, approximate=True)
+            for source, line in batch:
+                pipe.xadd(self.key, {'source': source, 'line': line}, maxlen=self.maxlen, approximate=True)
+            if end_line is not None:
+                pipe.xadd(self.key, {'source': 'sink', 'line': end_line, 'end': 1}, maxlen=self.maxlen, approximate=True)
+            pipe.expire(self.key, self.ttl)
+            try:
+                pipe.execute()
+            except redis.RedisError as e:
+                # 로그 전송 실패로 학습을 멈추지는 않음 (보내지 못한 줄은 버린 것으로 셈)
+                if not self._warned:
+                    logger.warning(f"Could not ship logs of job {self.job_id}: {e}")
+                    self._warned = True
+                dropped += len(batch)
+                batch = []
+            self.shipped_total += len(batch)
+            self.dropped_total += dropped
+            JOB_LOG_SHIPPED.inc(len(batch))
+            JOB_LOG_DROPPED.inc(dropped)
+            if end_line is not None:
+                return
+
+    # 남은 줄을 모두 보내고 종료 표시(end)를 남김. tail --follow는 이 표시에서 끝남
+    def close(self, returncode=None):
+        if self._closing:
+            return
+        with self._lock:
+            self._end_line = f"[job exited with code {returncode}]" if returncode is not None else "[job ended]"
+            self._closing = True
+        self._wakeup.set()
+        self._thread.join()
+        if self.dropped_total:
+            logger.warning(f"Job {self.job_id}: dropped {self.dropped_total} of {self.shipped_total + self.dropped_total} log lines")
+
+
+# ---- 조회 API ----
+
+def _entry(entry_id, fields):
+    def text(name):
+        value = fields.get(name)
+        return value.decode(errors='replace') if value is not None else None
+    return LogEntry(entry_id.decode(), text(b'source'), text(b'line'), int(fields.get(b'dropped') or 0), fields.get(b'end') is not None)
+
+
+# job 로그를 start 위치부터 읽음
+#   start: '0' = 처음부터, '-100' = 마지막 100줄부터, stream entry id(예: 1718000000000-0) = 그 다음 줄부터
+#   follow: 새 줄을 기다리며 계속 읽음 (job 종료 표시가 오면 끝)
+def tail(r, job_id, start='0', follow=False, batch=1000, block_ms=1000):
+    key = LOG_STREAM_KEY.format(job_id=job_id)
+    last_id = start
+    if start.startswith('-'):
+        entries = r.xrevrange(key, count=int(start[1:]))[::-1]
+        last_id = entries[-1][0] if entries else '0'
+        for entry_id, fields in entries:
+            entry = _entry(entry_id, fields)
+            yield entry
+            if entry.end:
+                return
+    while True:
+        response = r.xread({key: last_id}, count=batch, block=block_ms if follow else None)
+        if not response:
+            if follow:
+                continue
+            return
+        for entry_id, fields in response[0][1]:
+            last_id = entry_id
+            entry = _entry(entry_id, fields)
+            yield entry
+            if entry.end:
+                return
+
+
+# python src/producer.py tail <job_id> [--from -100] [-f]  (또는 python src/job_logs.py ...)
+def main(argv=None):
+    from redis_client import connect_redis
+
+    parser = argparse.ArgumentParser(description='Print the training log of a job from its Redis stream')
+    parser.add_argument('job_id')
+    parser.add_argument('--from', dest='start', default='0', help="0 = from the beginning, -N = last N lines, or a stream entry id to resume after")
+    parser.add_argument('-f', '--follow', action='store_true', help='Keep printing new lines until the job ends')
+    parser.add_argument('--ids', action='store_true', help='Prefix lines with their stream entry id (use with --from to resume)')
+    args = parser.parse_args(argv)
+
+    r = connect_redis()
+    if not r.exists(LOG_STREAM_KEY.format(job_id=args.job_id)) and not args.follow:
+        print(f"No logs for job {args.job_id} (not started yet, expired, or JOB_LOG_STREAM=N)", file=sys.stderr)
+        sys.exit(1)
+    try:
+        for entry in tail(r, args.job_id, args.start, args.follow):
+            out = sys.stderr if entry.source == 'stderr' else sys.stdout
+            print(f"{entry.id} {entry.line}" if args.ids else entry.line, file=out, flush=args.follow)
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,130 @@
+import time
+import uuid
+import pika
+import job_codec
+from config import USER_NAME, RABBITMQ_CONFIG, AUGMENTATION_CONFIG
+from config_loader import load_config, config_fingerprint
+
+# producer / JobClient / consumer가 같이 쓰는 job 메시지 형식
+
+
+# config에서 모델 이름과 learning rate 추출
+def extract_info(config):
+    model_name = config.get('model', {}).get('name', 'default_model')
+    learning_rate = config.get('training', {}).get('learning_rate', 0.001)
+    return model_name, learning_rate
+
+
+# 같은 config로 돌린 job끼리 묶는 키 (consumer가 과거 GPU 메모리 사용량을 찾을 때 사용)
+def config_key(config_path):
+    try:
+        return config_fingerprint(config_path)
+    except OSError:
+        return None
+
+
+# GPU 요청 크기 (없으면 consumer가 과거 기록으로 추정하거나 GPU 전체를 사용)
+def gpu_request_fields(gpu_memory_mb=None, gpu_share=None):
+    fields = {}
+    if gpu_memory_mb is not None:
+        fields['gpu_memory_mb'] = int(gpu_memory_mb)
+    if gpu_share is not None:
+        fields['gpu_share'] = float(gpu_share)
+    return fields
+
+
+# 분류 학습 job (producer.py). consumer engine은 job_type으로 실행 방법을 고름
+def build_job(script_path, config_path, data_path, model_name=None, script_args=None, user=None, priority=0,
+              gpu_memory_mb=None, gpu_share=None, force=False):
+    config = load_config(config_path)
+    config_model_name, learning_rate = extract_info(config)
+
+    # 직접 모델을 지정했는지 안했는지
+    manual_model_yn = 'Y' if model_name else 'N'
+
+    script_args = list(script_args or [])
+    if model_name and '--model_name' not in script_args:
+        script_args = ['--model_name', model_name] + script_args
+
+    return {
+        'job_id': uuid.uuid4().hex,
+        'job_type': 'classification',
+        'user': user or USER_NAME,
+        'script_path': script_path,
+        'config_path': config_path,
+        'data_path': data_path,
+        'model_name': model_name or config_model_name,
+        'learning_rate': learning_rate,
+        'manual_model_yn': manual_model_yn,
+        'script_args': script_args,
+        'priority': priority,
+        'submitted_at': time.time(),
+        'config_key': config_key(config_path),
+        # True면 같은 입력으로 끝난 결과가 있어도 다시 학습
+        'force': bool(force),
+        **gpu_request_fields(gpu_memory_mb, gpu_share)
+    }
+
+
+# mmdetection 학습 job (det_producer.py)
+def build_det_job(script_path, config_path, work_dir, seed=42, device='cuda', script_args=None, user=None, priority=0,
+                  gpu_memory_mb=None, gpu_share=None, force=False):
+    return {
+        'job_id': uuid.uuid4().hex,
+        'job_type': 'det',
+        'user': user or USER_NAME,
+        'config_path': config_path,
+        'work_dir': work_dir,
+        'seed': seed,
+        'device': device,
+        'script_path': script_path,
+        'script_args': list(script_args or []),
+        'priority': priority,
+        'submitted_at': time.time(),
+        'config_key': config_key(config_path),
+        # True면 같은 입력으로 끝난 결과가 있어도 다시 학습
+        'force': bool(force),
+        **gpu_request_fields(gpu_memory_mb, gpu_share)
+    }
+
+
+# 오프라인 augmentation을 먼저 거치는 job. aug_consumer가 augmentation을 끝내면 사용자의 gpu_tasks_ 큐로 넘김
+#   script_path: augmentation 스크립트, aug_path: 결과 저장 경로, num_shards: 데이터셋을 나눠 동시에 처리할 조각 수
+def with_augmentation(job, script_path, aug_path, num_shards=None):
+    job = dict(job)
+    job['augmentation'] = {
+        'script_path': script_path,
+        'aug_path': aug_path,
+        'num_shards': int(num_shards or AUGMENTATION_CONFIG['SHARDS'])
+    }
+    return job
+
+
+def user_queue(user):
+    return f"{RABBITMQ_CONFIG['QUEUE_PREFIX']}{user}"
+
+
+# job을 넣을 큐 (augmentation이 남아 있으면 augmentation 큐, 아니면 제출한 사용자의 GPU 큐)
+def submit_queue(job):
+    augmentation = job.get('augmentation')
+    if augmentation and not augmentation.get('completed_at'):
+        return AUGMENTATION_CONFIG['QUEUE']
+    return user_queue(job['user'])
+
+
+# 메시지 속성 (큐가 x-max-priority로 만들어진 경우 priority가 높은 job이 먼저 나감)
+# content_type / content_encoding / headers는 job_codec.encode 결과 (consumer가 이 값으로 디코딩)
+def job_properties(job, content_type=None, content_encoding=None, headers=None):
+    return pika.BasicProperties(delivery_mode=2, message_id=job.get('job_id'), priority=int(job.get('priority') or 0),
+                                content_type=content_type, content_encoding=content_encoding, headers=headers)
+
+
+# job -> (body, properties). 큰 job은 본문을 Redis에 두고 키만 보냄 (r이 없으면 REDIS_CONFIG로 연결)
+def encode_message(job, r=None):
+    body, content_type, content_encoding, headers = job_codec.encode(job, r)
+    return body, job_properties(job, content_type, content_encoding, headers)
+
+
+# properties의 content_type대로 디코딩. properties가 없는 예전 메시지는 zlib 압축 / plain JSON 모두 처리
+def decode_job(body, properties=None, r=None):
+    return job_codec.decode(body, properties, r)
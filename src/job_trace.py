@@ -0,0 +1,188 @@
+import time
+import struct
+import argparse
+import logging
+import redis
+
+logger = logging.getLogger(__name__)
+
+# job 하나가 제출부터 GPU 반납까지 어디서 시간을 쓰는지 기록하는 단계별 시각
+#   job_trace:{job_id}    string  (단계 번호 uint8, unix time float64) 9바이트씩 APPEND
+#   job_trace:recent      zset    job_id -> 제출 시각 (최근 RECENT_LIMIT개만 유지)
+# 단계 시각은 메모리에 모아뒀다가 flush()에서 pipeline 한 번으로 기록 (job당 왕복 2~3회)
+# submit은 producer 머신 시각이라 서버 간 시계 차이만큼 queue 구간이 틀어질 수 있음
+TRACE_KEY = 'job_trace:{job_id}'
+RECENT_KEY = 'job_trace:recent'
+TRACE_TTL = 7 * 24 * 60 * 60
+RECENT_LIMIT = 10000
+
+STAGES = (
+    'submit',          # producer가 job을 만든 시각 (job['submitted_at'])
+    'dequeue',         # consumer가 메시지를 받아 처리 시작
+    'dataset_staged',  # 데이터셋 로컬 캐시 준비 완료
+    'gpu_acquired',    # GPU 대여 완료
+    'config_ready',    # config 로드 / 임시 config 파일 작성 완료
+    'spawned',         # 학습 프로세스 생성
+    'first_output',    # 학습 프로세스의 첫 출력 (인터프리터 시작 + torch 등 import 시간)
+    'first_epoch',     # 첫 에폭 시작
+    'exit',            # 학습 프로세스 종료
+    'gpu_released',    # GPU 반납
+)
+STAGE_INDEX = {name: i for i, name in enumerate(STAGES)}
+
+# 연속한 두 단계 사이 구간 이름 (중간 단계가 없는 job은 있는 단계끼리 묶음)
+PHASES = {
+    'dequeue': 'queue',
+    'dataset_staged': 'dataset staging',
+    'gpu_acquired': 'gpu wait',
+    'config_ready': 'config',
+    'spawned': 'spawn',
+    'first_output': 'interpreter/import',
+    'first_epoch': 'warmup',
+    'exit': 'training',
+    'gpu_released': 'release',
+}
+
+POINT = struct.Struct('<Bd')
+
+
+class JobTrace:
+    def __init__(self, r: redis.Redis, job_id, submitted_at=None):
+        self.r = r
+        self.job_id = job_id
+        self.key = TRACE_KEY.format(job_id=job_id)
+        self.marks = {}
+        self.pending = []
+        if submitted_at:
+            self.mark('submit', submitted_at)
+
+    # 단계마다 처음 한 번만 기록
+    def mark(self, stage, at=None):
+        if stage in self.marks:
+            return
+        at = time.time() if at is None else at
+        self.marks[stage] = at
+        self.pending.append(POINT.pack(STAGE_INDEX[stage], at))
+
+    # 학습 프로세스 출력 줄마다 호출 (첫 출력 / 첫 에폭 기록)
+    def on_output(self, parser):
+        if 'first_output' not in self.marks:
+            self.mark('first_output')
+        if 'first_epoch' not in self.marks and parser.current_epoch is not None:
+            self.mark('first_epoch')
+
+    def flush(self):
+        if not self.pending:
+            return
+        pending, self.pending = self.pending, []
+        started = self.marks.get('submit') or min(self.marks.values())
+        pipe = self.r.pipeline(transaction=False)
+        pipe.append(self.key, b''.join(pending))
+        pipe.expire(self.key, TRACE_TTL)
+        pipe.zadd(RECENT_KEY, {self.job_id: started})
+        pipe.zremrangebyrank(RECENT_KEY, 0, -RECENT_LIMIT - 1)
+        try:
+            pipe.execute()
+        except redis.RedisError as e:
+            # trace는 진단용이므로 실패해도 job은 계속 진행
+            logger.warning(f"Could not record trace of job {self.job_id}: {e}")
+
+
+# 없는 trace는 빈 dict
+def load_trace(r, job_id):
+    return parse_trace(r.get(TRACE_KEY.format(job_id=job_id)))
+
+
+def parse_trace(data):
+    data = data or b''
+    marks = {}
+    for offset in range(0, len(data) - POINT.size + 1, POINT.size):
+        index, at = POINT.unpack_from(data, offset)
+        if index < len(STAGES):
+            marks.setdefault(STAGES[index], at)
+    return marks
+
+
+def recent_job_ids(r, count=100):
+    return [job_id.decode() for job_id in r.zrevrange(RECENT_KEY, 0, count - 1)]
+
+
+# [(구간 이름, 시작 단계, 끝 단계, 초)] 단계 순서대로
+def phases(marks):
+    present = [stage for stage in STAGES if stage in marks]
+    return [(PHASES.get(end, end), start, end, marks[end] - marks[start]) for start, end in zip(present, present[1:])]
+
+
+def percentile(ordered, q):
+    return ordered[min(int(len(ordered) * q), len(ordered) - 1)]
+
+
+def print_waterfall(job_id, marks, width=40):
+    if not marks:
+        print(f"{job_id}: no trace")
+        return
+    origin = min(marks.values())
+    total = max(marks.values()) - origin
+    print(f"{job_id}  (total {total:.2f}s)")
+    for name, start, end, seconds in phases(marks):
+        offset = marks[start] - origin
+        left = int(offset / total * width) if total > 0 else 0
+        bar = max(int(seconds / total * width), 1) if total > 0 else 1
+        print(f"  {name:20s} {' ' * left}{'#' * bar:{width - left}s} +{offset:9.2f}s {seconds:9.3f}s")
+
+
+# 최근 job들의 구간별 분포. "before training"은 제출부터 첫 에폭까지 (학습 외 대기/준비 시간)
+def print_summary(traces):
+    durations = {}
+    for marks in traces:
+        for name, start, end, seconds in phases(marks):
+            durations.setdefault(name, []).append(seconds)
+    overhead = [m['first_epoch'] - m['submit'] for m in traces if 'submit' in m and 'first_epoch' in m]
+    if overhead:
+        durations['before training'] = overhead
+    if not durations:
+        print("no traces")
+        return
+
+    order = [PHASES[stage] for stage in STAGES[1:]] + ['before training']
+    total_overhead = sum(overhead) or None
+    print(f"{len(traces)} jobs")
+    print(f"  {'phase':20s} {'jobs':>5s} {'p50':>9s} {'p90':>9s} {'p99':>9s} {'max':>9s}  {'share':>6s}")
+    for name in order:
+        values = sorted(durations.get(name, []))
+        if not values:
+            continue
+        share = ''
+        if total_overhead and name not in ('training', 'release', 'before training'):
+            share = f"{sum(values) / total_overhead * 100:5.1f}%"
+        print(f"  {name:20s} {len(values):5d} {percentile(values, 0.5):8.2f}s {percentile(values, 0.9):8.2f}s "
+              f"{percentile(values, 0.99):8.2f}s {values[-1]:8.2f}s  {share:>6s}")
+
+
+def main():
+    from config import REDIS_CONFIG
+
+    parser = argparse.ArgumentParser(description='Show where job time goes (queue, GPU wait, config, interpreter startup, training)')
+    parser.add_argument('job_ids', nargs='*', help='Print waterfalls for these jobs')
+    parser.add_argument('--recent', type=int, default=200, help='Aggregate over this many recent jobs')
+    parser.add_argument('--waterfalls', type=int, default=0, help='Also print waterfalls of this many recent jobs')
+    args = parser.parse_args()
+    r = redis.Redis(host=REDIS_CONFIG['HOST'], port=REDIS_CONFIG['PORT'], db=REDIS_CONFIG['DB'], password=REDIS_CONFIG['PASSWORD'])
+
+    if args.job_ids:
+        for job_id in args.job_ids:
+            print_waterfall(job_id, load_trace(r, job_id))
+        return
+
+    job_ids = recent_job_ids(r, args.recent)
+    pipe = r.pipeline(transaction=False)
+    for job_id in job_ids:
+        pipe.get(TRACE_KEY.format(job_id=job_id))
+    traces = [parse_trace(data) for data in pipe.execute()]
+    for job_id, marks in list(zip(job_ids, traces))[:args.waterfalls]:
+        print_waterfall(job_id, marks)
+    print_summary([marks for marks in traces if marks])
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,111 @@
+import os
+import sys
+import json
+
+# 학습 스크립트(main.py, mmdetection train.py)와 consumer 사이의 메트릭 전용 통로.
+# consumer가 파이프를 열고 쓰기용 fd 번호를 JOB_METRICS_FD 환경변수로 넘겨줌.
+# 학습 스크립트에서는 이 파일만 복사/import 해서 쓰면 됨 (표준 라이브러리만 사용)
+#
+#   from metric_channel import report_epoch, report_metrics
+#   report_epoch(epoch, num_epochs)
+#   report_metrics(train_loss=loss, train_metric=acc, val_loss=val_loss, val_metric=val_acc)
+#   report_gpu_memory()
+#   report_artifact('outputs/best.pth')
+#
+# consumer 밖에서 실행하면(JOB_METRICS_FD가 없으면) 아무것도 하지 않음 -> 기존 stdout 파싱으로 동작
+METRICS_FD_ENV = 'JOB_METRICS_FD'
+
+_writer = None
+
+
+def _get_writer():
+    global _writer
+    if _writer is None:
+        fd = os.environ.get(METRICS_FD_ENV)
+        if not fd:
+            return None
+        try:
+            _writer = os.fdopen(int(fd), 'w', buffering=1)
+        except (OSError, ValueError):
+            return None
+    return _writer
+
+
+def _emit(record):
+    writer = _get_writer()
+    if writer is None:
+        return False
+    try:
+        writer.write(json.dumps(record, separators=(',', ':')) + '\n')
+    except (OSError, ValueError):
+        return False
+    return True
+
+
+def enabled():
+    return _get_writer() is not None
+
+
+# 에폭 시작 알림
+def report_epoch(epoch, total_epochs, additional=False):
+    return _emit({'type': 'epoch', 'epoch': int(epoch), 'total': int(total_epochs), 'additional': bool(additional)})
+
+
+# 현재 에폭의 메트릭 기록. 숫자는 float로, 클래스별 결과 등은 문자열로 그대로 저장됨
+def report_metrics(**metrics):
+    values = {k: (v if isinstance(v, str) else float(v)) for k, v in metrics.items()}
+    return _emit({'type': 'metrics', 'values': values})
+
+
+# 지금까지의 peak GPU 메모리(MB) 기록. consumer가 다음 실행 때 같은 config job의 GPU 메모리 요청으로 사용함
+# peak_mb를 안 넘기면 학습 스크립트가 이미 import한 torch에서 읽음
+def report_gpu_memory(peak_mb=None):
+    if peak_mb is None:
+        torch = sys.modules.get('torch')
+        if torch is None or not torch.cuda.is_available():
+            return False
+        peak_mb = torch.cuda.max_memory_reserved() / (1024 * 1024)
+    # 에폭 메트릭과 따로 보냄 (에폭 전에 보내도 기록되고, stdout 메트릭 파싱도 그대로 유지)
+    return _emit({'type': 'gpu_memory', 'peak_mb': float(peak_mb)})
+
+
+# 결과물(체크포인트 등) 경로 기록. 같은 job을 다시 제출하면 consumer가 재학습 없이 이 경로를 돌려줌
+def report_artifact(path):
+    return _emit({'type': 'artifact', 'path': os.path.abspath(str(path))})
+
+
+# ---- consumer 쪽 ----
+
+# 파이프를 만들어서 (읽기 파일, 쓰기 fd)를 반환. 쓰기 fd는 Popen(pass_fds=...)로 자식에게 넘기고 부모에서는 닫아야 함
+def open_metric_pipe():
+    if os.name == 'nt':
+        return None, None
+    read_fd, write_fd = os.pipe()
+    return os.fdopen(read_fd, 'r', buffering=1), write_fd
+
+
+# JSON 한 줄을 parser에 반영. 잘못된 줄은 False
+def apply_record(line, parser):
+    try:
+        record = json.loads(line)
+    except ValueError:
+        return False
+    if record.get('type') == 'epoch':
+        parser.start_epoch(str(record['epoch']), str(record['total']), record.get('additional', False))
+    elif record.get('type') == 'metrics':
+        for name, value in record.get('values', {}).items():
+            parser.set_metric(name, value)
+    elif record.get('type') == 'gpu_memory':
+        parser.set_gpu_memory(record['peak_mb'])
+        parser.maybe_flush()
+        return True
+    elif record.get('type') == 'artifact':
+        # 경로만 받은 경우는 stdout 메트릭 파싱을 계속함
+        parser.add_artifact(record['path'])
+        parser.maybe_flush()
+        return True
+    else:
+        return False
+    parser.structured = True
+    parser.maybe_flush()
+    return True
@@ -0,0 +1,154 @@
+import json
+import re
+import time
+import logging
+from metric_store import MetricStore
+
+logger = logging.getLogger(__name__)
+
+# redis에 모아서 쓰는 주기 (초). 에폭이 바뀔 때도 바로 씀
+FLUSH_INTERVAL = 2.0
+
+# 모든 패턴을 하나의 정규식으로 합쳐서 한 번만 훑고, 매칭된 그룹 이름으로 분기
+LINE_PATTERN = re.compile(
+    r"(?P<epoch>(?P<additional>Additional )?Epoch (?P<epoch_n>\d+)/(?P<epoch_total>\d+))"
+    r"|(?P<train>Train Loss: (?P<train_loss>[\d.]+), Train Metric: (?P<train_metric>[\d.]+))"
+    r"|(?P<val>Val Loss: (?P<val_loss>[\d.]+), Val Metric: (?P<val_metric>[\d.]+))"
+    r"|(?P<train_class_loss_line>Train Class Losses: (?P<train_class_loss>.+))"
+    r"|(?P<train_class_metric_line>Train Class metric: (?P<train_class_metric>.+))"
+    r"|(?P<val_class_loss_line>Val Class Losses: (?P<val_class_loss>.+))"
+    r"|(?P<val_class_metric_line>Val Class metric: (?P<val_class_metric>.+))"
+)
+
+# 메트릭 줄이라면 반드시 들어있는 단어. 대부분의 줄은 정규식 없이 여기서 걸러짐
+KEYWORDS = ('Epoch', 'Loss', 'metric')
+
+# 클래스별 결과 줄 -> 메트릭 이름 (metric_channel로 들어오는 이름과 같음)
+CLASS_GROUPS = {
+    'train_class_loss_line': 'train_class_loss',
+    'train_class_metric_line': 'train_class_metric',
+    'val_class_loss_line': 'val_class_loss',
+    'val_class_metric_line': 'val_class_metric',
+}
+
+CLASS_LABELS = {
+    'train_class_loss': 'Train Class Losses',
+    'train_class_metric': 'Train Class Metric',
+    'val_class_loss': 'Val Class Losses',
+    'val_class_metric': 'Val Class Metric',
+}
+
+
+# job 하나의 학습 출력을 파싱하는 객체
+# 현재 에폭은 메모리에 들고 있고, redis 쓰기는 에폭 단위 / FLUSH_INTERVAL 단위로 모아서 한 번에 보냄
+class MetricParser:
+    def __init__(self, store: MetricStore, flush_interval=FLUSH_INTERVAL):
+        self.store = store
+        self.flush_interval = flush_interval
+        self.current_epoch = None
+        self.total_epochs = None
+        self.is_additional = False
+        self.epoch_metrics = {}
+        self.last_flush = time.monotonic()
+        # metric_channel로 메트릭을 받기 시작하면 stdout 정규식 파싱은 건너뜀
+        self.structured = False
+        # 학습 스크립트가 알려준 결과물 경로 (체크포인트 등)
+        self.artifacts = []
+        # report_gpu_memory()로 받은 peak GPU 메모리(MB). 에폭과 상관없이 job 요약에 기록
+        self.gpu_memory_mb = None
+
+    def feed(self, line):
+        if not self.structured and any(keyword in line for keyword in KEYWORDS):
+            self._parse(line)
+        self.maybe_flush()
+
+    def _parse(self, line):
+        for match in LINE_PATTERN.finditer(line):
+            kind = match.lastgroup
+            if kind == 'epoch':
+                self.start_epoch(match.group('epoch_n'), match.group('epoch_total'), match.group('additional') is not None)
+            elif kind == 'train':
+                self.set_metric('train_loss', float(match.group('train_loss')))
+                self.set_metric('train_metric', float(match.group('train_metric')))
+            elif kind == 'val':
+                self.set_metric('val_loss', float(match.group('val_loss')))
+                self.set_metric('val_metric', float(match.group('val_metric')))
+            else:
+                name = CLASS_GROUPS[kind]
+                self.set_metric(name, match.group(name).strip())
+
+    def start_epoch(self, epoch, total_epochs, is_additional=False):
+        epoch = int(epoch)
+        # tqdm 등으로 같은 에폭 줄이 여러 번 찍히는 경우는 무시
+        if epoch == self.current_epoch and is_additional == self.is_additional:
+            return
+        if self.current_epoch is not None:
+            self._log_epoch_summary()
+            self.flush()
+
+        self.current_epoch = epoch
+        self.total_epochs = int(total_epochs)
+        self.is_additional = is_additional
+        self.epoch_metrics = {}
+        self.store.set_fields(current_epoch=epoch, total_epochs=self.total_epochs,
+                              is_additional_training="1" if is_additional else "0")
+
+    # 숫자는 시계열로, 문자열(클래스별 결과 등)은 최신 값으로 기록
+    def set_metric(self, name, value):
+        if not isinstance(value, str):
+            value = float(value)
+        self.epoch_metrics[name] = value
+        # 에폭 줄이 나오기 전의 값은 기록할 위치가 없으므로 redis에는 쓰지 않음
+        if self.current_epoch is not None:
+            self.store.record(self.current_epoch, name, value)
+
+    def set_gpu_memory(self, peak_mb):
+        peak_mb = float(peak_mb)
+        if self.gpu_memory_mb is None or peak_mb > self.gpu_memory_mb:
+            self.gpu_memory_mb = peak_mb
+            self.store.set_fields(gpu_memory_mb=int(peak_mb))
+
+    def add_artifact(self, path):
+        if path not in self.artifacts:
+            self.artifacts.append(path)
+            self.store.set_fields(artifacts=json.dumps(self.artifacts))
+
+    # 있는 값만 출력 (metric_channel로 일부 메트릭만 보내는 스크립트도 있음)
+    def _log_epoch_summary(self):
+        metrics = self.epoch_metrics
+        if 'train_loss' not in metrics and 'val_loss' not in metrics:
+            return
+        epoch_type = "Additional " if self.is_additional else ""
+        messages = [f"{epoch_type}Epoch {self.current_epoch}/{self.total_epochs} 완료:"]
+        for prefix, label in (('train', 'Train'), ('val', 'Val')):
+            parts = [f"{label} {name}: {_format_value(metrics[f'{prefix}_{key}'])}"
+                     for key, name in (('loss', 'Loss'), ('metric', 'Metric')) if f"{prefix}_{key}" in metrics]
+            if parts:
+                messages.append(" " + ", ".join(parts))
+        for key, label in CLASS_LABELS.items():
+            if key in metrics:
+                messages.append(f" {label}: {metrics[key]}")
+        for msg in messages:
+            logger.info(msg)
+
+    def maybe_flush(self):
+        if self.store.has_pending and time.monotonic() - self.last_flush >= self.flush_interval:
+            self.flush()
+
+    # 모아둔 값을 pipeline 한 번으로 기록
+    def flush(self):
+        self.last_flush = time.monotonic()
+        self.store.flush()
+
+    # run_job의 finally에서 호출되므로 예외를 밖으로 내보내지 않음 (job 결과나 뒤의 정리 작업에 영향 없도록)
+    def close(self):
+        try:
+            if self.current_epoch is not None:
+                self._log_epoch_summary()
+            self.flush()
+        except Exception as e:
+            logger.warning(f"Could not close metric parser: {e}")
+
+
+def _format_value(value):
+    return f"{value:.4f}" if isinstance(value, float) else str(value)
@@ -0,0 +1,166 @@
+import struct
+import asyncio
+import logging
+
+logger = logging.getLogger(__name__)
+
+# job_id 별 메트릭 저장소
+#   job_summary:{job_id}          hash   user, model_name, current_epoch ... / {이름}:latest, {이름}:best, {이름}:best_epoch
+#   job_series:{job_id}:{이름}     string (epoch uint32, value float32) 8바이트씩 APPEND 되는 시계열
+#   job_index:{user}              list   사용자가 실행한 job_id (최신이 앞)
+#   metric_leaderboard:{이름}      zset   job_id -> best 값 (필드 스캔 없이 순위 조회)
+SUMMARY_KEY = 'job_summary:{job_id}'
+SERIES_KEY = 'job_series:{job_id}:{name}'
+INDEX_KEY = 'job_index:{user}'
+LEADERBOARD_KEY = 'metric_leaderboard:{name}'
+
+LEADERBOARD_METRICS = ('val_metric', 'val_loss')
+
+POINT = struct.Struct('<If')
+
+
+# loss 계열은 작을수록, 나머지는 클수록 좋은 값
+def lower_is_better(name):
+    return 'loss' in name
+
+
+# job 하나의 메트릭을 모아서 기록하는 객체 (job 당 writer는 하나라고 가정 -> latest/best는 메모리에서 계산)
+class MetricStore:
+    def __init__(self, r, job_id):
+        self.r = r
+        self.job_id = job_id
+        self.summary_key = SUMMARY_KEY.format(job_id=job_id)
+        self.best = {}
+        self.pending_points = []
+        self.pending_fields = {}
+
+    def register(self, user, **fields):
+        pipe = self.r.pipeline(transaction=False)
+        pipe.hset(self.summary_key, mapping={'user': user, **{k: str(v) for k, v in fields.items()}})
+        pipe.lpush(INDEX_KEY.format(user=user), self.job_id)
+        pipe.execute()
+
+    def set_fields(self, **fields):
+        self.pending_fields.update({k: str(v) for k, v in fields.items()})
+
+    # 숫자는 시계열에 추가하고 latest/best 갱신, 문자열(클래스별 결과 등)은 latest만 기록
+    def record(self, epoch, name, value):
+        if isinstance(value, str):
+            self.pending_fields[f"{name}:latest"] = value
+            return
+        value = float(value)
+        self.pending_points.append((name, epoch, value))
+        self.pending_fields[f"{name}:latest"] = f"{value:.4f}"
+
+        best = self.best.get(name)
+        if best is None or (value < best[0] if lower_is_better(name) else value > best[0]):
+            self.best[name] = (value, epoch)
+            self.pending_fields[f"{name}:best"] = f"{value:.4f}"
+            self.pending_fields[f"{name}:best_epoch"] = str(epoch)
+
+    @property
+    def has_pending(self):
+        return bool(self.pending_points or self.pending_fields)
+
+    # 모아둔 값을 pipeline에 담음 (담을 값이 없으면 False)
+    def _fill_pipeline(self, pipe):
+        if not self.has_pending:
+            return False
+        points, self.pending_points = self.pending_points, []
+        fields, self.pending_fields = self.pending_fields, {}
+
+        series = {}
+        for name, epoch, value in points:
+            series.setdefault(name, []).append(POINT.pack(epoch, value))
+
+        for name, packed in series.items():
+            pipe.append(SERIES_KEY.format(job_id=self.job_id, name=name), b''.join(packed))
+            if name in LEADERBOARD_METRICS and name in self.best:
+                pipe.zadd(LEADERBOARD_KEY.format(name=name), {self.job_id: self.best[name][0]})
+        if fields:
+            pipe.hset(self.summary_key, mapping=fields)
+        return True
+
+    # 모아둔 값을 pipeline 한 번으로 기록
+    def flush(self):
+        pipe = self.r.pipeline(transaction=False)
+        if self._fill_pipeline(pipe):
+            pipe.execute()
+
+
+# asyncio consumer(async_engine.py)용: r은 redis.asyncio 클라이언트
+# MetricParser가 부르는 flush()는 기다리지 않고 쓰기 task만 만듦 (event loop를 막지 않음)
+# 시계열은 APPEND라서 순서가 바뀌면 안 되므로, 각 쓰기는 앞의 쓰기가 끝난 뒤에 실행
+class AsyncMetricStore(MetricStore):
+    def __init__(self, r, job_id):
+        super().__init__(r, job_id)
+        self._last_write = None
+
+    async def register(self, user, **fields):
+        pipe = self.r.pipeline(transaction=False)
+        pipe.hset(self.summary_key, mapping={'user': user, **{k: str(v) for k, v in fields.items()}})
+        pipe.lpush(INDEX_KEY.format(user=user), self.job_id)
+        await pipe.execute()
+
+    def flush(self):
+        pipe = self.r.pipeline(transaction=False)
+        if self._fill_pipeline(pipe):
+            self._last_write = asyncio.ensure_future(self._write(pipe, self._last_write))
+
+    async def _write(self, pipe, previous):
+        if previous is not None:
+            await previous
+        try:
+            await pipe.execute()
+        except Exception as e:
+            # 메트릭 기록 실패로 학습을 멈추지는 않음
+            logger.warning(f"Failed to write metrics of job {self.job_id}: {e}")
+
+    # 지금까지 만든 쓰기가 모두 끝날 때까지 기다림
+    async def drain(self):
+        if self._last_write is not None:
+            await self._last_write
+
+
+# ---- 조회 API ----
+
+# 메트릭 하나의 전체 시계열 [(epoch, value), ...] (redis 호출 1번)
+def get_series(r, job_id, name):
+    data = r.get(SERIES_KEY.format(job_id=job_id, name=name)) or b''
+    return [(epoch, round(value, 6)) for epoch, value in POINT.iter_unpack(data)]
+
+
+def get_summary(r, job_id):
+    return {k.decode(): v.decode() for k, v in r.hgetall(SUMMARY_KEY.format(job_id=job_id)).items()}
+
+
+def get_latest(r, job_id, name):
+    value = r.hget(SUMMARY_KEY.format(job_id=job_id), f"{name}:latest")
+    return value.decode() if value is not None else None
+
+
+def get_best(r, job_id, name):
+    value = r.hget(SUMMARY_KEY.format(job_id=job_id), f"{name}:best")
+    return value.decode() if value is not None else None
+
+
+# 학습 스크립트가 report_gpu_memory()로 알려준 peak GPU 메모리(MB)
+# (예전 metric_channel은 에폭 메트릭 gpu_memory_mb로 보냈으므로 그 값도 확인)
+def get_gpu_memory(r, job_id):
+    value = r.hget(SUMMARY_KEY.format(job_id=job_id), 'gpu_memory_mb')
+    return value.decode() if value is not None else get_best(r, job_id, 'gpu_memory_mb')
+
+
+# 사용자가 실행한 최근 job_id 목록
+def get_user_jobs(r, user, count=20):
+    return [job_id.decode() for job_id in r.lrange(INDEX_KEY.format(user=user), 0, count - 1)]
+
+
+# best 값 기준 상위 job 목록 [(job_id, value), ...]
+def top_jobs(r, name, count=10):
+    key = LEADERBOARD_KEY.format(name=name)
+    if lower_is_better(name):
+        rows = r.zrange(key, 0, count - 1, withscores=True)
+    else:
+        rows = r.zrevrange(key, 0, count - 1, withscores=True)
+    return [(job_id.decode(), score) for job_id, score in rows]
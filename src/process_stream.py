@@ -0,0 +1,81 @@
+import queue
+import logging
+import threading
+from collections import deque
+
+logger = logging.getLogger(__name__)
+
+# 파서가 아직 처리하지 못한 줄의 최대 개수.
+# 가득 차면 reader 스레드가 멈추고 -> 파이프가 차서 -> 학습 프로세스의 출력이 기다리게 됨 (backpressure)
+MAX_PENDING_LINES = 1000
+# 실패 시 에러 메시지로 남길 마지막 출력 줄 수
+TAIL_LINES = 200
+
+_EOF = object()
+
+
+# 큐에 자리가 날 때까지 기다림. 소비 쪽이 멈췄으면(stop) 포기
+def _put(lines, item, stop):
+    while not stop.is_set():
+        try:
+            lines.put(item, timeout=0.5)
+            return True
+        except queue.Full:
+            continue
+    return False
+
+
+def _read_pipe(pipe, source, lines, stop):
+    try:
+        for line in iter(pipe.readline, ''):
+            if not _put(lines, (source, line), stop):
+                break
+    except ValueError:
+        # 프로세스 종료 중 파이프가 닫힌 경우
+        pass
+    finally:
+        pipe.close()
+        _put(lines, (source, _EOF), stop)
+
+
+# stdout/stderr를 줄 단위로 실시간으로 읽어서 on_line(line, source)에 넘김
+# extra_pipes({source: 파일})로 메트릭 파이프 같은 다른 통로도 같은 큐에 넣어 한 스레드에서 처리
+# 전체 출력을 메모리에 모으지 않고 마지막 TAIL_LINES 줄만 보관해서 반환
+def stream_process(process, on_line, max_pending=MAX_PENDING_LINES, tail_lines=TAIL_LINES, extra_pipes=None):
+    lines = queue.Queue(maxsize=max_pending)
+    stop = threading.Event()
+    tails = {'stdout': deque(maxlen=tail_lines), 'stderr': deque(maxlen=tail_lines)}
+
+    pipes = [('stdout', process.stdout), ('stderr', process.stderr)]
+    pipes.extend((extra_pipes or {}).items())
+    readers = []
+    for source, pipe in pipes:
+        if pipe is None:
+            continue
+        reader = threading.Thread(target=_read_pipe, args=(pipe, source, lines, stop), daemon=True)
+        reader.start()
+        readers.append(reader)
+
+    open_pipes = len(readers)
+    parse_errors = 0
+    try:
+        while open_pipes:
+            source, line = lines.get()
+            if line is _EOF:
+                open_pipes -= 1
+                continue
+            if source in tails:
+                tails[source].append(line)
+            try:
+                on_line(line, source)
+            except Exception as e:
+                # 파싱 에러 때문에 학습을 멈추지는 않음
+                parse_errors += 1
+                if parse_errors <= 5:
+                    logger.warning(f"Failed to process output line ({source}): {e}")
+    finally:
+        stop.set()
+
+    if parse_errors:
+        logger.warning(f"{parse_errors} output lines could not be processed")
+    return ''.join(tails['stdout']), ''.join(tails['stderr'])
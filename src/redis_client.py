@@ -0,0 +1,37 @@
+import threading
+from config import REDIS_CONFIG
+
+
+# REDIS_CONFIG로 Redis 클라이언트 생성
+def connect_redis():
+    import redis
+    return redis.Redis(host=REDIS_CONFIG['HOST'], port=REDIS_CONFIG['PORT'], db=REDIS_CONFIG['DB'], password=REDIS_CONFIG['PASSWORD'])
+
+
+# asyncio용 Redis 클라이언트 (async_engine.py). 명령은 await로 실행
+def connect_async_redis():
+    import redis.asyncio
+    return redis.asyncio.Redis(host=REDIS_CONFIG['HOST'], port=REDIS_CONFIG['PORT'], db=REDIS_CONFIG['DB'], password=REDIS_CONFIG['PASSWORD'])
+
+
+# 처음 쓸 때 클라이언트를 만드는 Redis 대리 객체
+# consumer 모듈의 전역 r처럼 import 시점에 만들어지는 클라이언트에 사용 (r.get(...), r.pipeline() 등은 그대로 동작)
+class LazyRedis:
+    def __init__(self, factory=connect_redis):
+        self._factory = factory
+        self._client = None
+        self._lock = threading.Lock()
+
+    @property
+    def client(self):
+        if self._client is None:
+            with self._lock:
+                if self._client is None:
+                    self._client = self._factory()
+        return self._client
+
+    def __getattr__(self, name):
+        return getattr(self.client, name)
+
+    def __repr__(self):
+        return f"LazyRedis({self._client!r})"
@@ -0,0 +1,116 @@
+import json
+import time
+import hashlib
+import logging
+import argparse
+import redis
+from dataset_manifest import manifest_hash
+from metric_store import MetricStore, get_summary
+
+logger = logging.getLogger(__name__)
+
+# 같은 입력(학습 스크립트 내용, merge된 config, 데이터셋 내용, 실행 인자)으로 이미 성공한 job의 결과 캐시
+#   result_cache:{fingerprint}   hash   job_id, completed_at, metrics(JSON), artifacts(JSON), hits
+#   result_cache:stats           hash   hits, misses, stored
+RESULT_KEY = 'result_cache:{fingerprint}'
+STATS_KEY = 'result_cache:stats'
+RESULT_TTL = 30 * 24 * 60 * 60
+
+
+def file_hash(path, chunk_size=1024 * 1024):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+# job 입력 전체의 해시. 하나라도 바뀌면 다른 값이 나옴
+#   data_path는 내용 목록(manifest)으로 비교하므로 경로가 같아도 파일이 바뀌면 다른 job으로 취급
+#   config_files: config 파일 내용 해시 (config_loader.config_fingerprint, mmdetection _base_ 파일 포함)
+#   merge된 config dict에는 _base_ 내용이 없고 실행에 실패한 .py config는 {}가 되므로 파일 해시도 같이 넣음
+def job_fingerprint(script_path, config, data_path=None, args=(), config_files=None):
+    digest = hashlib.sha256()
+    digest.update(f"script:{file_hash(script_path)}\n".encode())
+    digest.update(f"config:{json.dumps(config, sort_keys=True, default=repr)}\n".encode())
+    if config_files:
+        digest.update(f"config_files:{config_files}\n".encode())
+    if data_path:
+        digest.update(f"data:{manifest_hash(data_path)}\n".encode())
+    digest.update(f"args:{json.dumps([str(a) for a in args])}\n".encode())
+    return digest.hexdigest()
+
+
+# job_summary에서 결과 메트릭만 추출 ({이름}:latest, {이름}:best, {이름}:best_epoch)
+def result_metrics(r, job_id):
+    return {k: v for k, v in get_summary(r, job_id).items() if ':' in k}
+
+
+class ResultCache:
+    def __init__(self, r: redis.Redis, ttl=RESULT_TTL):
+        self.r = r
+        self.ttl = ttl
+
+    # 캐시된 결과 {"job_id", "completed_at", "metrics", "artifacts", "hits"} 또는 None. hit/miss 횟수도 같이 기록
+    def lookup(self, fingerprint):
+        key = RESULT_KEY.format(fingerprint=fingerprint)
+        entry = self.r.hgetall(key)
+        pipe = self.r.pipeline(transaction=False)
+        if not entry:
+            pipe.hincrby(STATS_KEY, 'misses', 1)
+            pipe.execute()
+            return None
+        pipe.hincrby(key, 'hits', 1)
+        pipe.hincrby(STATS_KEY, 'hits', 1)
+        hits, _ = pipe.execute()
+        entry = {k.decode(): v.decode() for k, v in entry.items()}
+        return {
+            'job_id': entry['job_id'],
+            'completed_at': float(entry['completed_at']),
+            'metrics': json.loads(entry.get('metrics', '{}')),
+            'artifacts': json.loads(entry.get('artifacts', '[]')),
+            'hits': hits,
+        }
+
+    # 성공한 job의 결과 저장 (메트릭은 job_summary에서 복사)
+    def store(self, fingerprint, job_id, artifacts=()):
+        key = RESULT_KEY.format(fingerprint=fingerprint)
+        pipe = self.r.pipeline(transaction=False)
+        pipe.hset(key, mapping={
+            'job_id': job_id,
+            'completed_at': time.time(),
+            'metrics': json.dumps(result_metrics(self.r, job_id)),
+            'artifacts': json.dumps(list(artifacts)),
+            'hits': 0,
+        })
+        pipe.expire(key, self.ttl)
+        pipe.hincrby(STATS_KEY, 'stored', 1)
+        pipe.execute()
+
+    def stats(self):
+        stats = {k.decode(): int(v) for k, v in self.r.hgetall(STATS_KEY).items()}
+        return {'hits': stats.get('hits', 0), 'misses': stats.get('misses', 0), 'stored': stats.get('stored', 0)}
+
+
+# 캐시된 결과를 새 job의 job_summary에 복사 (get_latest 등으로 일반 job처럼 조회 가능)
+def apply_cached_result(r, job_id, cached):
+    store = MetricStore(r, job_id)
+    store.set_fields(**cached['metrics'], status='cached', cached_from=cached['job_id'],
+                     artifacts=json.dumps(cached['artifacts']))
+    store.flush()
+
+
+def main():
+    from config import REDIS_CONFIG
+
+    parser = argparse.ArgumentParser(description='Show result cache statistics')
+    parser.parse_args()
+    r = redis.Redis(host=REDIS_CONFIG['HOST'], port=REDIS_CONFIG['PORT'], db=REDIS_CONFIG['DB'], password=REDIS_CONFIG['PASSWORD'])
+    stats = ResultCache(r).stats()
+    total = stats['hits'] + stats['misses']
+    rate = stats['hits'] / total * 100 if total else 0.0
+    print(f"hits {stats['hits']}, misses {stats['misses']} ({rate:.1f}% hit rate), stored results {stats['stored']}")
+
+
+if __name__ == '__main__':
+    main()
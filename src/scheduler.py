@@ -0,0 +1,197 @@
+import json
+import time
+import base64
+import logging
+from collections import deque
+from job_schema import decode_job
+from job_codec import CONTENT_TYPE_REF
+
+logger = logging.getLogger(__name__)
+
+# 보낼 job이 없을 때 큐를 다시 확인하는 간격 (초)
+IDLE_POLL_INTERVAL = 0.5
+# 큐 목록을 다시 찾는 간격 (초)
+DISCOVERY_INTERVAL = 30
+# 사용자별 대기 시간 통계에 쓰는 최근 job 수
+WAIT_SAMPLES = 1000
+# 통계 로그 간격 (초)
+STATS_LOG_INTERVAL = 300
+
+
+# 가중치 기반 Deficit Round Robin
+# 사용자 차례가 오면 deficit에 weight * quantum을 더하고, deficit이 1 이상인 동안 job을 하나씩 꺼냄 (job 하나 = 비용 1)
+# 큐가 비어 있으면 deficit을 0으로 초기화 -> 쉬던 사용자가 몰아서 가져가지 못함.
+# 대기 중인 job이 있는 사용자는 매 라운드 최소 한 번은 차례가 오므로 굶는 사용자가 없음
+class FairShareScheduler:
+    def __init__(self, weights=None, quantum=1.0):
+        self.weights = dict(weights or {})
+        self.quantum = quantum
+        self.sources = {}
+        self.order = []
+        self.deficit = {}
+        self.position = 0
+        self.turn_started = False
+
+    def add_source(self, user, source):
+        if user in self.sources:
+            return
+        self.sources[user] = source
+        self.order.append(user)
+        self.deficit[user] = 0.0
+
+    def remove_source(self, user):
+        if user not in self.sources:
+            return
+        index = self.order.index(user)
+        del self.sources[user]
+        del self.deficit[user]
+        self.order.pop(index)
+        if index < self.position:
+            self.position -= 1
+        elif index == self.position:
+            self.turn_started = False
+        if self.position >= len(self.order):
+            self.position = 0
+
+    def _advance(self):
+        self.turn_started = False
+        self.position = (self.position + 1) % len(self.order)
+
+    # 다음에 실행할 (user, message) 반환. 모든 큐가 비어 있으면 None
+    def next(self):
+        empty = set()
+        while self.order and len(empty) < len(self.order):
+            user = self.order[self.position]
+            if not self.turn_started:
+                self.deficit[user] += self.weights.get(user, 1.0) * self.quantum
+                self.turn_started = True
+
+            if self.deficit[user] < 1:
+                self._advance()
+                continue
+
+            message = self.sources[user].get()
+            if message is None:
+                self.deficit[user] = 0.0
+                empty.add(user)
+                self._advance()
+                continue
+
+            self.deficit[user] -= 1
+            return user, message
+        return None
+
+
+# 사용자별 큐 대기 시간 통계 (제출 시각 submitted_at 기준)
+class WaitStats:
+    def __init__(self, samples=WAIT_SAMPLES):
+        self.samples = samples
+        self.waits = {}
+        self.counts = {}
+
+    def record(self, user, wait):
+        self.waits.setdefault(user, deque(maxlen=self.samples)).append(max(wait, 0.0))
+        self.counts[user] = self.counts.get(user, 0) + 1
+
+    def summary(self):
+        result = {}
+        for user, waits in self.waits.items():
+            ordered = sorted(waits)
+            result[user] = {
+                'jobs': self.counts[user],
+                'mean': sum(ordered) / len(ordered),
+                'p50': ordered[len(ordered) // 2],
+                'p95': ordered[min(int(len(ordered) * 0.95), len(ordered) - 1)],
+                'max': ordered[-1],
+            }
+        return result
+
+    def log(self):
+        for user, s in sorted(self.summary().items()):
+            logger.info(f"Wait time [{user}] jobs={s['jobs']} mean={s['mean']:.1f}s p50={s['p50']:.1f}s p95={s['p95']:.1f}s max={s['max']:.1f}s")
+
+
+# AMQP 큐 하나를 basic_get으로 하나씩 꺼내는 소스
+class AmqpQueueSource:
+    def __init__(self, channel, queue):
+        self.channel = channel
+        self.queue = queue
+
+    def get(self):
+        method, properties, body = self.channel.basic_get(queue=self.queue, auto_ack=False)
+        if method is None:
+            return None
+        return method, properties, body
+
+
+# RabbitMQ 관리 API로 gpu_tasks_* 큐 목록 조회. 관리 플러그인이 없으면 빈 목록
+def discover_queues(rabbitmq_config):
+    import urllib.request
+    url = f"http://{rabbitmq_config['HOST']}:{rabbitmq_config['MANAGEMENT_PORT']}/api/queues"
+    token = base64.b64encode(f"{rabbitmq_config['USER']}:{rabbitmq_config['PASSWORD']}".encode()).decode()
+    request = urllib.request.Request(url, headers={'Authorization': f"Basic {token}"})
+    try:
+        with urllib.request.urlopen(request, timeout=5) as response:
+            queues = json.loads(response.read().decode())
+    except Exception as e:
+        logger.debug(f"Queue discovery via management API failed: {e}")
+        return []
+    prefix = rabbitmq_config['QUEUE_PREFIX']
+    return [q['name'] for q in queues if q.get('name', '').startswith(prefix)]
+
+
+# 스케줄러 모드 consumer 루프 (pika connection 스레드에서 실행)
+# worker 자리가 날 때만 다음 job을 골라서 꺼내므로 공정성 판단이 실제 실행 시점에 이루어짐
+def run_scheduler(connection, channel, worker_pool, rabbitmq_config, consumer_config):
+    prefix = rabbitmq_config['QUEUE_PREFIX']
+    scheduler = FairShareScheduler(consumer_config['SCHEDULER_WEIGHTS'])
+    stats = WaitStats()
+
+    def refresh_queues():
+        queues = set(discover_queues(rabbitmq_config))
+        queues.update(f"{prefix}{user}" for user in consumer_config['SCHEDULER_USERS'])
+        queues.add(rabbitmq_config['QUEUE'])
+        for queue in sorted(queues):
+            user = queue[len(prefix):]
+            if user not in scheduler.sources:
+                # 없는 큐에 basic_get을 하면 채널이 닫히므로 먼저 선언
+                channel.queue_declare(queue=queue, arguments=rabbitmq_config['QUEUE_ARGS'])
+                scheduler.add_source(user, AmqpQueueSource(channel, queue))
+                logger.info(f"Scheduling queue {queue} (weight {scheduler.weights.get(user, 1.0)})")
+
+    refresh_queues()
+    last_discovery = last_stats = time.monotonic()
+    logger.info(' [*] Scheduler waiting for messages. To exit press CTRL+C')
+
+    while True:
+        # ack 콜백, heartbeat 처리
+        connection.process_data_events(time_limit=0)
+
+        now = time.monotonic()
+        if now - last_discovery >= DISCOVERY_INTERVAL:
+            refresh_queues()
+            last_discovery = now
+        if now - last_stats >= STATS_LOG_INTERVAL:
+            stats.log()
+            last_stats = now
+
+        if worker_pool.in_flight >= worker_pool.workers:
+            connection.process_data_events(time_limit=0.1)
+            continue
+
+        item = scheduler.next()
+        if item is None:
+            connection.process_data_events(time_limit=IDLE_POLL_INTERVAL)
+            continue
+
+        user, (method, properties, body) = item
+        submitted_at = None
+        # Redis에 본문이 있는 큰 job은 통계 때문에 가져오지 않음
+        if getattr(properties, 'content_type', None) != CONTENT_TYPE_REF:
+            try:
+                submitted_at = decode_job(body, properties).get('submitted_at')
+            except Exception:
+                pass
+        if submitted_at:
+            stats.record(user, time.time() - submitted_at)
+        worker_pool.on_message(channel, method, properties, body)
@@ -0,0 +1,163 @@
+import copy
+import time
+import uuid
+import logging
+import itertools
+import pika
+import yaml
+from config_loader import load_config
+from job_schema import extract_info, config_key
+
+logger = logging.getLogger(__name__)
+
+# 한 번에 broker 확인(confirm)을 기다리는 최대 메시지 수
+MAX_IN_FLIGHT = 256
+
+
+# sweep spec 파일 읽기 (YAML 또는 JSON)
+#   base: {...}                      모든 job에 공통으로 덮어쓸 값 (선택)
+#   grid: {learning_rate: [0.001, 0.01], model_name: [eff4, resnet50]}   모든 조합
+#   jobs: [{learning_rate: 0.1}, {model_name: vit, seed: 1}]            개별 목록
+def load_sweep_spec(path):
+    with open(path, 'r') as f:
+        spec = yaml.safe_load(f) or {}
+    if not isinstance(spec, dict) or not (spec.get('grid') or spec.get('jobs')):
+        raise ValueError(f"Sweep spec needs a 'grid' or 'jobs' section: {path}")
+    return spec
+
+
+# spec을 job별 덮어쓸 값 목록으로 펼침
+def expand_sweep(spec):
+    base = spec.get('base') or {}
+    overrides = []
+
+    grid = spec.get('grid') or {}
+    if grid:
+        keys = list(grid)
+        values = [v if isinstance(v, list) else [v] for v in grid.values()]
+        for combo in itertools.product(*values):
+            overrides.append({**base, **dict(zip(keys, combo))})
+
+    for job in spec.get('jobs') or []:
+        overrides.append({**base, **job})
+    return overrides
+
+
+# 기본 job에 덮어쓸 값 적용. job에 있는 필드는 그대로 바꾸고, 없는 값은 --key value로 script_args에 추가
+def apply_overrides(base_job, overrides):
+    job = copy.deepcopy(base_job)
+    job['job_id'] = uuid.uuid4().hex
+    job['submitted_at'] = time.time()
+    script_args = list(job.get('script_args') or [])
+    for key, value in overrides.items():
+        if key == 'script_args':
+            script_args.extend(str(v) for v in value)
+        elif key in job and key != 'job_id':
+            job[key] = value
+            # producer가 script_args에 같이 넣어둔 값(--model_name 등)도 맞춰서 변경
+            flag = f"--{key}"
+            if flag in script_args[:-1]:
+                script_args[script_args.index(flag) + 1] = str(value)
+        else:
+            script_args.extend([f"--{key}", str(value)])
+    job['script_args'] = script_args
+    if 'config_path' in overrides:
+        derive_config_fields(job, overrides)
+    return job
+
+
+# config_path를 바꾼 경우 원래 config에서 가져온 값을 새 config로 다시 계산 (producer의 build_job과 같은 규칙)
+#   config_key는 항상, 분류 job의 model_name(직접 지정하지 않은 경우) / learning_rate는 sweep에서 따로 지정하지 않았을 때만
+def derive_config_fields(job, overrides):
+    job['config_key'] = config_key(job['config_path'])
+    if job.get('job_type', 'classification') != 'classification':
+        return
+    model_name, learning_rate = extract_info(load_config(job['config_path']))
+    if 'model_name' not in overrides and job.get('manual_model_yn') != 'Y':
+        job['model_name'] = model_name
+    if 'learning_rate' not in overrides:
+        job['learning_rate'] = learning_rate
+
+
+# 연결 하나, 채널 하나로 메시지를 연속 발행하고 publisher confirm으로 저장 여부를 확인
+# 확인 안 된 메시지가 max_in_flight개를 넘지 않도록 조절함
+class ConfirmedPublisher:
+    def __init__(self, parameters, queue, messages, max_in_flight=MAX_IN_FLIGHT, queue_arguments=None):
+        self.parameters = parameters
+        self.queue = queue
+        self.queue_arguments = queue_arguments
+        # messages: [(job_id, body, properties), ...]
+        self.messages = messages
+        self.max_in_flight = max(int(max_in_flight), 1)
+        self.results = {message[0]: None for message in messages}
+        self.connection = None
+        self.channel = None
+        self.next_index = 0
+        self.delivery_tag = 0
+        self.outstanding = {}
+        self.error = None
+
+    def run(self):
+        if not self.messages:
+            return self.results
+        self.connection = pika.SelectConnection(
+            self.parameters,
+            on_open_callback=self._on_connection_open,
+            on_open_error_callback=self._on_connection_error,
+            on_close_callback=self._on_connection_closed,
+        )
+        self.connection.ioloop.start()
+        if self.error is not None:
+            raise self.error
+        return self.results
+
+    def _on_connection_open(self, connection):
+        connection.channel(on_open_callback=self._on_channel_open)
+
+    def _on_connection_error(self, connection, error):
+        self.error = error if isinstance(error, Exception) else pika.exceptions.AMQPConnectionError(error)
+        connection.ioloop.stop()
+
+    def _on_connection_closed(self, connection, reason):
+        connection.ioloop.stop()
+
+    def _on_channel_open(self, channel):
+        self.channel = channel
+        channel.add_on_close_callback(self._on_channel_closed)
+        channel.confirm_delivery(ack_nack_callback=self._on_confirm,
+                                 callback=lambda _: channel.queue_declare(queue=self.queue, arguments=self.queue_arguments, callback=lambda _: self._publish_more()))
+
+    def _on_channel_closed(self, channel, reason):
+        if any(v is None for v in self.results.values()):
+            self.error = pika.exceptions.AMQPChannelError(reason)
+        if not self.connection.is_closing and not self.connection.is_closed:
+            self.connection.close()
+
+    def _publish_more(self):
+        while len(self.outstanding) < self.max_in_flight and self.next_index < len(self.messages):
+            job_id, body, properties = self.messages[self.next_index]
+            self.next_index += 1
+            self.channel.basic_publish(
+                exchange='',
+                routing_key=self.queue,
+                body=body,
+                properties=properties
+            )
+            self.delivery_tag += 1
+            self.outstanding[self.delivery_tag] = job_id
+        if not self.outstanding and self.next_index >= len(self.messages):
+            self.channel.close()
+
+    # broker에서 ack/nack이 오면 해당 job들을 확정 (multiple이면 그 번호까지 모두)
+    def _on_confirm(self, frame):
+        method = frame.method
+        acked = isinstance(method, pika.spec.Basic.Ack)
+        if method.multiple:
+            tags = [tag for tag in self.outstanding if tag <= method.delivery_tag]
+        else:
+            tags = [method.delivery_tag]
+        for tag in tags:
+            job_id = self.outstanding.pop(tag, None)
+            if job_id is not None:
+                self.results[job_id] = acked
+        self._publish_more()
@@ -0,0 +1,460 @@
+import os
+import sys
+import json
+import time
+import runpy
+import select
+import shutil
+import signal
+import socket
+import logging
+import argparse
+import tempfile
+import threading
+import importlib
+import subprocess
+import traceback
+
+try:
+    import fcntl
+except ImportError:  # Windows: warm runner 없이 기존처럼 새 인터프리터로 실행
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+# 학습 프로세스를 미리 import해 둔 인터프리터에서 fork해서 시작하는 실행기 (WARM_RUNNER=Y)
+#   consumer가 runner 프로세스 하나를 띄우고, runner는 PRELOAD 모듈(torch, timm, mmdet 등)을 import한 뒤
+#   SPARES개의 대기 프로세스를 미리 fork해 둠. job이 오면 대기 프로세스 하나가 job의 argv / env / cwd / stdout / stderr를 받아
+#   runpy로 학습 스크립트를 __main__으로 실행하고 끝나면 종료됨 (job마다 새 프로세스, 재사용 없음)
+# consumer는 Popen 대신 WarmProcess(stdout / stderr / poll / wait / terminate)를 받으므로 stream_process 등은 그대로 사용
+# runner는 consumer 스레드와 상관없는 별도 프로세스라서 fork해도 lock 상태가 꼬이지 않음
+# CUDA는 fork 이후 초기화되어야 하므로 import만으로 CUDA를 초기화하는 모듈은 PRELOAD에 넣으면 안 됨
+#   (CUDA_VISIBLE_DEVICES는 job 프로세스에서 환경변수를 바꾼 뒤 처음 CUDA를 쓸 때 반영됨)
+MAX_MESSAGE = 1 << 20
+MAX_FDS = 16
+
+
+class WarmRunnerError(RuntimeError):
+    pass
+
+
+# ---------------------------------------------------------------- runner 프로세스
+
+def preload_modules(names):
+    loaded = []
+    for name in names:
+        start = time.perf_counter()
+        try:
+            importlib.import_module(name)
+        except Exception as e:
+            # 설치되지 않은 모듈은 건너뜀 (job 프로세스에서 평소처럼 import)
+            logger.warning(f"Warm runner could not preload {name}: {e}")
+            continue
+        loaded.append(name)
+        logger.info(f"Warm runner preloaded {name} in {time.perf_counter() - start:.2f}s")
+    return loaded
+
+
+# SystemExit.code -> 프로세스 종료 코드 (python 인터프리터와 같은 규칙)
+def exit_code(code):
+    if code is None:
+        return 0
+    if isinstance(code, int):
+        return code & 0xff
+    print(code, file=sys.stderr)
+    return 1
+
+
+# 대기 프로세스에서 job 하나 실행. fds는 request['fds']의 fd 번호(1, 2, pass_fds...)로 옮김
+def run_script(request, fds):
+    targets = request['fds']
+    # 받은 fd 번호가 옮길 번호와 겹칠 수 있으므로 먼저 모두 더 큰 번호로 옮겨둠
+    floor = max(targets + [2]) + 1
+    moved = []
+    for fd in fds:
+        moved.append(fcntl.fcntl(fd, fcntl.F_DUPFD, floor))
+        os.close(fd)
+    devnull = os.open(os.devnull, os.O_RDONLY)
+    os.dup2(devnull, 0)
+    os.close(devnull)
+    for fd, target in zip(moved, targets):
+        os.dup2(fd, target)
+        os.close(fd)
+
+    signal.signal(signal.SIGINT, signal.default_int_handler)
+    signal.signal(signal.SIGTERM, signal.SIG_DFL)
+    # runner의 logging 설정을 지워야 스크립트의 logging.basicConfig가 적용됨
+    for handler in logging.root.handlers[:]:
+        logging.root.removeHandler(handler)
+    logging.root.setLevel(logging.WARNING)
+
+    argv = request['argv']
+    os.chdir(request['cwd'])
+    os.environ.clear()
+    os.environ.update(request['env'])
+    sys.argv = list(argv)
+    # python script.py와 같은 sys.path: 스크립트 폴더가 맨 앞, 그 다음 PYTHONPATH
+    script = os.path.abspath(argv[0])
+    sys.path[0] = os.path.dirname(script)
+    for index, path in enumerate(p for p in os.environ.get('PYTHONPATH', '').split(os.pathsep) if p):
+        if path not in sys.path:
+            sys.path.insert(1 + index, path)
+    # fork한 프로세스끼리 난수 상태가 같지 않도록 다시 seed
+    import random
+    random.seed()
+    if 'numpy' in sys.modules:
+        sys.modules['numpy'].random.seed()
+
+    try:
+        runpy.run_path(script, run_name='__main__')
+        code = 0
+    except SystemExit as e:
+        code = exit_code(e.code)
+    except BaseException:
+        traceback.print_exc()
+        code = 1
+    try:
+        import atexit
+        atexit._run_exitfuncs()
+        sys.stdout.flush()
+        sys.stderr.flush()
+    except Exception:
+        pass
+    return code
+
+
+class RunnerServer:
+    def __init__(self, socket_path, spares):
+        self.socket_path = socket_path
+        self.spares = max(int(spares), 1)
+        self.listener = None
+        self.wakeup = None
+        self.pool = []   # [(pid, socket)] job을 기다리는 대기 프로세스
+        self.jobs = {}   # job pid -> 종료 코드를 보낼 consumer 연결
+        self.request = None  # 처리 중인 요청 (연결, fd 목록). 이때 fork한 대기 프로세스는 닫아야 함
+
+    # 대기 프로세스 하나 fork. 자식은 job을 하나 받아서 실행하고 종료 (이 함수에서 돌아오지 않음)
+    def fork_spare(self):
+        parent_sock, child_sock = socket.socketpair(socket.AF_UNIX, socket.SOCK_SEQPACKET)
+        sys.stdout.flush()
+        sys.stderr.flush()
+        pid = os.fork()
+        if pid == 0:
+            code = 1
+            try:
+                signal.set_wakeup_fd(-1)
+                signal.signal(signal.SIGCHLD, signal.SIG_DFL)
+                for fd in self.wakeup:
+                    os.close(fd)
+                parent_sock.close()
+                self.listener.close()
+                for _, sock in self.pool:
+                    sock.close()
+                for conn in self.jobs.values():
+                    conn.close()
+                if self.request is not None:
+                    # job의 stdout 파이프를 들고 있으면 consumer가 EOF를 받지 못함
+                    self.request[0].close()
+                    for fd in self.request[1]:
+                        os.close(fd)
+                message, fds, _, _ = socket.recv_fds(child_sock, MAX_MESSAGE, MAX_FDS)
+                child_sock.close()
+                # runner가 종료되면서 연결이 닫힌 경우
+                code = run_script(json.loads(message), fds) if message else 0
+            except BaseException:
+                traceback.print_exc()
+            finally:
+                os._exit(code)
+        child_sock.close()
+        self.pool.append((pid, parent_sock))
+
+    def fill_pool(self):
+        while len(self.pool) < self.spares:
+            self.fork_spare()
+
+    # consumer 요청 하나: 대기 프로세스에 넘기고 pid 응답. 종료 코드는 reap()에서 같은 연결로 보냄
+    def handle(self, conn):
+        try:
+            message, fds, _, _ = socket.recv_fds(conn, MAX_MESSAGE, MAX_FDS)
+        except OSError as e:
+            logger.warning(f"Warm runner could not read request: {e}")
+            conn.close()
+            return
+        self.request = (conn, fds)
+        try:
+            if not message:
+                conn.close()
+                return
+            while True:
+                if not self.pool:
+                    self.fork_spare()
+                pid, sock = self.pool.pop(0)
+                try:
+                    socket.send_fds(sock, [message], fds)
+                    break
+                except OSError as e:
+                    # 대기 중에 죽은 프로세스면 다음 프로세스로
+                    logger.warning(f"Warm runner spare {pid} is gone: {e}")
+                finally:
+                    sock.close()
+        finally:
+            self.request = None
+            for fd in fds:
+                os.close(fd)
+        self.jobs[pid] = conn
+        try:
+            conn.send(json.dumps({'pid': pid}).encode())
+        except OSError:
+            pass
+
+    def reap(self):
+        while True:
+            try:
+                pid, status = os.waitpid(-1, os.WNOHANG)
+            except ChildProcessError:
+                return
+            if pid == 0:
+                return
+            code = os.waitstatus_to_exitcode(status)
+            conn = self.jobs.pop(pid, None)
+            if conn is not None:
+                try:
+                    conn.send(json.dumps({'returncode': code}).encode())
+                except OSError:
+                    pass
+                conn.close()
+                continue
+            for spare in self.pool:
+                if spare[0] == pid:
+                    logger.warning(f"Warm runner spare {pid} exited with {code} before receiving a job")
+                    spare[1].close()
+                    self.pool.remove(spare)
+                    break
+
+    def serve(self):
+        parent = os.getppid()
+        self.listener = socket.socket(socket.AF_UNIX, socket.SOCK_SEQPACKET)
+        self.listener.bind(self.socket_path)
+        self.listener.listen(64)
+        # job이 끝나면 SIGCHLD로 select를 깨워서 종료 코드를 바로 전달
+        self.wakeup = os.pipe()
+        os.set_blocking(self.wakeup[1], False)
+        signal.set_wakeup_fd(self.wakeup[1])
+        signal.signal(signal.SIGCHLD, lambda signum, frame: None)
+        try:
+            self.fill_pool()
+            print('ready', flush=True)
+            # consumer가 종료되면(부모가 바뀌면) 같이 종료
+            while os.getppid() == parent:
+                ready, _, _ = select.select([self.listener, self.wakeup[0]], [], [], 1.0)
+                if self.wakeup[0] in ready:
+                    os.read(self.wakeup[0], 4096)
+                if self.listener in ready:
+                    conn, _ = self.listener.accept()
+                    self.handle(conn)
+                self.reap()
+                self.fill_pool()
+        finally:
+            for pid, sock in self.pool:
+                sock.close()
+            self.listener.close()
+
+
+def serve_main():
+    parser = argparse.ArgumentParser(description='Warm runner: fork training scripts from an interpreter with heavy modules preloaded')
+    parser.add_argument('--socket', required=True)
+    parser.add_argument('--preload', default='')
+    parser.add_argument('--spares', type=int, default=2)
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+
+    # Ctrl+C는 consumer가 처리하고, runner는 consumer가 끝나면 따라서 종료
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    start = time.perf_counter()
+    loaded = preload_modules([name.strip() for name in args.preload.split(',') if name.strip()])
+    logger.info(f"Warm runner ready in {time.perf_counter() - start:.2f}s (preloaded: {', '.join(loaded) or 'nothing'})")
+    RunnerServer(args.socket, args.spares).serve()
+
+
+# ---------------------------------------------------------------- consumer 쪽
+
+# runner에서 실행 중인 job 프로세스 (subprocess.Popen에서 consumer가 쓰는 부분만)
+# runner의 자식이라 waitpid를 못 하므로, 종료 코드는 runner가 연결로 보내줌
+class WarmProcess:
+    def __init__(self, args, pid, conn, stdout, stderr):
+        self.args = args
+        self.pid = pid
+        self.stdout = stdout
+        self.stderr = stderr
+        self.returncode = None
+        self._conn = conn
+        self._lock = threading.Lock()
+
+    def _read_status(self):
+        with self._lock:
+            if self.returncode is not None:
+                return
+            try:
+                data = self._conn.recv(MAX_MESSAGE)
+            except OSError:
+                data = b''
+            self._conn.close()
+            if data:
+                self.returncode = json.loads(data)['returncode']
+                return
+            # runner가 먼저 종료된 경우: job 프로세스는 남아 있을 수 있으므로 정리
+            logger.warning(f"Warm runner exited while job process {self.pid} was running")
+            try:
+                os.kill(self.pid, signal.SIGKILL)
+            except OSError:
+                pass
+            self.returncode = -signal.SIGKILL
+
+    def _wait_readable(self, timeout):
+        try:
+            ready, _, _ = select.select([self._conn], [], [], timeout)
+            return bool(ready)
+        except (OSError, ValueError):
+            # 다른 스레드가 이미 종료 코드를 읽고 연결을 닫음
+            return True
+
+    def poll(self):
+        if self.returncode is None and self._wait_readable(0):
+            self._read_status()
+        return self.returncode
+
+    def wait(self, timeout=None):
+        if self.returncode is None:
+            if not self._wait_readable(timeout):
+                raise subprocess.TimeoutExpired(self.args, timeout)
+            self._read_status()
+        return self.returncode
+
+    def send_signal(self, signum):
+        if self.returncode is None:
+            try:
+                os.kill(self.pid, signum)
+            except ProcessLookupError:
+                pass
+
+    def terminate(self):
+        self.send_signal(signal.SIGTERM)
+
+    def kill(self):
+        self.send_signal(signal.SIGKILL)
+
+
+class WarmRunner:
+    def __init__(self, preload, spares=2):
+        self.preload = list(preload)
+        self.spares = spares
+        self.socket_dir = None
+        self.socket_path = None
+        self.server = None
+        self.ready = False
+        self._lock = threading.Lock()
+
+    # preload는 runner 프로세스에서 진행되므로 바로 반환 (첫 job에서 준비될 때까지 기다림)
+    def start(self):
+        self.socket_dir = tempfile.mkdtemp(prefix='warm_runner_')
+        self.socket_path = os.path.join(self.socket_dir, 'runner.sock')
+        self.server = subprocess.Popen([sys.executable, os.path.abspath(__file__), '--socket', self.socket_path,
+                                        '--preload', ','.join(self.preload), '--spares', str(self.spares)],
+                                       stdout=subprocess.PIPE, text=True)
+        logger.info(f"Started warm runner (pid {self.server.pid}, preload: {', '.join(self.preload) or 'nothing'})")
+        return self
+
+    @property
+    def alive(self):
+        return self.server is not None and self.server.poll() is None
+
+    def wait_ready(self):
+        with self._lock:
+            if self.ready:
+                return
+            line = self.server.stdout.readline()
+            if line.strip() != 'ready':
+                raise WarmRunnerError(f"Warm runner exited before becoming ready (exit code {self.server.poll()})")
+            self.ready = True
+
+    # subprocess.Popen(command, stdout=PIPE, stderr=PIPE, text=True, env=env, cwd=cwd, pass_fds=pass_fds)와 같은 역할
+    # command[0]은 python 인터프리터, command[1]이 실행할 스크립트
+    def spawn(self, command, env, cwd=None, pass_fds=()):
+        self.wait_ready()
+        out_r, out_w = os.pipe()
+        err_r, err_w = os.pipe()
+        conn = socket.socket(socket.AF_UNIX, socket.SOCK_SEQPACKET)
+        try:
+            conn.connect(self.socket_path)
+            request = {'argv': list(command[1:]), 'env': dict(env), 'cwd': os.path.abspath(cwd or os.getcwd()), 'fds': [1, 2, *pass_fds]}
+            socket.send_fds(conn, [json.dumps(request).encode()], [out_w, err_w, *pass_fds])
+            reply = conn.recv(MAX_MESSAGE)
+            if not reply:
+                raise WarmRunnerError("Warm runner closed the connection without starting the job")
+            pid = json.loads(reply)['pid']
+        except BaseException:
+            conn.close()
+            os.close(out_r)
+            os.close(err_r)
+            raise
+        finally:
+            # 쓰기 쪽은 job 프로세스만 들고 있어야 끝날 때 EOF가 옴
+            os.close(out_w)
+            os.close(err_w)
+        return WarmProcess(command, pid, conn, os.fdopen(out_r, 'r', buffering=1), os.fdopen(err_r, 'r', buffering=1))
+
+    def stop(self):
+        if self.server is not None and self.server.poll() is None:
+            self.server.terminate()
+            try:
+                self.server.wait(timeout=10)
+            except subprocess.TimeoutExpired:
+                self.server.kill()
+        if self.socket_dir:
+            shutil.rmtree(self.socket_dir, ignore_errors=True)
+
+
+_runner = None
+
+
+# consumer 시작 시 한 번 호출 (WARM_RUNNER=Y일 때)
+def start_warm_runner(preload, spares=2):
+    global _runner
+    if _runner is None:
+        if os.name == 'nt' or fcntl is None or not hasattr(socket, 'send_fds'):
+            logger.warning("Warm runner needs fork and fd passing (Linux/macOS, Python 3.9+), using cold starts")
+            return None
+        _runner = WarmRunner(preload, spares).start()
+    return _runner
+
+
+def stop_warm_runner():
+    global _runner
+    if _runner is not None:
+        _runner.stop()
+        _runner = None
+
+
+# 실행 중인 warm runner (없으면 None)
+def active_runner():
+    return _runner
+
+
+# 학습 프로세스 시작. warm runner가 있으면 fork로, 없거나 실패하면 기존처럼 새 인터프리터로 시작
+def popen_job(command, env, cwd=None, pass_fds=()):
+    global _runner
+    runner = _runner
+    if runner is not None and command[0] == sys.executable:
+        try:
+            return runner.spawn(command, env, cwd, pass_fds)
+        except (OSError, WarmRunnerError, ValueError) as e:
+            logger.warning(f"Warm runner failed to start job, falling back to a cold start: {e}")
+            if not runner.alive:
+                logger.error("Warm runner is not running anymore, using cold starts from now on")
+                _runner = None
+    return subprocess.Popen(command, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True, bufsize=1, universal_newlines=True,
+                            env=env, cwd=cwd, pass_fds=pass_fds)
+
+
+if __name__ == '__main__':
+    serve_main()
@@ -0,0 +1,51 @@
+import functools
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+logger = logging.getLogger(__name__)
+
+
+# 메시지를 worker 스레드에서 처리하고, ack는 pika connection 스레드로 넘겨서 처리
+# (pika BlockingConnection은 스레드 안전하지 않으므로 add_callback_threadsafe 사용)
+class JobWorkerPool:
+    def __init__(self, handler, workers):
+        self.handler = handler
+        self.workers = max(int(workers), 1)
+        self.executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix='job-worker')
+        self._in_flight = 0
+        self._lock = threading.Lock()
+
+    @property
+    def in_flight(self):
+        return self._in_flight
+
+    # basic_consume의 on_message_callback으로 사용
+    def on_message(self, ch, method, properties, body):
+        logger.info(f"Received message: {body[:100]}...")
+        with self._lock:
+            self._in_flight += 1
+        connection = ch.connection
+        future = self.executor.submit(self._run, ch, properties, body)
+        future.add_done_callback(
+            lambda _: connection.add_callback_threadsafe(functools.partial(self._ack, ch, method.delivery_tag))
+        )
+
+    def _run(self, ch, properties, body):
+        try:
+            self.handler(body, ch, properties)
+        except Exception as e:
+            logger.error(f"Error processing message: {e}")
+        finally:
+            with self._lock:
+                self._in_flight -= 1
+
+    # connection 스레드에서 실행됨
+    def _ack(self, ch, delivery_tag):
+        if not ch.is_open:
+            logger.warning(f"Channel closed before ack (delivery_tag={delivery_tag}), message will be redelivered")
+            return
+        ch.basic_ack(delivery_tag=delivery_tag)
+
+    def shutdown(self, wait=True):
+        self.executor.shutdown(wait=wait)
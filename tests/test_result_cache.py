@@ -0,0 +1,40 @@
+import os
+import sys
+import tempfile
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src'))
+# config 캐시를 사용자 캐시 폴더 대신 임시 폴더에 씀 (config.py가 import 시점에 읽음)
+os.environ.setdefault('CONFIG_CACHE_DIR', tempfile.mkdtemp(prefix='test_config_cache_'))
+
+import fakeredis
+from job_handlers import handler_for
+from result_cache import ResultCache
+
+
+def write(path, text):
+    with open(path, 'w') as f:
+        f.write(text)
+
+
+# mmdetection config가 상속하는 _base_ 파일만 바뀌어도 결과 캐시가 맞지 않아야 함
+def test_editing_base_config_misses_result_cache(tmp_path):
+    os.makedirs(tmp_path / 'configs' / '_base_')
+    base = str(tmp_path / 'configs' / '_base_' / 'schedule.py')
+    write(base, "max_epochs = 12\n")
+    write(str(tmp_path / 'configs' / 'faster_rcnn.py'), "_base_ = ['_base_/schedule.py']\nlr = 0.02\n")
+    write(str(tmp_path / 'train.py'), "print('train')\n")
+    job = {'job_type': 'det', 'job_id': 'job-1', 'script_path': str(tmp_path / 'train.py'),
+           'config_path': str(tmp_path / 'configs' / 'faster_rcnn.py'), 'work_dir': str(tmp_path / 'work'),
+           'seed': 42, 'device': 'cuda'}
+    handler = handler_for(job)
+    r = fakeredis.FakeRedis()
+    cache = ResultCache(r)
+
+    fingerprint = handler.fingerprint(job, r)
+    cache.store(fingerprint, job['job_id'])
+    assert cache.lookup(handler.fingerprint(job, r)) is not None
+
+    write(base, "max_epochs = 24\n")
+    edited = handler.fingerprint(job, r)
+    assert edited != fingerprint
+    assert cache.lookup(edited) is None